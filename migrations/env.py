@@ -7,7 +7,7 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from src.core.database import Base
-from src.models import user, book, transaction, notification
+from src.models import user, book, transaction, notification, idempotency, task
 
 config = context.config
 
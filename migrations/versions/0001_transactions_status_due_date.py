@@ -0,0 +1,33 @@
+"""transactions (status, due_date) index
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Бос базада кесте индекстерімен бірге бөлімделген болып құрылады; CONCURRENTLY онда жүрмейді
+    if op.get_bind().execute(sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'transactions'::regclass")).scalar():
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_status_due_date "
+            "ON transactions (status, due_date)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_transactions_status_due_date")
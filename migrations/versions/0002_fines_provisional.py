@@ -0,0 +1,36 @@
+"""provisional fines, one fine per transaction
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Бос базада init_db бағанды модельден құрып қояды
+    if "provisional" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("fines")}:
+        op.add_column(
+            "fines",
+            sa.Column("provisional", sa.Boolean(), nullable=False, server_default=sa.text("false"))
+        )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS fines_transaction_id_key "
+            "ON fines (transaction_id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS fines_transaction_id_key")
+    op.drop_column("fines", "provisional")
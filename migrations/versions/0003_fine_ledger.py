@@ -0,0 +1,57 @@
+"""fine ledger and partial fine payments
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "paid_amount" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("fines")}:
+        op.add_column(
+            "fines",
+            sa.Column("paid_amount", sa.Numeric(10, 2), nullable=False, server_default=sa.text("0"))
+        )
+        op.execute("UPDATE fines SET paid_amount = amount WHERE paid")
+
+    if "fine_ledger" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "fine_ledger",
+            sa.Column("entry_id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=False),
+            sa.Column("fine_id", sa.Integer(), nullable=True),
+            sa.Column("entry_type", sa.String(20), nullable=False),
+            sa.Column("amount", sa.Numeric(10, 2), nullable=False),
+            sa.Column("balance_after", sa.Numeric(10, 2), nullable=True),
+            sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_fine_ledger_entry_id", "fine_ledger", ["entry_id"])
+        op.create_index("ix_fine_ledger_user_entry", "fine_ledger", ["user_id", "entry_id"])
+
+        # Бұрынғы айыппұлдар тарихы бойынша бастапқы жазбалар
+        op.execute("""
+            INSERT INTO fine_ledger (user_id, fine_id, entry_type, amount, created_at)
+            SELECT user_id, fine_id, 'charge', amount, issued_at FROM fines
+        """)
+        op.execute("""
+            INSERT INTO fine_ledger (user_id, fine_id, entry_type, amount, created_at)
+            SELECT user_id, fine_id, 'payment', -amount, coalesce(paid_at, issued_at) FROM fines WHERE paid
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_fine_ledger_user_entry", table_name="fine_ledger")
+    op.drop_index("ix_fine_ledger_entry_id", table_name="fine_ledger")
+    op.drop_table("fine_ledger")
+    op.drop_column("fines", "paid_amount")
@@ -0,0 +1,38 @@
+"""transactions browse indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_transactions_user_borrow_date": "(user_id, borrow_date)",
+    "ix_transactions_status_borrow_date": "(status, borrow_date)",
+    "ix_transactions_copy_id": "(copy_id)",
+}
+
+
+def upgrade() -> None:
+    # Бос базада кесте индекстерімен бірге бөлімделген болып құрылады; CONCURRENTLY онда жүрмейді
+    if op.get_bind().execute(sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'transactions'::regclass")).scalar():
+        return
+
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON transactions {columns}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,28 @@
+"""transactions renewal_count
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "renewal_count" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("transactions")}:
+        op.add_column(
+            "transactions",
+            sa.Column("renewal_count", sa.Integer(), nullable=False, server_default=sa.text("0"))
+        )
+
+
+def downgrade() -> None:
+    op.drop_column("transactions", "renewal_count")
@@ -0,0 +1,120 @@
+"""partition transactions by borrow_date
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import date, datetime
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+INDEXES = [
+    "CREATE INDEX ix_transactions_transaction_id ON transactions (transaction_id)",
+    "CREATE INDEX ix_transactions_status_due_date ON transactions (status, due_date)",
+    "CREATE INDEX ix_transactions_user_borrow_date ON transactions (user_id, borrow_date)",
+    "CREATE INDEX ix_transactions_status_borrow_date ON transactions (status, borrow_date)",
+    "CREATE INDEX ix_transactions_copy_id ON transactions (copy_id)",
+    "CREATE INDEX ix_transactions_open_user_due_date ON transactions (user_id, due_date) "
+    "WHERE status IN ('active', 'overdue')",
+]
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Бос базада init_db кестені модельден бірден бөлімделген етіп құрады
+    partitioned = bind.execute(sa.text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = 'transactions'::regclass"
+    )).scalar()
+    if not partitioned:
+        _partition_transactions(bind)
+
+    op.execute("CREATE TABLE IF NOT EXISTS transactions_archive (LIKE transactions) PARTITION BY RANGE (borrow_date)")
+    op.execute("CREATE TABLE IF NOT EXISTS fines_archive (LIKE fines)")
+
+
+def _partition_transactions(bind) -> None:
+    # Бар деректерді жаңа бөлімделген кестеге көшіру
+    op.execute("ALTER TABLE fines DROP CONSTRAINT IF EXISTS fines_transaction_id_fkey")
+    op.execute("ALTER SEQUENCE transactions_transaction_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE transactions RENAME TO transactions_legacy")
+    op.execute("ALTER TABLE transactions_legacy RENAME CONSTRAINT transactions_pkey TO transactions_legacy_pkey")
+    op.execute("UPDATE transactions_legacy SET borrow_date = coalesce(due_date, now()) WHERE borrow_date IS NULL")
+
+    op.execute("""
+        CREATE TABLE transactions (LIKE transactions_legacy INCLUDING DEFAULTS)
+        PARTITION BY RANGE (borrow_date)
+    """)
+    op.execute("ALTER TABLE transactions ALTER COLUMN borrow_date SET NOT NULL")
+    op.execute("ALTER TABLE transactions ADD CONSTRAINT transactions_pkey PRIMARY KEY (transaction_id, borrow_date)")
+    op.execute("ALTER TABLE transactions ADD FOREIGN KEY (user_id) REFERENCES users (user_id)")
+    op.execute("ALTER TABLE transactions ADD FOREIGN KEY (copy_id) REFERENCES book_copies (copy_id)")
+
+    oldest = bind.execute(sa.text("SELECT min(borrow_date) FROM transactions_legacy")).scalar()
+    today = datetime.utcnow().date()
+    month = date((oldest or datetime.utcnow()).year, (oldest or datetime.utcnow()).month, 1)
+    last = date(today.year, today.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+
+    while month <= last:
+        end = _next_month(month)
+        op.execute(
+            f"CREATE TABLE transactions_y{month.year:04d}m{month.month:02d} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        month = end
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+    op.execute("INSERT INTO transactions SELECT * FROM transactions_legacy")
+    op.execute("DROP TABLE transactions_legacy")
+    op.execute("ALTER SEQUENCE transactions_transaction_id_seq OWNED BY transactions.transaction_id")
+
+    for statement in INDEXES:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    # Мұрағаттағы бөлімдер де қайтадан бір кестеге жиналады
+    op.execute("ALTER SEQUENCE transactions_transaction_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+    op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey")
+    op.execute("CREATE TABLE transactions (LIKE transactions_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE transactions ALTER COLUMN borrow_date DROP NOT NULL")
+    op.execute("""
+        INSERT INTO transactions
+        SELECT * FROM transactions_partitioned
+        UNION ALL
+        SELECT * FROM transactions_archive
+    """)
+    op.execute("INSERT INTO fines SELECT * FROM fines_archive")
+
+    op.execute("DROP TABLE transactions_partitioned")
+    op.execute("DROP TABLE transactions_archive")
+    op.execute("DROP TABLE fines_archive")
+
+    op.execute("ALTER TABLE transactions ADD CONSTRAINT transactions_pkey PRIMARY KEY (transaction_id)")
+    op.execute("ALTER TABLE transactions ADD FOREIGN KEY (user_id) REFERENCES users (user_id)")
+    op.execute("ALTER TABLE transactions ADD FOREIGN KEY (copy_id) REFERENCES book_copies (copy_id)")
+    op.execute("ALTER SEQUENCE transactions_transaction_id_seq OWNED BY transactions.transaction_id")
+    for statement in INDEXES[1:-1]:
+        op.execute(statement)
+    op.execute("CREATE INDEX ix_transactions_transaction_id ON transactions (transaction_id)")
+    op.execute(
+        "ALTER TABLE fines ADD CONSTRAINT fines_transaction_id_fkey "
+        "FOREIGN KEY (transaction_id) REFERENCES transactions (transaction_id)"
+    )
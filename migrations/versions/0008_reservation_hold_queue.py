@@ -0,0 +1,35 @@
+"""reservation hold queue
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "copy_id" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("reservations")}:
+        op.add_column(
+            "reservations",
+            sa.Column("copy_id", sa.Integer(), sa.ForeignKey("book_copies.copy_id"), nullable=True)
+        )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reservations_book_reserved_at "
+            "ON reservations (book_id, reserved_at)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_reservations_book_reserved_at")
+    op.drop_column("reservations", "copy_id")
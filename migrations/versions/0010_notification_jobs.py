@@ -0,0 +1,44 @@
+"""notification broadcast jobs
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "notification_jobs" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "notification_jobs",
+        sa.Column("job_id", sa.Integer(), primary_key=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("type", sa.String(50), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("channel", sa.String(20), server_default="email"),
+        sa.Column("target", sa.Text(), nullable=False, server_default="{}"),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("inserted", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_user_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_notification_jobs_job_id", "notification_jobs", ["job_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notification_jobs_job_id", table_name="notification_jobs")
+    op.drop_table("notification_jobs")
@@ -0,0 +1,28 @@
+"""transactions reminded_at
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "reminded_at" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("transactions")}:
+        op.add_column("transactions", sa.Column("reminded_at", sa.DateTime(timezone=True), nullable=True))
+    # Мұрағат кестесі бөлімдерді қабылдау үшін бағандары бірдей болуы керек
+    op.execute("ALTER TABLE IF EXISTS transactions_archive ADD COLUMN IF NOT EXISTS reminded_at timestamptz")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE IF EXISTS transactions_archive DROP COLUMN IF EXISTS reminded_at")
+    op.drop_column("transactions", "reminded_at")
@@ -0,0 +1,38 @@
+"""notification read marks and retention index
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "notification_read_marks" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "notification_read_marks",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id"), primary_key=True),
+            sa.Column("read_up_to", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_read_sent_at "
+            "ON notifications (sent_at, notification_id) WHERE read"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notifications_read_sent_at")
+    op.drop_table("notification_read_marks")
@@ -0,0 +1,28 @@
+"""users token_version
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "token_version" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("users")}:
+        op.add_column(
+            "users",
+            sa.Column("token_version", sa.Integer(), nullable=False, server_default=sa.text("0"))
+        )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "token_version")
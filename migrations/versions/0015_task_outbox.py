@@ -0,0 +1,33 @@
+"""task outbox
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0015'
+down_revision = '0014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "task_outbox" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "task_outbox",
+        sa.Column("outbox_id", sa.BigInteger(), primary_key=True),
+        sa.Column("queue", sa.String(100), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("task_outbox")
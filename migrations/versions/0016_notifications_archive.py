@@ -0,0 +1,40 @@
+"""notifications archive
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0016'
+down_revision = '0015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Бұрын жұмыс кезінде LIKE арқылы құрылған кесте болса, оны сол күйінде қалдырамыз
+    if "notifications_archive" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "notifications_archive",
+        sa.Column("notification_id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("type", sa.String(50), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(timezone=True)),
+        sa.Column("read", sa.Boolean()),
+        sa.Column("channel", sa.String(20)),
+        sa.Column("notification_data", sa.String(500)),
+    )
+    op.create_index("ix_notifications_archive_user_sent_at", "notifications_archive", ["user_id", "sent_at"])
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_notifications_archive_user_sent_at")
+    op.drop_table("notifications_archive")
@@ -0,0 +1,136 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from src.core.database import SessionLocal
+from src.core.security import get_password_hash
+from src.models.user import Role, User
+from src.models.book import Book, BookCopy
+from src.services.transaction_service import TransactionService
+
+BENCH_PREFIX = "bench-checkout"
+
+
+def setup(workers: int):
+    db = SessionLocal()
+    try:
+        role = db.query(Role).filter(Role.role_name == "student").first()
+        if not role:
+            role = Role(role_name="student", permissions='{"borrow_books": true}')
+            db.add(role)
+            db.flush()
+
+        password_hash = get_password_hash("Bench123!")
+        users = [
+            User(
+                username=f"{BENCH_PREFIX}-{i}",
+                email=f"{BENCH_PREFIX}-{i}@university.edu",
+                password_hash=password_hash,
+                full_name=f"Bench {i}",
+                role_id=role.role_id
+            )
+            for i in range(workers)
+        ]
+        db.add_all(users)
+
+        book = Book(title=f"{BENCH_PREFIX} book")
+        db.add(book)
+        db.flush()
+
+        copies = [
+            BookCopy(book_id=book.book_id, barcode=f"{BENCH_PREFIX}-{i:06d}", status="available")
+            for i in range(workers)
+        ]
+        db.add_all(copies)
+        db.commit()
+
+        return [user.user_id for user in users], [copy.copy_id for copy in copies], book.book_id
+    finally:
+        db.close()
+
+
+def reset_copies(user_ids, copy_ids):
+    db = SessionLocal()
+    try:
+        db.execute(text("DELETE FROM transactions WHERE copy_id = ANY(:ids)"), {"ids": copy_ids})
+        db.execute(text("UPDATE book_copies SET status = 'available' WHERE copy_id = ANY(:ids)"), {"ids": copy_ids})
+        db.execute(text("UPDATE patron_snapshots SET active_loans = 0 WHERE user_id = ANY(:ids)"), {"ids": user_ids})
+        db.commit()
+    finally:
+        db.close()
+
+
+def teardown(user_ids, copy_ids, book_id):
+    db = SessionLocal()
+    try:
+        db.execute(text("DELETE FROM audit_logs WHERE user_id = ANY(:ids)"), {"ids": user_ids})
+        db.execute(text("DELETE FROM patron_snapshots WHERE user_id = ANY(:ids)"), {"ids": user_ids})
+        db.execute(text("DELETE FROM transactions WHERE copy_id = ANY(:ids)"), {"ids": copy_ids})
+        db.execute(text("DELETE FROM book_copies WHERE copy_id = ANY(:ids)"), {"ids": copy_ids})
+        db.execute(text("DELETE FROM books WHERE book_id = :id"), {"id": book_id})
+        db.execute(text("DELETE FROM users WHERE user_id = ANY(:ids)"), {"ids": user_ids})
+        db.commit()
+    finally:
+        db.close()
+
+
+def checkout(user_id: int, copy_id: int):
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        asyncio.run(TransactionService.borrow_book(db, user_id, copy_id, 14))
+        ok = True
+    except ValueError:
+        ok = False
+    finally:
+        db.close()
+    return ok, (time.perf_counter() - started) * 1000
+
+
+def run_scenario(name: str, pairs, workers: int):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda pair: checkout(*pair), pairs))
+    elapsed = time.perf_counter() - started
+
+    succeeded = sum(1 for ok, _ in results if ok)
+    latencies = sorted(latency for _, latency in results)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+
+    print(f"{name}:")
+    print(f"  сұраныстар: {len(results)}, сәтті: {succeeded}, бас тартылған: {len(results) - succeeded}")
+    print(f"  өткізу қабілеті: {len(results) / elapsed:.1f} сұраныс/с")
+    print(f"  кідіріс p50: {statistics.median(latencies):.1f} мс, p95: {p95:.1f} мс")
+
+    return succeeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Қарызға беру операциясының бәсекелестік бенчмаркі")
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    user_ids, copy_ids, book_id = setup(args.workers)
+    try:
+        same_copy = [(user_id, copy_ids[0]) for user_id in user_ids]
+        succeeded = run_scenario("Бір көшірме, бәсекелес сұраныстар", same_copy, args.workers)
+        assert succeeded == 1, f"Бір көшірме {succeeded} рет берілді"
+
+        reset_copies(user_ids, copy_ids)
+
+        different_copies = list(zip(user_ids, copy_ids))
+        run_scenario("Әр түрлі көшірмелер", different_copies, args.workers)
+    finally:
+        teardown(user_ids, copy_ids, book_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import text
+
+from src.core.database import SessionLocal
+from src.core.security import get_password_hash, PasswordHasher
+from src.models.user import Role, User
+from src.main import app
+
+BENCH_PREFIX = "bench-login"
+PASSWORD = "Bench123!"
+
+
+def setup(users: int):
+    db = SessionLocal()
+    try:
+        role = db.query(Role).filter(Role.role_name == "student").first()
+        if not role:
+            role = Role(role_name="student", permissions='{"borrow_books": true}')
+            db.add(role)
+            db.flush()
+
+        password_hash = get_password_hash(PASSWORD)
+        created = [
+            User(
+                username=f"{BENCH_PREFIX}-{i}",
+                email=f"{BENCH_PREFIX}-{i}@university.edu",
+                password_hash=password_hash,
+                full_name=f"Bench {i}",
+                role_id=role.role_id
+            )
+            for i in range(users)
+        ]
+        db.add_all(created)
+        db.commit()
+
+        return [user.user_id for user in created]
+    finally:
+        db.close()
+
+
+def teardown(user_ids):
+    db = SessionLocal()
+    try:
+        db.execute(text("DELETE FROM audit_logs WHERE user_id = ANY(:ids)"), {"ids": user_ids})
+        db.execute(text("DELETE FROM users WHERE user_id = ANY(:ids)"), {"ids": user_ids})
+        db.commit()
+    finally:
+        db.close()
+
+
+async def login(client: httpx.AsyncClient, username: str):
+    started = time.perf_counter()
+    response = await client.post("/api/auth/login", data={"username": username, "password": PASSWORD})
+    return response.status_code, (time.perf_counter() - started) * 1000
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    # Хэштеу кезінде цикл бұғатталса, жеңіл сұраныс та күтеді
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/")
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def run_scenario(name: str, usernames, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(username):
+            async with semaphore:
+                return await login(client, username)
+
+        stop = asyncio.Event()
+        probe_latencies = []
+        probe_task = asyncio.create_task(probe(client, stop, probe_latencies))
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[limited(username) for username in usernames])
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await probe_task
+
+    succeeded = sum(1 for code, _ in results if code == 200)
+    latencies = sorted(latency for _, latency in results)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+
+    print(f"{name}:")
+    print(f"  сұраныстар: {len(results)}, сәтті: {succeeded}")
+    print(f"  өткізу қабілеті: {len(results) / elapsed:.1f} сұраныс/с")
+    print(f"  кірү кідірісі p50: {statistics.median(latencies):.1f} мс, p95: {p95:.1f} мс")
+    if probe_latencies:
+        print(f"  GET / кідірісі p50: {statistics.median(probe_latencies):.1f} мс, max: {max(probe_latencies):.1f} мс")
+    print(f"  хэштеу пулы: {PasswordHasher.metrics()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Кіру операциясының өткізу қабілеті бенчмаркі")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--hash-workers", type=int, nargs="+", default=[0, 1, 2, 4, 8])
+    args = parser.parse_args()
+
+    user_ids = setup(args.requests)
+    usernames = [f"{BENCH_PREFIX}-{i}" for i in range(args.requests)]
+    try:
+        for workers in args.hash_workers:
+            PasswordHasher.configure(workers)
+            name = "Оқиғалар циклінде (бұрынғы)" if workers == 0 else f"Хэштеу пулы, {workers} ағын"
+            asyncio.run(run_scenario(name, usernames, args.concurrency))
+    finally:
+        teardown(user_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,11 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
 from src.core.database import get_db
-from src.core.security import create_access_token, verify_password, get_password_hash
+from src.core.security import create_access_token, verify_password, get_password_hash, revoke_token, PasswordHasher
 from src.core.config import settings
-from src.schemas.user import UserCreate, UserResponse, Token, UserLogin
+from src.schemas.user import UserCreate, UserResponse, Token, UserLogin, UserRoleUpdate
 from src.services.auth_service import AuthService
-from src.api.dependencies import get_current_active_user
+from src.api.dependencies import get_current_active_user, get_admin_user, oauth2_scheme
 
 router = APIRouter(prefix="/api/auth", tags=["Аутентификация"])
 
@@ -41,7 +41,7 @@ async def login(
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username, "role": user.role.role_name},
+        data={"sub": user.username, "role": user.role.role_name, "ver": user.token_version or 0},
         expires_delta=access_token_expires
     )
 
@@ -53,17 +53,25 @@ async def login(
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: UserResponse = Depends(get_current_active_user)):
-    return current_user
+async def get_current_user_info(
+        db: Session = Depends(get_db),
+        current_user = Depends(get_current_active_user)
+):
+    return await AuthService.get_user(db, current_user.user_id)
 
 
 @router.post("/refresh")
-async def refresh_token(current_user: UserResponse = Depends(get_current_active_user)):
+async def refresh_token(
+        token: str = Depends(oauth2_scheme),
+        current_user: UserResponse = Depends(get_current_active_user)
+):
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": current_user.username, "role": current_user.role.role_name},
+        data={"sub": current_user.username, "role": current_user.role.role_name, "ver": current_user.token_version},
         expires_delta=access_token_expires
     )
+    # Жаңартылған токен берілгенде ескісі қайтарылады
+    revoke_token(token)
 
     return {
         "access_token": access_token,
@@ -73,5 +81,84 @@ async def refresh_token(current_user: UserResponse = Depends(get_current_active_
 
 
 @router.post("/logout")
-async def logout():
-    return {"message": "Сәтті шықтыңыз"}
\ No newline at end of file
+async def logout(
+        token: str = Depends(oauth2_scheme),
+        current_user = Depends(get_current_active_user)
+):
+    revoke_token(token)
+    return {"message": "Сәтті шықтыңыз"}
+
+
+@router.post("/logout-all")
+async def logout_all(
+        db: Session = Depends(get_db),
+        current_user = Depends(get_current_active_user)
+):
+    await AuthService.revoke_all_sessions(db, current_user.user_id, current_user.user_id)
+    return {"message": "Барлық құрылғылардан шықтыңыз"}
+
+
+@router.get("/password-hash-metrics")
+async def get_password_hash_metrics(current_user = Depends(get_admin_user)):
+    return PasswordHasher.metrics()
+
+
+@router.post("/users/{user_id}/activate", response_model=UserResponse)
+async def activate_user(
+        user_id: int,
+        db: Session = Depends(get_db),
+        current_user = Depends(get_admin_user)
+):
+    try:
+        return await AuthService.set_user_active(db, user_id, True, current_user.user_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.post("/users/{user_id}/deactivate", response_model=UserResponse)
+async def deactivate_user(
+        user_id: int,
+        db: Session = Depends(get_db),
+        current_user = Depends(get_admin_user)
+):
+    try:
+        return await AuthService.set_user_active(db, user_id, False, current_user.user_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.put("/users/{user_id}/role", response_model=UserResponse)
+async def change_user_role(
+        user_id: int,
+        request: UserRoleUpdate,
+        db: Session = Depends(get_db),
+        current_user = Depends(get_admin_user)
+):
+    try:
+        return await AuthService.change_role(db, user_id, request.role_name, current_user.user_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/users/{user_id}/revoke-tokens", response_model=UserResponse)
+async def revoke_user_tokens(
+        user_id: int,
+        db: Session = Depends(get_db),
+        current_user = Depends(get_admin_user)
+):
+    try:
+        return await AuthService.revoke_all_sessions(db, user_id, current_user.user_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
@@ -6,7 +6,7 @@ from src.core.database import get_db
 from src.schemas.book import (
     BookCreate, BookResponse, BookUpdate, BookSearchRequest,
     BookSearchResponse, BookCopyCreate, BookCopyResponse,
-    AuthorCreate, AuthorResponse, CategoryCreate, CategoryResponse
+    AuthorCreate, AuthorResponse, CategoryCreate, CategoryResponse, BarcodeLookupResponse
 )
 from src.services.book_service import BookService
 from src.api.dependencies import get_current_active_user, require_roles
@@ -138,6 +138,21 @@ async def get_book_copies(
     return copies
 
 
+@router.get("/copies/barcode/{barcode}", response_model=BarcodeLookupResponse)
+async def get_copy_by_barcode(
+        barcode: str,
+        db: Session = Depends(get_db),
+        current_user=Depends(get_current_active_user)
+):
+    copy = await BookService.get_copy_by_barcode(db, barcode)
+    if not copy:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Кітап көшірмесі табылмады"
+        )
+    return copy
+
+
 @router.post("/authors/", response_model=AuthorResponse, status_code=status.HTTP_201_CREATED)
 async def create_author(
         author_data: AuthorCreate,
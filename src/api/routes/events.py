@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from src.core.config import settings
+from src.core.database import get_db, SessionLocal
+from src.core.events import EventHub, Subscription
+from src.core.security import get_current_user
+from src.api.dependencies import get_current_active_user
+
+router = APIRouter(prefix="/api/events", tags=["Оқиғалар"])
+
+
+def _parse_books(books: Optional[str]) -> List[int]:
+    if not books:
+        return []
+    try:
+        book_ids = sorted({int(book_id) for book_id in books.split(",") if book_id.strip()})
+    except ValueError:
+        raise ValueError("Кітап идентификаторлары жарамсыз")
+    if len(book_ids) > settings.EVENT_MAX_BOOKS:
+        raise ValueError(f"{settings.EVENT_MAX_BOOKS} кітаптан көп бақылауға болмайды")
+    return book_ids
+
+
+def _subscribe(user_id: int, book_ids: List[int]) -> Subscription:
+    return EventHub.subscribe(
+        [EventHub.user_channel(user_id)] + [EventHub.book_channel(book_id) for book_id in book_ids]
+    )
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    books: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    try:
+        book_ids = _parse_books(books)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # Ұзақ қосылым дерекқор байланысын ұстамауы керек
+    user_id = current_user.user_id
+    db.close()
+
+    subscription = _subscribe(user_id, book_ids)
+
+    async def generate():
+        try:
+            yield f"retry: {settings.EVENT_HEARTBEAT_SECONDS * 1000}\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.next(settings.EVENT_HEARTBEAT_SECONDS)
+                yield f"data: {event}\n\n" if event else ": ping\n\n"
+        finally:
+            EventHub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def websocket_events(
+    websocket: WebSocket,
+    token: str = Query(...),
+    books: Optional[str] = Query(None)
+):
+    db = SessionLocal()
+    try:
+        user_id = get_current_user(db, token).user_id
+        book_ids = _parse_books(books)
+    except (HTTPException, ValueError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    finally:
+        db.close()
+
+    await websocket.accept()
+    subscription = _subscribe(user_id, book_ids)
+    try:
+        while True:
+            event = await subscription.next(settings.EVENT_HEARTBEAT_SECONDS)
+            await websocket.send_text(event or '{"type": "ping"}')
+    except WebSocketDisconnect:
+        pass
+    finally:
+        EventHub.unsubscribe(subscription)
@@ -1,24 +1,69 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 from src.core.database import get_db
-from src.schemas.notification import NotificationResponse
+from src.core.tasks import TaskQueue
+from src.schemas.notification import (
+    NotificationResponse, NotificationPage, UnreadCountResponse, BroadcastRequest, NotificationJobResponse
+)
 from src.services.notification_service import NotificationService
+from src.services.delivery_service import DeliveryChannels
 from src.api.dependencies import get_current_active_user, require_roles
 
 router = APIRouter(prefix="/api/notifications", tags=["Хабарламалар"])
 
-@router.get("/", response_model=List[NotificationResponse])
+@router.get("/", response_model=NotificationPage)
 async def get_notifications(
     unread_only: bool = False,
+    cursor: Optional[str] = Query(None),
+    size: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    notifications = await NotificationService.get_user_notifications(
-        db, current_user.user_id, unread_only
-    )
-    return notifications
+    try:
+        return await NotificationService.get_user_notifications(
+            db, current_user.user_id, unread_only, cursor, size
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.get("/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    unread = await NotificationService.get_unread_count(db, current_user.user_id)
+    return UnreadCountResponse(unread=unread)
+
+@router.get("/queue-metrics")
+async def get_queue_metrics(
+    current_user = Depends(require_roles(["admin"]))
+):
+    return TaskQueue.metrics()
+
+@router.get("/delivery-metrics")
+async def get_delivery_metrics(
+    current_user = Depends(require_roles(["admin"]))
+):
+    return DeliveryChannels.metrics()
+
+@router.get("/broadcasts/{job_id}", response_model=NotificationJobResponse)
+async def get_broadcast(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_roles(["admin", "librarian"]))
+):
+    job = await NotificationService.get_broadcast(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Тапсырма табылмады"
+        )
+    return job
 
 @router.get("/{notification_id}", response_model=NotificationResponse)
 async def get_notification(
@@ -94,4 +139,18 @@ async def send_notification(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+@router.post("/broadcast", response_model=NotificationJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def broadcast_notification(
+    request: BroadcastRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_roles(["admin", "librarian"]))
+):
+    try:
+        return await NotificationService.create_broadcast(db, request, current_user.user_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
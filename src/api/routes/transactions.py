@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from src.core.database import get_db
 from src.schemas.transaction import (
     BorrowRequest, BorrowResponse, ReturnRequest, ReturnResponse,
     TransactionResponse, ReservationRequest, ReservationResponse,
-    FineResponse
+    FineResponse, PatronSnapshotResponse, BatchBorrowRequest, BatchReturnRequest,
+    BatchCirculationResponse, BarcodeBorrowRequest, BarcodeReturnRequest, OverduePage,
+    FineAccrualResult, FinePaymentRequest, FinePaymentResult, FineWaiveRequest,
+    FineBalanceResponse, FineLedgerPage, TransactionPage, RenewResponse, RenewAllResponse
 )
 from src.services.transaction_service import TransactionService
 from src.services.reservation_service import ReservationService
+from src.services.circulation_service import CirculationService
+from src.services.fine_service import FineService
+from src.services.idempotency_service import IdempotencyService
 from src.api.dependencies import get_current_active_user, require_roles
 
 router = APIRouter(prefix="/api/transactions", tags=["Транзакциялар"])
@@ -18,11 +27,15 @@ router = APIRouter(prefix="/api/transactions", tags=["Транзакциялар
 async def borrow_book(
     request: BorrowRequest,
     db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user = Depends(require_roles(["student", "teacher", "librarian", "admin"]))
 ):
     try:
-        transaction = await TransactionService.borrow_book(
-            db, current_user.user_id, request.copy_id, request.expected_days
+        transaction = await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "borrow", request.dict(),
+            lambda: TransactionService.borrow_book(
+                db, current_user.user_id, request.copy_id, request.expected_days
+            )
         )
         return transaction
     except ValueError as e:
@@ -35,11 +48,15 @@ async def borrow_book(
 async def return_book(
     request: ReturnRequest,
     db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user = Depends(require_roles(["librarian", "admin"]))
 ):
     try:
-        result = await TransactionService.return_book(
-            db, request.transaction_id, request.returned_at
+        result = await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "return", request.dict(),
+            lambda: TransactionService.return_book(
+                db, request.transaction_id, request.returned_at
+            )
         )
         return result
     except ValueError as e:
@@ -48,16 +65,130 @@ async def return_book(
             detail=str(e)
         )
 
-@router.post("/{transaction_id}/renew")
+@router.post("/borrow/barcode", response_model=BorrowResponse)
+async def borrow_book_by_barcode(
+    request: BarcodeBorrowRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user = Depends(require_roles(["student", "teacher", "librarian", "admin"]))
+):
+    try:
+        transaction = await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "borrow/barcode", request.dict(),
+            lambda: TransactionService.borrow_by_barcode(
+                db, current_user.user_id, request.barcode, request.expected_days
+            )
+        )
+        return transaction
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/return/barcode", response_model=ReturnResponse)
+async def return_book_by_barcode(
+    request: BarcodeReturnRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user = Depends(require_roles(["librarian", "admin"]))
+):
+    try:
+        result = await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "return/barcode", request.dict(),
+            lambda: TransactionService.return_by_barcode(
+                db, request.barcode, request.returned_at
+            )
+        )
+        return result
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/borrow/batch", response_model=BatchCirculationResponse)
+async def borrow_books_batch(
+    request: BatchBorrowRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user = Depends(require_roles(["student", "teacher", "librarian", "admin"]))
+):
+    user_id = request.user_id or current_user.user_id
+    if user_id != current_user.user_id and current_user.role.role_name.lower() not in ["librarian", "admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Рұқсат жеткіліксіз"
+        )
+
+    try:
+        result = await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "borrow/batch", request.dict(),
+            lambda: TransactionService.borrow_batch(
+                db, user_id, request.copy_ids, request.barcodes, request.expected_days
+            )
+        )
+        return result
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/return/batch", response_model=BatchCirculationResponse)
+async def return_books_batch(
+    request: BatchReturnRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user = Depends(require_roles(["librarian", "admin"]))
+):
+    try:
+        result = await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "return/batch", request.dict(),
+            lambda: TransactionService.return_batch(
+                db, request.transaction_ids, request.copy_ids, request.barcodes, request.returned_at
+            )
+        )
+        return result
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/renew/all", response_model=RenewAllResponse)
+async def renew_all_books(
+    days: int = 7,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user = Depends(require_roles(["student", "teacher", "librarian", "admin"]))
+):
+    try:
+        result = await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "renew/all", {"days": days},
+            lambda: TransactionService.renew_all(db, current_user.user_id, days)
+        )
+        return result
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/{transaction_id}/renew", response_model=RenewResponse)
 async def renew_book(
     transaction_id: int,
     days: int = 7,
     db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user = Depends(require_roles(["student", "teacher", "librarian", "admin"]))
 ):
     try:
-        transaction = await TransactionService.renew_book(
-            db, transaction_id, current_user.user_id, days
+        transaction = await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "renew", {"transaction_id": transaction_id, "days": days},
+            lambda: TransactionService.renew_book(
+                db, transaction_id, current_user.user_id, days
+            )
         )
         return transaction
     except ValueError as e:
@@ -68,21 +199,65 @@ async def renew_book(
 
 @router.get("/my-borrowings", response_model=List[TransactionResponse])
 async def get_my_borrowings(
+    page: int = Query(1, ge=1),
+    size: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    transactions = await TransactionService.get_user_transactions(
+        db, current_user.user_id, status_filter="active", page=page, size=size
+    )
+    return transactions
+
+@router.get("/my-history", response_model=List[TransactionResponse])
+async def get_my_history(
+    include_history: bool = False,
+    page: int = Query(1, ge=1),
+    size: int = Query(50, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     transactions = await TransactionService.get_user_transactions(
-        db, current_user.user_id, status_filter="active"
+        db, current_user.user_id, page=page, size=size, include_history=include_history
     )
     return transactions
 
-@router.get("/overdue", response_model=List[TransactionResponse])
+@router.get("/my-account", response_model=PatronSnapshotResponse)
+async def get_my_account(
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    snapshot = await CirculationService.get_snapshot(db, current_user.user_id)
+    if not snapshot:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Пайдаланушы табылмады"
+        )
+    return snapshot
+
+@router.get("/overdue", response_model=OverduePage)
 async def get_overdue_books(
+    cursor: Optional[str] = Query(None),
+    size: int = Query(50, ge=1, le=500),
+    sort: str = Query("days_desc", pattern="^(days_desc|days_asc)$"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     db: Session = Depends(get_db),
     current_user = Depends(require_roles(["librarian", "admin"]))
 ):
-    transactions = await TransactionService.get_overdue_transactions(db)
-    return transactions
+    if format == "ndjson":
+        return StreamingResponse(
+            TransactionService.stream_overdue_transactions(db, sort),
+            media_type="application/x-ndjson"
+        )
+
+    try:
+        page = await TransactionService.get_overdue_transactions(db, cursor, size, sort)
+        return page
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 @router.post("/reservations", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
 async def create_reservation(
@@ -103,11 +278,12 @@ async def create_reservation(
 
 @router.get("/reservations/my", response_model=List[ReservationResponse])
 async def get_my_reservations(
+    include_closed: bool = False,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     reservations = await ReservationService.get_user_reservations(
-        db, current_user.user_id
+        db, current_user.user_id, include_closed
     )
     return reservations
 
@@ -129,21 +305,80 @@ async def cancel_reservation(
 
 @router.get("/fines/my", response_model=List[FineResponse])
 async def get_my_fines(
+    page: int = Query(1, ge=1),
+    size: int = Query(50, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    fines = await TransactionService.get_user_fines(db, current_user.user_id)
+    fines = await TransactionService.get_user_fines(db, current_user.user_id, page, size)
     return fines
 
+@router.get("/fines/balance", response_model=FineBalanceResponse)
+async def get_my_fine_balance(
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    balance = await FineService.get_balance(db, current_user.user_id)
+    if not balance:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Пайдаланушы табылмады"
+        )
+    return balance
+
+@router.get("/fines/ledger", response_model=FineLedgerPage)
+async def get_my_fine_ledger(
+    cursor: Optional[str] = None,
+    size: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    try:
+        return await FineService.get_ledger(db, current_user.user_id, cursor, size)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/fines/pay-all", response_model=FinePaymentResult)
+async def pay_all_fines(
+    request: FinePaymentRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user = Depends(get_current_active_user)
+):
+    user_id = request.user_id or current_user.user_id
+    if user_id != current_user.user_id and current_user.role.role_name.lower() not in ["librarian", "admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Рұқсат жеткіліксіз"
+        )
+
+    try:
+        return await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "fines/pay-all", request.dict(),
+            lambda: FineService.pay_all(db, user_id, request.amount, current_user.user_id)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @router.post("/fines/{fine_id}/pay")
 async def pay_fine(
     fine_id: int,
     amount: float,
     db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user = Depends(get_current_active_user)
 ):
     try:
-        fine = await TransactionService.pay_fine(db, fine_id, current_user.user_id, amount)
+        fine = await IdempotencyService.run(
+            db, current_user.user_id, idempotency_key, "fines/pay", {"fine_id": fine_id, "amount": amount},
+            lambda: FineService.pay_fine(db, fine_id, current_user.user_id, amount)
+        )
         return fine
     except ValueError as e:
         raise HTTPException(
@@ -151,12 +386,59 @@ async def pay_fine(
             detail=str(e)
         )
 
-@router.get("/all", response_model=List[TransactionResponse])
+@router.post("/fines/{fine_id}/waive", response_model=FineResponse)
+async def waive_fine(
+    fine_id: int,
+    request: FineWaiveRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_roles(["librarian", "admin"]))
+):
+    try:
+        return await FineService.waive_fine(db, fine_id, current_user.user_id, request.reason)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/fines/accrue", response_model=FineAccrualResult)
+async def accrue_fines(
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_user = Depends(require_roles(["admin"]))
+):
+    return await run_in_threadpool(FineService.accrue_fines, db, None, dry_run)
+
+@router.get("/all", response_model=TransactionPage)
 async def get_all_transactions(
-    user_id: int = None,
-    status: str = None,
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    book_id: Optional[int] = None,
+    copy_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None),
+    size: int = Query(50, ge=1, le=500),
+    format: str = Query("json", pattern="^(json|ndjson|csv)$"),
     db: Session = Depends(get_db),
     current_user = Depends(require_roles(["librarian", "admin"]))
 ):
-    transactions = await TransactionService.get_all_transactions(db, user_id, status)
-    return transactions
\ No newline at end of file
+    if format != "json":
+        return StreamingResponse(
+            TransactionService.stream_transactions(
+                db, format, user_id, status, date_from, date_to, book_id, copy_id
+            ),
+            media_type="text/csv" if format == "csv" else "application/x-ndjson",
+            headers={"Content-Disposition": f"attachment; filename=transactions.{format}"}
+        )
+
+    try:
+        page = await TransactionService.get_all_transactions(
+            db, user_id, status, date_from, date_to, book_id, copy_id, cursor, size
+        )
+        return page
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
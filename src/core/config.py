@@ -13,6 +13,13 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+    PRINCIPAL_CACHE_TTL: int = 60
+    TOKEN_CACHE_SIZE: int = 10000
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    REVOCATION_REBUILD_INTERVAL: int = 900
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
 
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
@@ -22,9 +29,73 @@ class Settings(BaseSettings):
     DEFAULT_BORROW_DAYS: int = 14
     MAX_BORROW_DAYS: int = 30
     RESERVATION_EXPIRE_DAYS: int = 7
+    HOLD_PICKUP_DAYS: int = 3
+    HOLD_QUEUE_TTL: int = 86400
+    RESERVATION_EXPIRY_INTERVAL: int = 300
+    RESERVATION_EXPIRY_CHUNK: int = 5000
+    MAX_ACTIVE_LOANS: int = 5
+    MAX_ACTIVE_RESERVATIONS: int = 3
+    PATRON_SNAPSHOT_TTL: int = 3600
+    USER_TRANSACTIONS_CACHE_TTL: int = 300
+    MAX_BATCH_SIZE: int = 100
+    MAX_RENEWALS: int = 2
+    ROLE_MAX_LOAN_DAYS: dict = {"student": 30, "teacher": 90, "librarian": 90, "admin": 90}
+    BARCODE_CACHE_SIZE: int = 10000
+    BARCODE_LOCAL_TTL: int = 30
+
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_HOT_MONTHS: int = 12
+    PARTITION_MAINTENANCE_INTERVAL: int = 86400
+    ARCHIVE_TABLESPACE: Optional[str] = os.getenv("ARCHIVE_TABLESPACE")
+
+    IDEMPOTENCY_TTL: int = 86400
+    IDEMPOTENCY_LOCK_TIMEOUT: int = 60
+    IDEMPOTENCY_CLEANUP_INTERVAL: int = 3600
+
+    TASK_BROKER: str = os.getenv("TASK_BROKER", "rabbitmq")  # rabbitmq, memory
+    TASK_OUTBOX_BATCH: int = 500
+    TASK_OUTBOX_POLL_INTERVAL: float = 0.5
+    TASK_WORKERS_INPROCESS: int = int(os.getenv("TASK_WORKERS_INPROCESS", "0"))
+    NOTIFICATION_BATCH_SIZE: int = 100
+    BROADCAST_CHUNK_SIZE: int = 5000
+    UNREAD_COUNT_TTL: int = 600
+    NOTIFICATION_RETENTION_DAYS: int = 180
+    NOTIFICATION_RETENTION_CHUNK: int = 5000
+    NOTIFICATION_RETENTION_INTERVAL: int = 3600
+    NOTIFICATION_ARCHIVE: bool = os.getenv("NOTIFICATION_ARCHIVE", "False").lower() == "true"
+    EVENT_HEARTBEAT_SECONDS: int = 25
+    EVENT_BUFFER_SIZE: int = 64
+    EVENT_MAX_BOOKS: int = 50
+    NOTIFICATION_COALESCE_WINDOW: int = 120
+    NOTIFICATION_COALESCE_TYPES: list = ["borrow", "renew", "fine", "reservation"]
+    NOTIFICATION_FLUSH_INTERVAL: int = 15
+    DAILY_DIGEST_INTERVAL: int = 86400
+    DUE_REMINDER_DAYS: int = 3
+    DUE_REMINDER_INTERVAL: int = 3600
+    DUE_REMINDER_CHUNK: int = 5000
+    SMTP_HOST: str = os.getenv("SMTP_HOST", "localhost")
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "25"))
+    SMTP_FROM: str = os.getenv("SMTP_FROM", "library@university.edu")
+    SMTP_POOL_SIZE: int = 4
+    SMTP_RATE_LIMIT: float = float(os.getenv("SMTP_RATE_LIMIT", "50"))
+    SMS_PROVIDER: str = os.getenv("SMS_PROVIDER", "fake")  # fake, http
+    SMS_GATEWAY_URL: str = os.getenv("SMS_GATEWAY_URL", "http://localhost:9090/sms")
+    SMS_GATEWAY_TOKEN: Optional[str] = os.getenv("SMS_GATEWAY_TOKEN")
+    SMS_BATCH_SIZE: int = 100
+    SMS_RATE_LIMIT: float = float(os.getenv("SMS_RATE_LIMIT", "20"))
+    DELIVERY_METRICS_INTERVAL: int = 30
 
     FINE_PER_DAY: float = 50.0
     MAX_FINE_AMOUNT: float = 5000.0
+    FINE_BLOCK_THRESHOLD: float = 1000.0
+
+    SCHEDULER_ENABLED: bool = os.getenv("SCHEDULER_ENABLED", "True").lower() == "true"
+    SCHEDULER_LEADER_TTL: int = 30
+    OVERDUE_SWEEP_INTERVAL: int = 600
+    OVERDUE_SWEEP_CHUNK: int = 5000
+    FINE_ACCRUAL_INTERVAL: int = 86400
+    FINE_ACCRUAL_CHUNK: int = 50000
+    FINE_ACCRUAL_SAMPLE_SIZE: int = 100
 
     class Config:
         env_file = ".env"
@@ -1,3 +1,8 @@
+import os
+from importlib import import_module
+
+from alembic import command
+from alembic.config import Config
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -14,6 +19,11 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+
+MODEL_MODULES = ("user", "book", "transaction", "notification", "audit", "idempotency", "task")
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "migrations")
+
 def get_db() -> Generator:
     db = SessionLocal()
     try:
@@ -22,5 +32,14 @@ def get_db() -> Generator:
         db.close()
 
 def init_db() -> None:
+    # Барлық кесте Base.metadata-ға create_all алдында тіркелуі керек
+    for name in MODEL_MODULES:
+        import_module(f"..models.{name}", __package__)
+
+    Base.metadata.create_all(bind=engine)
 
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    # create_all тек жетіспейтін кестелерді құрады; бағандар мен индекстерді миграциялар жеткізеді
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
+    command.upgrade(config, "head")
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import json
+import redis
+import redis.asyncio as aioredis
+
+from .cache import get_redis
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, channels: List[str], buffer_size: int):
+        self.channels = channels
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max(buffer_size, 2))
+        self.dropped = 0
+
+    def push(self, event: str) -> None:
+        if self.queue.full():
+            # Баяу клиент: буфер тазаланады, клиент күйді API арқылы қайта алуы керек
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(json.dumps({"type": "resync"}))
+        self.queue.put_nowait(event)
+
+    async def next(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventHub:
+    PATTERN = "events:*"
+
+    _subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+    _listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def user_channel(user_id: int) -> str:
+        return f"events:user:{user_id}"
+
+    @staticmethod
+    def book_channel(book_id: int) -> str:
+        return f"events:book:{book_id}"
+
+    @staticmethod
+    def publish(events: List[Tuple[str, Dict[str, Any]]]) -> None:
+        if not events:
+            return
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for channel, event in events:
+                pipe.publish(channel, json.dumps(event, default=str))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Оқиғаны жариялау қатесі: {e}")
+
+    @staticmethod
+    def publish_availability(entries: List[Dict[str, Any]]) -> None:
+        by_book = {}
+        for entry in entries:
+            by_book.setdefault(entry["book_id"], []).append({
+                "copy_id": entry["copy_id"], "barcode": entry["barcode"], "status": entry["status"]
+            })
+
+        EventHub.publish([
+            (EventHub.book_channel(book_id), {"type": "availability", "book_id": book_id, "copies": copies})
+            for book_id, copies in by_book.items()
+        ])
+
+    @classmethod
+    def subscribe(cls, channels: List[str]) -> Subscription:
+        subscription = Subscription(channels, settings.EVENT_BUFFER_SIZE)
+        for channel in channels:
+            cls._subscribers[channel].add(subscription)
+        return subscription
+
+    @classmethod
+    def unsubscribe(cls, subscription: Subscription) -> None:
+        for channel in subscription.channels:
+            subscribers = cls._subscribers.get(channel)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del cls._subscribers[channel]
+
+    @classmethod
+    def connections(cls) -> int:
+        return len({id(subscription) for subscribers in cls._subscribers.values() for subscription in subscribers})
+
+    @classmethod
+    def start(cls) -> None:
+        if cls._listener is None:
+            cls._listener = asyncio.create_task(cls._listen())
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._listener is not None:
+            cls._listener.cancel()
+            await asyncio.gather(cls._listener, return_exceptions=True)
+            cls._listener = None
+
+    @classmethod
+    async def _listen(cls) -> None:
+        # Бір процесте Redis-ке бір ғана жазылым: қосылымдар саны Redis байланыстарына әсер етпейді
+        while True:
+            client = aioredis.Redis.from_url(settings.REDIS_URL)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(cls.PATTERN)
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    subscribers = cls._subscribers.get(message["channel"].decode())
+                    if not subscribers:
+                        continue
+                    event = message["data"].decode()
+                    for subscription in list(subscribers):
+                        subscription.push(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Оқиғалар арнасының қатесі: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+                await client.close()
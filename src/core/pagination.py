@@ -0,0 +1,19 @@
+from typing import Any, List
+import base64
+import json
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Курсор жарамсыз")
+
+    if not isinstance(values, list):
+        raise ValueError("Курсор жарамсыз")
+    return values
@@ -0,0 +1,144 @@
+from typing import Iterable, Optional
+from fastapi import HTTPException, status
+import asyncio
+import hashlib
+import logging
+import math
+import time
+import redis
+import redis.asyncio as aioredis
+
+from .cache import get_redis
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    KEY = "revoked_tokens"
+    CHANNEL = "revoked_tokens:events"
+
+    _bloom: Optional[BloomFilter] = None
+    _listener: Optional[asyncio.Task] = None
+
+    @classmethod
+    def revoke(cls, jti: str, expires_at: float) -> None:
+        # Мерзімі өткен токенді сақтаудың қажеті жоқ: оны JWT тексерісі өзі қабылдамайды
+        if expires_at <= time.time():
+            return
+
+        try:
+            pipe = get_redis().pipeline()
+            pipe.zadd(cls.KEY, {jti: expires_at})
+            pipe.publish(cls.CHANNEL, jti)
+            pipe.execute()
+        except redis.RedisError as e:
+            # Қайтару жазылмаса, токен жарамды күйде қалады: сәтті жауап беруге болмайды
+            logger.error(f"Токенді қайтару қатесі: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Токенді қайтару мүмкін болмады, кейінірек қайталаңыз",
+                headers={"Retry-After": "1"},
+            )
+
+        if cls._bloom is not None:
+            cls._bloom.add(jti)
+
+    @classmethod
+    def is_revoked(cls, jti: str) -> bool:
+        # Сүзгіде жоқ болса, токен қайтарылмаған: Redis-ке сұраныс жіберілмейді
+        bloom = cls._bloom
+        if bloom is not None and jti not in bloom:
+            return False
+
+        try:
+            expires_at = get_redis().zscore(cls.KEY, jti)
+        except redis.RedisError as e:
+            # Сүзгі сәйкестік тапты не жоқ, ал Redis растай алмайды: токенді қабылдамаймыз
+            logger.error(f"Қайтарылған токенді тексеру қатесі: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Токенді тексеру мүмкін болмады, кейінірек қайталаңыз",
+                headers={"Retry-After": "1"},
+            )
+        return expires_at is not None and expires_at > time.time()
+
+    @classmethod
+    def rebuild(cls) -> int:
+        redis_client = get_redis()
+        now = time.time()
+        redis_client.zremrangebyscore(cls.KEY, "-inf", now)
+        revoked = redis_client.zrangebyscore(cls.KEY, now, "+inf")
+
+        bloom = BloomFilter(
+            max(settings.REVOCATION_BLOOM_CAPACITY, len(revoked) * 2),
+            settings.REVOCATION_BLOOM_ERROR_RATE
+        )
+        for jti in revoked:
+            bloom.add(jti.decode())
+
+        cls._bloom = bloom
+        return len(revoked)
+
+    @classmethod
+    def start(cls) -> None:
+        if cls._listener is None:
+            cls._listener = asyncio.create_task(cls._listen())
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._listener is not None:
+            cls._listener.cancel()
+            await asyncio.gather(cls._listener, return_exceptions=True)
+            cls._listener = None
+
+    @classmethod
+    async def _listen(cls) -> None:
+        while True:
+            client = aioredis.Redis.from_url(settings.REDIS_URL)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(cls.CHANNEL)
+                # Жазылғаннан кейін құрамыз: арадағы қайтарулар жоғалмайды
+                await asyncio.to_thread(cls.rebuild)
+                rebuilt_at = time.monotonic()
+
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message" and cls._bloom is not None:
+                        cls._bloom.add(message["data"].decode())
+
+                    # Сүзгіден өшіру мүмкін емес: мерзімі өткендер қайта құру кезінде түседі
+                    if time.monotonic() - rebuilt_at > settings.REVOCATION_REBUILD_INTERVAL:
+                        await asyncio.to_thread(cls.rebuild)
+                        rebuilt_at = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Синхрондау үзілгенде әр тексеру Redis арқылы өтеді
+                cls._bloom = None
+                logger.warning(f"Қайтарылған токендер арнасының қатесі: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+                await client.close()
@@ -0,0 +1,154 @@
+from typing import Callable, Any, List, Tuple
+import asyncio
+import logging
+import socket
+import uuid
+import time
+import os
+import redis
+
+from .cache import get_redis
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+# Ие болса мерзімін ұзартады, бос болса алады; басқа дананың кілтіне тимейді
+_ACQUIRE_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if current == ARGV[1] then
+    redis.call('expire', KEYS[1], ARGV[2])
+    return 1
+end
+if not current then
+    redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Көшбасшылықты тексеру мен іске қосылуды белгілеу бір қадамда; Lua бөлшек санды бүтінге кеспеуі үшін жол қайтарады
+_CLAIM_RUN_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return ARGV[3]
+end
+local last_run = tonumber(redis.call('get', KEYS[2]))
+local now = tonumber(ARGV[2])
+local interval = tonumber(ARGV[3])
+if last_run and last_run + interval > now then
+    return tostring(last_run + interval - now)
+end
+redis.call('set', KEYS[2], ARGV[2])
+return '0'
+"""
+
+
+class Scheduler:
+    LEADER_KEY = "scheduler:leader"
+
+    _jobs: List[Tuple[str, int, Callable[..., Any]]] = []
+    _tasks: List[asyncio.Task] = []
+    _instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    _leader = False
+
+    @classmethod
+    def register(cls, name: str, interval_seconds: int, job: Callable[..., Any]) -> None:
+        cls._jobs.append((name, interval_seconds, job))
+
+    @classmethod
+    def start(cls) -> None:
+        if not settings.SCHEDULER_ENABLED:
+            logger.info("Жоспарлаушы өшірулі")
+            return
+
+        cls._tasks.append(asyncio.create_task(cls._elect()))
+        for name, interval, job in cls._jobs:
+            cls._tasks.append(asyncio.create_task(cls._loop(name, interval, job)))
+
+    @classmethod
+    async def stop(cls) -> None:
+        for task in cls._tasks:
+            task.cancel()
+        await asyncio.gather(*cls._tasks, return_exceptions=True)
+        cls._tasks = []
+
+        if cls._leader:
+            try:
+                get_redis().eval(_RELEASE_SCRIPT, 1, cls.LEADER_KEY, cls._instance_id)
+            except redis.RedisError as e:
+                logger.warning(f"Жоспарлаушы көшбасшылығын босату қатесі: {e}")
+            cls._leader = False
+
+    @classmethod
+    def _acquire_leadership(cls) -> bool:
+        try:
+            return bool(get_redis().eval(
+                _ACQUIRE_SCRIPT, 1, cls.LEADER_KEY, cls._instance_id, settings.SCHEDULER_LEADER_TTL
+            ))
+        except redis.RedisError as e:
+            logger.warning(f"Жоспарлаушы көшбасшысын сайлау қатесі: {e}")
+            return False
+
+    @classmethod
+    async def _elect(cls) -> None:
+        # Тапсырмаларды тек бір дана орындайды; ол тоқтаса, кілт TTL біткенде басқасы алады
+        while True:
+            leader = await asyncio.to_thread(cls._acquire_leadership)
+            if leader != cls._leader:
+                logger.info(f"Жоспарлаушы көшбасшысы: {'осы дана' if leader else 'басқа дана'} ({cls._instance_id})")
+            cls._leader = leader
+            await asyncio.sleep(settings.SCHEDULER_LEADER_TTL / 3)
+
+    @staticmethod
+    def last_run_key(name: str) -> str:
+        return f"scheduler:last_run:{name}"
+
+    @classmethod
+    def _claim_run(cls, name: str, interval: int) -> float:
+        # Соңғы іске қосылу уақыты Redis-те: қайта қосылу немесе көшбасшы ауысуы кестені бұзбайды
+        try:
+            return float(get_redis().eval(
+                _CLAIM_RUN_SCRIPT, 2, cls.LEADER_KEY, cls.last_run_key(name), cls._instance_id, time.time(), interval
+            ))
+        except redis.RedisError as e:
+            logger.warning(f"'{name}' тапсырмасының соңғы іске қосылуын оқу қатесі: {e}")
+            return interval
+
+    @classmethod
+    async def _loop(cls, name: str, interval: int, job: Callable[..., Any]) -> None:
+        tick = max(settings.SCHEDULER_LEADER_TTL / 3, 1)
+        while True:
+            if not cls._leader:
+                await asyncio.sleep(tick)
+                continue
+
+            wait = await asyncio.to_thread(cls._claim_run, name, interval)
+            if wait > 0:
+                await asyncio.sleep(min(wait, tick))
+                continue
+
+            try:
+                await asyncio.to_thread(cls.run_job, name, job)
+            except Exception as e:
+                logger.error(f"'{name}' тапсырмасының қатесі: {e}")
+
+    @staticmethod
+    def run_job(name: str, job: Callable[..., Any]) -> Any:
+        db = SessionLocal()
+        try:
+            result = job(db)
+            logger.info(f"'{name}' тапсырмасы орындалды: {result}")
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
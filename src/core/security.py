@@ -1,12 +1,25 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+import threading
+import logging
+import asyncio
+import time
+import uuid
+import redis
 
+from .cache import get_redis
 from .config import settings
+from .revocation import RevocationList
 from ..models.user import User
+from ..schemas.user import Principal, PrincipalRole
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -19,6 +32,91 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHasher:
+    _executor: Optional[ThreadPoolExecutor] = None
+    _workers = settings.PASSWORD_HASH_WORKERS
+    _lock = threading.Lock()
+    _pending = 0
+    _completed = 0
+    _rejected = 0
+    _wait_seconds = 0.0
+    _work_seconds = 0.0
+
+    @classmethod
+    def configure(cls, workers: int) -> None:
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=False)
+                cls._executor = None
+            cls._workers = workers
+            cls._completed = cls._rejected = 0
+            cls._wait_seconds = cls._work_seconds = 0.0
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=cls._workers, thread_name_prefix="password-hash")
+            return cls._executor
+
+    @classmethod
+    def _timed(cls, submitted: float, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            with cls._lock:
+                cls._completed += 1
+                cls._wait_seconds += started - submitted
+                cls._work_seconds += finished - started
+
+    @classmethod
+    async def _run(cls, func, *args):
+        # workers=0: бұрынғыдай оқиғалар циклінде орындалады (салыстыру үшін)
+        if cls._workers <= 0:
+            return cls._timed(time.perf_counter(), func, *args)
+
+        with cls._lock:
+            if cls._pending >= cls._workers + settings.PASSWORD_HASH_QUEUE_LIMIT:
+                cls._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Сервер бос емес, кейінірек қайталаңыз",
+                    headers={"Retry-After": "1"},
+                )
+            cls._pending += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                cls._get_executor(), cls._timed, time.perf_counter(), func, *args
+            )
+        finally:
+            with cls._lock:
+                cls._pending -= 1
+
+    @classmethod
+    async def verify(cls, plain_password: str, hashed_password: str) -> bool:
+        return await cls._run(verify_password, plain_password, hashed_password)
+
+    @classmethod
+    async def hash(cls, password: str) -> str:
+        return await cls._run(get_password_hash, password)
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {
+                "workers": cls._workers,
+                "in_flight": cls._pending,
+                "queue_depth": max(cls._pending - cls._workers, 0),
+                "completed": cls._completed,
+                "rejected": cls._rejected,
+                "avg_wait_ms": cls._wait_seconds / cls._completed * 1000 if cls._completed else 0.0,
+                "avg_hash_ms": cls._work_seconds / cls._completed * 1000 if cls._completed else 0.0,
+            }
+
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
 
@@ -27,12 +125,35 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
     return encoded_jwt
 
 
+_decoded_tokens: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_decoded_lock = threading.Lock()
+
+
+def _recall_token(token: str) -> Optional[Dict[str, Any]]:
+    with _decoded_lock:
+        payload = _decoded_tokens.get(token)
+        if payload is None:
+            return None
+        if payload["exp"] <= time.time():
+            del _decoded_tokens[token]
+            return None
+        _decoded_tokens.move_to_end(token)
+        return payload
+
+
+def _remember_token(token: str, payload: Dict[str, Any]) -> None:
+    with _decoded_lock:
+        _decoded_tokens[token] = payload
+        while len(_decoded_tokens) > settings.TOKEN_CACHE_SIZE:
+            _decoded_tokens.popitem(last=False)
+
+
 def verify_token(token: str) -> Dict[str, Any]:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -40,17 +161,79 @@ def verify_token(token: str) -> Dict[str, Any]:
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    # Бірдей токенді қайта тексермейміз: қолтаңба мен мерзім бірінші рет тексерілген
+    payload = _recall_token(token)
+    if payload:
+        return payload
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        return payload
     except JWTError:
         raise credentials_exception
 
+    if "exp" in payload:
+        _remember_token(token, payload)
+    return payload
+
+
+def principal_key(username: str, token_version: int) -> str:
+    return f"principal:{username}:{token_version}"
+
 
-def get_current_user(db: Session, token: str) -> User:
+def _load_principal(db: Session, username: str) -> Optional[Principal]:
+    user = db.query(User).options(joinedload(User.role)).filter(User.username == username).first()
+    if user is None:
+        return None
+
+    return Principal(
+        user_id=user.user_id,
+        username=user.username,
+        is_active=user.is_active,
+        role_id=user.role_id,
+        role=PrincipalRole(role_name=user.role.role_name, permissions=user.role.permissions),
+        token_version=user.token_version or 0
+    )
+
+
+def resolve_principal(db: Session, username: str, token_version: int) -> Optional[Principal]:
+    key = principal_key(username, token_version)
+    try:
+        cached = get_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Пайдаланушы кэшін оқу қатесі: {e}")
+        cached = None
+
+    if cached:
+        return Principal.parse_raw(cached)
+
+    principal = _load_principal(db, username)
+    if principal and principal.token_version == token_version:
+        try:
+            get_redis().set(key, principal.json(), ex=settings.PRINCIPAL_CACHE_TTL)
+        except redis.RedisError as e:
+            logger.warning(f"Пайдаланушы кэшін сақтау қатесі: {e}")
+    return principal
+
+
+def invalidate_principal(username: str, *token_versions: int) -> None:
+    try:
+        get_redis().delete(*[principal_key(username, version) for version in token_versions])
+    except redis.RedisError as e:
+        logger.warning(f"Пайдаланушы кэшін тазалау қатесі: {e}")
+
+
+def revoke_token(token: str) -> None:
+    payload = verify_token(token)
+    if payload.get("jti"):
+        RevocationList.revoke(payload["jti"], payload["exp"])
+    with _decoded_lock:
+        _decoded_tokens.pop(token, None)
+
+
+def get_current_user(db: Session, token: str) -> Principal:
     payload = verify_token(token)
     username: str = payload.get("sub")
 
@@ -60,13 +243,29 @@ def get_current_user(db: Session, token: str) -> User:
             detail="Токен жарамсыз",
         )
 
-    user = db.query(User).filter(User.username == username).first()
+    jti = payload.get("jti")
+    if jti and RevocationList.is_revoked(jti):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Токен қайтарылған",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    token_version = payload.get("ver", 0)
+    user = resolve_principal(db, username, token_version)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Пайдаланушы табылмады",
         )
 
+    if user.token_version != token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Токен жарамсыз немесе мерзімі өтіп кеткен",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
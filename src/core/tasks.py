@@ -0,0 +1,430 @@
+from pydantic import BaseModel
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+import threading
+import logging
+import queue
+import heapq
+import json
+import time
+
+from .config import settings
+from .database import SessionLocal
+from ..models.task import TaskOutbox
+
+logger = logging.getLogger(__name__)
+
+
+_CLAIM_OUTBOX_SQL = text("""
+    SELECT outbox_id, queue, message
+    FROM task_outbox
+    ORDER BY outbox_id
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+""")
+
+_DELETE_OUTBOX_SQL = text("DELETE FROM task_outbox WHERE outbox_id = ANY(:outbox_ids)")
+
+_OUTBOX_DEPTH_SQL = text("SELECT queue, count(*) FROM task_outbox GROUP BY queue")
+
+
+class Task:
+    def __init__(
+            self,
+            name: str,
+            payload_model: Type[BaseModel],
+            handler: Callable[[Any, List[BaseModel]], Any],
+            batch_size: int = 50,
+            max_retries: int = 5,
+            retry_delay: float = 5.0
+    ):
+        self.name = name
+        self.payload_model = payload_model
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    @property
+    def queue(self) -> str:
+        return f"ulms.{self.name}"
+
+    def backoff(self, attempt: int) -> float:
+        return self.retry_delay * (2 ** (attempt - 1))
+
+
+class MemoryBroker:
+    def __init__(self):
+        self._queues: Dict[str, "queue.Queue[dict]"] = defaultdict(queue.Queue)
+        self._delayed: List[Tuple[float, int, str, dict]] = []
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def publish(self, queue_name: str, message: dict, delay: float = 0) -> None:
+        if delay <= 0:
+            self._queues[queue_name].put(message)
+            return
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._delayed, (time.monotonic() + delay, self._seq, queue_name, message))
+
+    def _release_delayed(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, queue_name, message = heapq.heappop(self._delayed)
+                self._queues[queue_name].put(message)
+
+    def fetch(self, queue_name: str, max_messages: int, timeout: float) -> List[Tuple[Any, dict]]:
+        self._release_delayed()
+        messages = []
+        try:
+            messages.append((None, self._queues[queue_name].get(timeout=timeout)))
+            while len(messages) < max_messages:
+                messages.append((None, self._queues[queue_name].get_nowait()))
+        except queue.Empty:
+            pass
+        return messages
+
+    def ack(self, queue_name: str, tags: List[Any]) -> None:
+        pass
+
+    def depth(self, queue_name: str) -> int:
+        return self._queues[queue_name].qsize()
+
+
+class RabbitBroker:
+    def __init__(self, url: str):
+        import pika
+
+        self._pika = pika
+        self._params = pika.URLParameters(url)
+        self._local = threading.local()
+        self._declared = set()
+
+    def _channel(self):
+        channel = getattr(self._local, "channel", None)
+        if channel is None or channel.is_closed:
+            connection = self._pika.BlockingConnection(self._params)
+            channel = connection.channel()
+            self._local.connection = connection
+            self._local.channel = channel
+            # Жабылған арнаның delivery tag-тары жарамсыз: буферлер жаңа арнамен бірге басталады
+            self._local.buffers = {}
+        return channel
+
+    def _declare(self, channel, queue_name: str) -> None:
+        if queue_name in self._declared:
+            return
+        channel.queue_declare(queue=queue_name, durable=True)
+        channel.queue_declare(queue=f"{queue_name}.dead", durable=True)
+        self._declared.add(queue_name)
+
+    def _retry_queue(self, channel, queue_name: str, delay: float) -> str:
+        # RabbitMQ хабарламаны тек кезек басында өшіреді: әр кідіріс қадамына TTL-і бекітілген жеке кезек
+        ttl = int(delay * 1000)
+        retry_queue = f"{queue_name}.retry.{ttl}"
+        if retry_queue not in self._declared:
+            channel.queue_declare(queue=retry_queue, durable=True, arguments={
+                "x-message-ttl": ttl,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": queue_name,
+            })
+            self._declared.add(retry_queue)
+        return retry_queue
+
+    def _consume(self, channel, queue_name: str, prefetch: int) -> "deque":
+        buffer = self._local.buffers.get(queue_name)
+        if buffer is None:
+            buffer = self._local.buffers[queue_name] = deque()
+            channel.basic_qos(prefetch_count=prefetch)
+            channel.basic_consume(
+                queue=queue_name,
+                on_message_callback=lambda _, method, __, body: buffer.append((method.delivery_tag, body))
+            )
+        return buffer
+
+    @staticmethod
+    def _decode(body: bytes) -> dict:
+        try:
+            return json.loads(body)
+        except ValueError:
+            # Өңдеуші мұндай хабарламаны жүктемесі жоқ деп өлі кезекке жібереді
+            return {"raw": body.decode("utf-8", "replace")}
+
+    def publish(self, queue_name: str, message: dict, delay: float = 0) -> None:
+        base = queue_name[:-len(".dead")] if queue_name.endswith(".dead") else queue_name
+        channel = self._channel()
+        self._declare(channel, base)
+
+        routing_key = self._retry_queue(channel, queue_name, delay) if delay > 0 else queue_name
+        properties = self._pika.BasicProperties(delivery_mode=2, content_type="application/json")
+        channel.basic_publish(exchange="", routing_key=routing_key, body=json.dumps(message), properties=properties)
+
+    def fetch(self, queue_name: str, max_messages: int, timeout: float) -> List[Tuple[Any, dict]]:
+        channel = self._channel()
+        self._declare(channel, queue_name)
+        buffer = self._consume(channel, queue_name, max_messages)
+
+        if not buffer:
+            self._local.connection.process_data_events(time_limit=timeout)
+
+        messages = []
+        while buffer and len(messages) < max_messages:
+            tag, body = buffer.popleft()
+            messages.append((tag, self._decode(body)))
+        return messages
+
+    def ack(self, queue_name: str, tags: List[Any]) -> None:
+        # Бір арнада бірнеше тұтынушы бар: multiple=True басқа кезектің буфердегі хабарламаларын да растап жіберер еді
+        channel = self._channel()
+        for tag in tags:
+            channel.basic_ack(delivery_tag=tag)
+
+    def depth(self, queue_name: str) -> int:
+        channel = self._channel()
+        return channel.queue_declare(queue=queue_name, durable=True, passive=True).method.message_count
+
+
+class TaskQueue:
+    _tasks: Dict[str, Task] = {}
+    _broker = None
+    _wake = threading.Event()
+    _publisher: Optional[threading.Thread] = None
+    _workers: List[threading.Thread] = []
+    _stopping = threading.Event()
+    _metrics: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    _metrics_lock = threading.Lock()
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, task: Task) -> Task:
+        cls._tasks[task.name] = task
+        return task
+
+    @classmethod
+    def broker(cls):
+        with cls._lock:
+            if cls._broker is None:
+                if settings.TASK_BROKER == "rabbitmq":
+                    cls._broker = RabbitBroker(settings.RABBITMQ_URL)
+                else:
+                    cls._broker = MemoryBroker()
+            return cls._broker
+
+    @classmethod
+    def _count(cls, queue_name: str, metric: str, value: float = 1) -> None:
+        with cls._metrics_lock:
+            cls._metrics[queue_name][metric] += value
+
+    @classmethod
+    def enqueue(cls, name: str, payload: BaseModel, db: Optional[Session] = None) -> None:
+        cls.enqueue_many(name, [payload], db)
+
+    @classmethod
+    def enqueue_many(cls, name: str, payloads: List[BaseModel], db: Optional[Session] = None) -> None:
+        task = cls._tasks[name]
+        rows = [
+            {
+                "queue": task.queue,
+                "message": json.dumps({
+                    "task": name,
+                    "payload": json.loads(payload.json()),
+                    "attempt": 0,
+                    "enqueued_at": time.time(),
+                }),
+            }
+            for payload in payloads
+        ]
+        if not rows:
+            return
+
+        # Сессия берілсе, тапсырмалар шақырушының өзгерістерімен бір транзакцияда сақталады;
+        # әйтпесе жеке транзакцияда, қайтарудан бұрын жазылады
+        if db is not None:
+            db.execute(insert(TaskOutbox), rows)
+        else:
+            session = SessionLocal()
+            try:
+                session.execute(insert(TaskOutbox), rows)
+                session.commit()
+            finally:
+                session.close()
+
+        cls._wake.set()
+        cls.start_publisher()
+
+    @classmethod
+    def start_publisher(cls) -> None:
+        with cls._lock:
+            if cls._publisher is None or not cls._publisher.is_alive():
+                cls._publisher = threading.Thread(target=cls._publish_loop, name="task-publisher", daemon=True)
+                cls._publisher.start()
+
+    @classmethod
+    def publish_outbox(cls, limit: Optional[int] = None) -> int:
+        limit = limit or settings.TASK_OUTBOX_BATCH
+        db = SessionLocal()
+        try:
+            rows = db.execute(_CLAIM_OUTBOX_SQL, {"limit": limit}).all()
+            published = []
+            try:
+                broker = cls.broker()
+                for outbox_id, queue_name, message in rows:
+                    broker.publish(queue_name, json.loads(message))
+                    cls._count(queue_name, "published")
+                    published.append(outbox_id)
+            finally:
+                # Жіберілгендері ғана өшіріледі, қалғаны келесі айналымда қайта жіберіледі
+                if published:
+                    db.execute(_DELETE_OUTBOX_SQL, {"outbox_ids": published})
+                db.commit()
+            return len(published)
+        finally:
+            db.close()
+
+    @classmethod
+    def _publish_loop(cls) -> None:
+        # Басқа процестер немесе құлаған процесс қалдырған жазбалар сұрау аралығымен алынады
+        delay = 0.5
+        while True:
+            cls._wake.clear()
+            try:
+                published = cls.publish_outbox()
+                delay = 0.5
+            except Exception as e:
+                logger.warning(f"Тапсырманы брокерге жіберу қатесі: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+
+            if published < settings.TASK_OUTBOX_BATCH:
+                cls._wake.wait(settings.TASK_OUTBOX_POLL_INTERVAL)
+
+    @classmethod
+    def process(cls, task: Task, messages: List[Tuple[Any, dict]]) -> None:
+        broker = cls.broker()
+        started = time.perf_counter()
+
+        valid, payloads = [], []
+        for tag, message in messages:
+            try:
+                payloads.append(task.payload_model(**message["payload"]))
+                valid.append((tag, message))
+            except Exception as e:
+                # Жарамсыз хабарлама қайталанбайды: бірден өлі кезекке кетеді, партияның қалғаны өңделеді
+                logger.error(f"'{task.name}' тапсырмасының жарамсыз хабарламасы: {e}")
+                message["error"] = str(e)
+                broker.publish(f"{task.queue}.dead", message)
+                cls._count(task.queue, "dead_lettered")
+
+        if valid:
+            db = SessionLocal()
+            try:
+                task.handler(db, payloads)
+                cls._count(task.queue, "processed", len(valid))
+            except Exception as e:
+                db.rollback()
+                logger.error(f"'{task.name}' тапсырмасының қатесі: {e}")
+                cls._count(task.queue, "failed", len(valid))
+                for (_, message), payload in zip(valid, payloads):
+                    # Өңдеуші жүктемеге жазған прогресс қайталауға да беріледі
+                    message["payload"] = json.loads(payload.json())
+                    message["attempt"] = message.get("attempt", 0) + 1
+                    message["error"] = str(e)
+                    if message["attempt"] > task.max_retries:
+                        broker.publish(f"{task.queue}.dead", message)
+                        cls._count(task.queue, "dead_lettered")
+                    else:
+                        broker.publish(task.queue, message, delay=task.backoff(message["attempt"]))
+                        cls._count(task.queue, "retried")
+            finally:
+                db.close()
+
+        broker.ack(task.queue, [tag for tag, _ in messages if tag is not None])
+
+        elapsed = time.perf_counter() - started
+        cls._count(task.queue, "batches")
+        cls._count(task.queue, "busy_seconds", elapsed)
+        cls._count(task.queue, "lag_seconds", sum(time.time() - message.get("enqueued_at", time.time()) for _, message in valid))
+
+    @classmethod
+    def run_once(cls, names: Optional[List[str]] = None, timeout: float = 0.5) -> int:
+        handled = 0
+        for name in names or list(cls._tasks):
+            task = cls._tasks[name]
+            messages = cls.broker().fetch(task.queue, task.batch_size, timeout)
+            if messages:
+                cls.process(task, messages)
+                handled += len(messages)
+        return handled
+
+    @classmethod
+    def run_worker(cls, names: Optional[List[str]] = None) -> None:
+        logger.info(f"Тапсырмалар өңдеушісі іске қосылды: {names or list(cls._tasks)}")
+        while not cls._stopping.is_set():
+            try:
+                cls.run_once(names)
+            except Exception as e:
+                logger.error(f"Тапсырмалар өңдеушісінің қатесі: {e}")
+                time.sleep(1)
+
+    @classmethod
+    def start_workers(cls, count: int = 1, names: Optional[List[str]] = None) -> None:
+        cls._stopping.clear()
+        cls.start_publisher()
+        for i in range(count):
+            worker = threading.Thread(target=cls.run_worker, args=(names,), name=f"task-worker-{i}", daemon=True)
+            worker.start()
+            cls._workers.append(worker)
+
+    @classmethod
+    def stop_workers(cls) -> None:
+        cls._stopping.set()
+        for worker in cls._workers:
+            worker.join(timeout=5)
+        cls._workers = []
+
+    @classmethod
+    def drain(cls, timeout: float = 5.0) -> int:
+        deadline = time.monotonic() + timeout
+        handled = 0
+        while time.monotonic() < deadline:
+            published = cls.publish_outbox()
+            done = cls.run_once(timeout=0.01)
+            handled += done
+            if not done and not published:
+                break
+        return handled
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Dict[str, float]]:
+        db = SessionLocal()
+        try:
+            outbox = dict(db.execute(_OUTBOX_DEPTH_SQL).all())
+        except Exception:
+            outbox = None
+        finally:
+            db.close()
+
+        result = {}
+        for task in cls._tasks.values():
+            with cls._metrics_lock:
+                values = dict(cls._metrics[task.queue])
+            batches = values.get("batches", 0)
+            processed = values.get("processed", 0) + values.get("failed", 0)
+            try:
+                depth = cls.broker().depth(task.queue)
+            except Exception:
+                depth = -1
+            result[task.queue] = {
+                **values,
+                "depth": depth,
+                "outbox": outbox.get(task.queue, 0) if outbox is not None else -1,
+                "avg_batch_size": processed / batches if batches else 0.0,
+                "avg_lag_seconds": values.get("lag_seconds", 0) / processed if processed else 0.0,
+                "throughput_per_second": processed / values["busy_seconds"] if values.get("busy_seconds") else 0.0,
+            }
+        return result
@@ -7,7 +7,11 @@ import logging
 
 from .core.config import settings
 from .core.database import get_db, init_db
-from .api.routes import auth, books, transactions, notifications
+from .core.scheduler import Scheduler
+from .core.tasks import TaskQueue
+from .core.events import EventHub
+from .core.revocation import RevocationList
+from .api.routes import auth, books, transactions, notifications, events
 from .services.audit_service import AuditService
 from .services.search_service import SearchService
 
@@ -36,6 +40,7 @@ app.include_router(auth.router)
 app.include_router(books.router)
 app.include_router(transactions.router)
 app.include_router(notifications.router)
+app.include_router(events.router)
 
 
 @app.get("/health")
@@ -92,17 +97,92 @@ async def startup_event():
     await seed_default_data()
     logger.info("Әдепкі деректер енгізілді")
 
+    try:
+        ensure_partitions()
+    except Exception as e:
+        logger.warning(f"Транзакциялар бөлімдерін құру қатесі: {e}")
+
+    try:
+        warm_barcode_cache()
+    except Exception as e:
+        logger.warning(f"Баркод кэшін жылыту қатесі: {e}")
+
+    register_jobs()
+    Scheduler.start()
+    start_task_workers()
+    EventHub.start()
+    RevocationList.start()
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Қолданба тоқтатылуда...")
+    await Scheduler.stop()
+    await EventHub.stop()
+    await RevocationList.stop()
+    TaskQueue.stop_workers()
+
+
+def register_jobs():
+    from .services.transaction_service import TransactionService
+    from .services.fine_service import FineService
+    from .services.idempotency_service import IdempotencyService
+    from .services.partition_service import PartitionService
+    from .services.reservation_service import ReservationService
+    from .services.notification_service import NotificationService
+
+    Scheduler.register("overdue_sweep", settings.OVERDUE_SWEEP_INTERVAL, TransactionService.mark_overdue)
+    Scheduler.register("reservation_expiry", settings.RESERVATION_EXPIRY_INTERVAL, ReservationService.expire_reservations)
+    Scheduler.register("fine_accrual", settings.FINE_ACCRUAL_INTERVAL, FineService.accrue_fines)
+    Scheduler.register("idempotency_cleanup", settings.IDEMPOTENCY_CLEANUP_INTERVAL, IdempotencyService.cleanup)
+    Scheduler.register("partition_maintenance", settings.PARTITION_MAINTENANCE_INTERVAL, PartitionService.maintain)
+    Scheduler.register("notification_digest_flush", settings.NOTIFICATION_FLUSH_INTERVAL, NotificationService.flush_digests)
+    Scheduler.register("daily_digest", settings.DAILY_DIGEST_INTERVAL, NotificationService.send_daily_digests)
+    Scheduler.register("notification_retention", settings.NOTIFICATION_RETENTION_INTERVAL, NotificationService.enforce_retention)
+    Scheduler.register("due_reminders", settings.DUE_REMINDER_INTERVAL, TransactionService.send_due_reminders)
+
+
+def start_task_workers():
+    from .services import notification_service  # noqa: F401
+
+    # Outbox-та қалған тапсырмаларды (құлаған процестен де) брокерге жеткізеді
+    TaskQueue.start_publisher()
+
+    # Жадтағы брокерді тек осы процесс оқи алады, сондықтан өңдеуші міндетті
+    count = settings.TASK_WORKERS_INPROCESS
+    if settings.TASK_BROKER == "memory":
+        count = max(count, 1)
+    if count:
+        TaskQueue.start_workers(count)
+
+
+def ensure_partitions():
+    from .core.database import SessionLocal
+    from .services.partition_service import PartitionService
+
+    db = SessionLocal()
+    try:
+        PartitionService.ensure_partitions(db)
+    finally:
+        db.close()
+
+
+def warm_barcode_cache():
+    from .core.database import SessionLocal
+    from .services.barcode_service import BarcodeResolver
+
+    db = SessionLocal()
+    try:
+        BarcodeResolver.warm(db)
+    finally:
+        db.close()
 
 
 async def seed_default_data():
     from sqlalchemy.orm import sessionmaker
     from .core.database import engine
     from .models.user import Role, User
-    from .core.security import get_password_hash
+    from .core.security import PasswordHasher
 
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db = SessionLocal()
@@ -130,7 +210,7 @@ async def seed_default_data():
                 admin_user = User(
                     username="admin",
                     email="admin@university.edu",
-                    password_hash=get_password_hash("Admin1!"),
+                    password_hash=await PasswordHasher.hash("Admin1!"),
                     full_name="Басты әкімші",
                     role_id=admin_role.role_id
                 )
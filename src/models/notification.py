@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -19,5 +19,44 @@ class Notification(Base):
 
     user = relationship("User", back_populates="notifications")
 
+    __table_args__ = (
+        Index("ix_notifications_user_sent_at", "user_id", "sent_at", "notification_id"),
+        Index("ix_notifications_user_unread", "user_id", postgresql_where=(read == False)),
+        Index("ix_notifications_read_sent_at", "sent_at", "notification_id", postgresql_where=(read == True)),
+    )
+
+    def __repr__(self):
+        return f"<Notification {self.notification_id} - {self.type}>"
+
+
+class NotificationReadMark(Base):
+    __tablename__ = "notification_read_marks"
+
+    # notification_id <= read_up_to болатын хабарламалар оқылған деп саналады
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    read_up_to = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<NotificationReadMark {self.user_id} - {self.read_up_to}>"
+
+
+class NotificationJob(Base):
+    __tablename__ = "notification_jobs"
+
+    job_id = Column(Integer, primary_key=True, index=True)
+    created_by = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed
+    type = Column(String(50), nullable=False)
+    message = Column(Text, nullable=False)
+    channel = Column(String(20), default="email")
+    target = Column(Text, nullable=False, default="{}")
+    total = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    last_user_id = Column(Integer, nullable=False, default=0)  # Қайта іске қосылғанда осы жерден жалғасады
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
     def __repr__(self):
-        return f"<Notification {self.notification_id} - {self.type}>"
\ No newline at end of file
+        return f"<NotificationJob {self.job_id} - {self.status}>"
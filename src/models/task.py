@@ -0,0 +1,17 @@
+from sqlalchemy import Column, BigInteger, String, Text, DateTime
+from sqlalchemy.sql import func
+
+from src.core.database import Base
+
+
+class TaskOutbox(Base):
+    __tablename__ = "task_outbox"
+
+    # Тапсырма шақырушының транзакциясында жазылады, брокерге фондық ағын жібереді
+    outbox_id = Column(BigInteger, primary_key=True)
+    queue = Column(String(100), nullable=False)
+    message = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<TaskOutbox {self.outbox_id} - {self.queue}>"
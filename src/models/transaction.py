@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Boolean, Index, PrimaryKeyConstraint, table, column
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -9,24 +9,53 @@ from src.core.database import Base
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    transaction_id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(Integer, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     copy_id = Column(Integer, ForeignKey("book_copies.copy_id"), nullable=False)
     type = Column(String(20), nullable=False)  # borrow, return, renew
-    borrow_date = Column(DateTime(timezone=True), server_default=func.now())
+    borrow_date = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     due_date = Column(DateTime(timezone=True), nullable=False)
     return_date = Column(DateTime(timezone=True), nullable=True)
     fine_amount = Column(Numeric(10, 2), default=0.0)
     status = Column(String(20), default="active")  # active, returned, overdue, cancelled
+    renewal_count = Column(Integer, nullable=False, default=0, server_default="0")
+    reminded_at = Column(DateTime(timezone=True), nullable=True)  # мерзім ұзартылса қайта NULL болады
 
     user = relationship("User", back_populates="transactions")
     book_copy = relationship("BookCopy", back_populates="transactions")
-    fine = relationship("Fine", back_populates="transaction", uselist=False)
+    fine = relationship(
+        "Fine",
+        primaryjoin="Transaction.transaction_id == foreign(Fine.transaction_id)",
+        back_populates="transaction",
+        uselist=False
+    )
+
+    # borrow_date бойынша айлық бөлімдер: бөлім кілті бастапқы кілтке кіруі керек
+    __table_args__ = (
+        PrimaryKeyConstraint("transaction_id", "borrow_date"),
+        Index("ix_transactions_status_due_date", "status", "due_date"),
+        Index("ix_transactions_user_borrow_date", "user_id", "borrow_date"),
+        Index("ix_transactions_status_borrow_date", "status", "borrow_date"),
+        Index("ix_transactions_copy_id", "copy_id"),
+        Index(
+            "ix_transactions_open_user_due_date", "user_id", "due_date",
+            postgresql_where=status.in_(["active", "overdue"])
+        ),
+        {"postgresql_partition_by": "RANGE (borrow_date)"},
+    )
+    __mapper_args__ = {"primary_key": [transaction_id]}
 
     def __repr__(self):
         return f"<Transaction {self.transaction_id} - {self.type}>"
 
 
+# Ескі бөлімдер осы кестеге қосылады; тек тарихты оқу үшін, ORM арқылы жазылмайды
+transactions_archive = table(
+    "transactions_archive",
+    *[column(c.name) for c in Transaction.__table__.columns]
+)
+
+
 class Reservation(Base):
     __tablename__ = "reservations"
 
@@ -35,11 +64,17 @@ class Reservation(Base):
     book_id = Column(Integer, ForeignKey("books.book_id"), nullable=False)
     reserved_at = Column(DateTime(timezone=True), server_default=func.now())
     expires_at = Column(DateTime(timezone=True), nullable=False)
-    status = Column(String(20), default="active")  # active, fulfilled, cancelled, expired
+    status = Column(String(20), default="active")  # active, ready, fulfilled, cancelled, expired
+    copy_id = Column(Integer, ForeignKey("book_copies.copy_id"), nullable=True)  # ready кезінде сөреде ұсталған көшірме
 
     user = relationship("User", back_populates="reservations")
     book = relationship("Book", back_populates="reservations")
 
+    __table_args__ = (
+        Index("ix_reservations_book_reserved_at", "book_id", "reserved_at"),
+        Index("ix_reservations_status_expires_at", "status", "expires_at"),
+    )
+
     def __repr__(self):
         return f"<Reservation {self.reservation_id}>"
 
@@ -49,14 +84,56 @@ class Fine(Base):
 
     fine_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
-    transaction_id = Column(Integer, ForeignKey("transactions.transaction_id"), nullable=False)
+    transaction_id = Column(Integer, unique=True, nullable=False)  # transactions бөлімделген, сыртқы кілт жоқ
     amount = Column(Numeric(10, 2), nullable=False)
     issued_at = Column(DateTime(timezone=True), server_default=func.now())
     paid = Column(Boolean, default=False)
     paid_at = Column(DateTime(timezone=True), nullable=True)
+    paid_amount = Column(Numeric(10, 2), nullable=False, default=0, server_default="0")
+    provisional = Column(Boolean, nullable=False, default=False, server_default="false")  # кітап қайтарылғанша есептеліп тұрады
 
     user = relationship("User", back_populates="fines")
-    transaction = relationship("Transaction", back_populates="fine")
+    transaction = relationship(
+        "Transaction",
+        primaryjoin="foreign(Fine.transaction_id) == Transaction.transaction_id",
+        back_populates="fine"
+    )
+
+    def __repr__(self):
+        return f"<Fine {self.fine_id} - {self.amount}>"
+
+
+class FineLedgerEntry(Base):
+    __tablename__ = "fine_ledger"
+
+    entry_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    fine_id = Column(Integer, nullable=True)
+    entry_type = Column(String(20), nullable=False)  # charge, payment, waiver, adjustment
+    amount = Column(Numeric(10, 2), nullable=False)
+    balance_after = Column(Numeric(10, 2), nullable=True)
+    created_by = Column(Integer, ForeignKey("users.user_id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_fine_ledger_user_entry", "user_id", "entry_id"),
+    )
+
+    def __repr__(self):
+        return f"<FineLedgerEntry {self.entry_id} - {self.entry_type} {self.amount}>"
+
+
+class PatronSnapshot(Base):
+    __tablename__ = "patron_snapshots"
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    active_loans = Column(Integer, nullable=False, default=0)
+    active_reservations = Column(Integer, nullable=False, default=0)
+    unpaid_fines_total = Column(Numeric(10, 2), nullable=False, default=0)
+    blocked = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    user = relationship("User", back_populates="snapshot")
 
     def __repr__(self):
-        return f"<Fine {self.fine_id} - {self.amount}>"
\ No newline at end of file
+        return f"<PatronSnapshot {self.user_id} - {self.active_loans}>"
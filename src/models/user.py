@@ -28,6 +28,7 @@ class User(Base):
     phone_number = Column(String(20), nullable=True)
     role_id = Column(Integer, ForeignKey("roles.role_id"), nullable=False)
     is_active = Column(Boolean, default=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # өскенде бұрынғы токендер жарамсыз
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -36,6 +37,7 @@ class User(Base):
     reservations = relationship("Reservation", back_populates="user")
     notifications = relationship("Notification", back_populates="user")
     fines = relationship("Fine", back_populates="user")
+    snapshot = relationship("PatronSnapshot", back_populates="user", uselist=False)
 
     def __repr__(self):
         return f"<User {self.username}>"
\ No newline at end of file
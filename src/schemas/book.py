@@ -95,6 +95,13 @@ class BookCopyResponse(BookCopyBase):
         from_attributes = True
 
 
+class BarcodeLookupResponse(BaseModel):
+    copy_id: int
+    book_id: int
+    barcode: str
+    status: str
+
+
 class BookSearchRequest(BaseModel):
     query: Optional[str] = None
     author: Optional[str] = None
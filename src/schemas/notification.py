@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -21,4 +21,53 @@ class NotificationResponse(NotificationBase):
     notification_data: Optional[str] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class NotificationTask(NotificationBase):
+    notification_id: Optional[int] = None
+    # Қайталау кезінде орындалған қадамдар өткізіліп жіберіледі
+    published: bool = False
+    delivered: bool = False
+
+
+class NotificationPage(BaseModel):
+    items: List[NotificationResponse]
+    next_cursor: Optional[str] = None
+
+
+class UnreadCountResponse(BaseModel):
+    unread: int
+
+
+class BroadcastRequest(BaseModel):
+    type: str = "announcement"
+    message: str = Field(..., min_length=1)
+    channel: str = "email"
+    roles: Optional[List[str]] = None
+    user_ids: Optional[List[int]] = None
+    active_only: bool = True
+    registered_after: Optional[datetime] = None
+    registered_before: Optional[datetime] = None
+    has_overdue_loans: bool = False
+    has_unpaid_fines: bool = False
+
+
+class BroadcastTask(BaseModel):
+    job_id: int
+
+
+class NotificationJobResponse(BaseModel):
+    job_id: int
+    status: str
+    type: str
+    channel: str
+    total: int
+    inserted: int
+    progress: float = 0.0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 
@@ -8,6 +8,11 @@ class BorrowRequest(BaseModel):
     expected_days: int = 14
 
 
+class BarcodeBorrowRequest(BaseModel):
+    barcode: str
+    expected_days: int = 14
+
+
 class BorrowResponse(BaseModel):
     transaction_id: int
     user_id: int
@@ -20,11 +25,27 @@ class BorrowResponse(BaseModel):
         from_attributes = True
 
 
+class RenewResponse(BaseModel):
+    transaction_id: int
+    due_date: datetime
+    renewal_count: int
+
+
+class RenewAllResponse(BaseModel):
+    renewed: List[RenewResponse] = []
+    skipped: int = 0
+
+
 class ReturnRequest(BaseModel):
     transaction_id: int
     returned_at: Optional[datetime] = None
 
 
+class BarcodeReturnRequest(BaseModel):
+    barcode: str
+    returned_at: Optional[datetime] = None
+
+
 class ReturnResponse(BaseModel):
     transaction_id: int
     return_date: datetime
@@ -35,6 +56,37 @@ class ReturnResponse(BaseModel):
         from_attributes = True
 
 
+class BatchBorrowRequest(BaseModel):
+    user_id: Optional[int] = None
+    copy_ids: List[int] = []
+    barcodes: List[str] = []
+    expected_days: int = 14
+
+
+class BatchReturnRequest(BaseModel):
+    transaction_ids: List[int] = []
+    copy_ids: List[int] = []
+    barcodes: List[str] = []
+    returned_at: Optional[datetime] = None
+
+
+class BatchItemResult(BaseModel):
+    copy_id: Optional[int] = None
+    barcode: Optional[str] = None
+    transaction_id: Optional[int] = None
+    success: bool
+    error: Optional[str] = None
+    due_date: Optional[datetime] = None
+    fine_amount: float = 0.0
+    days_overdue: int = 0
+
+
+class BatchCirculationResponse(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[BatchItemResult]
+
+
 class TransactionResponse(BaseModel):
     transaction_id: int
     user_id: int
@@ -52,6 +104,20 @@ class TransactionResponse(BaseModel):
         from_attributes = True
 
 
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+
+
+class OverdueTransactionResponse(TransactionResponse):
+    days_overdue: int = 0
+
+
+class OverduePage(BaseModel):
+    items: List[OverdueTransactionResponse]
+    next_cursor: Optional[str] = None
+
+
 class ReservationRequest(BaseModel):
     book_id: int
 
@@ -64,6 +130,8 @@ class ReservationResponse(BaseModel):
     expires_at: datetime
     status: str
     book_title: str
+    copy_id: Optional[int] = None
+    queue_position: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -77,7 +145,80 @@ class FineResponse(BaseModel):
     issued_at: datetime
     paid: bool
     paid_at: Optional[datetime] = None
+    paid_amount: float = 0.0
+    provisional: bool = False
     transaction_details: Optional[str] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class FinePaymentRequest(BaseModel):
+    amount: float
+    user_id: Optional[int] = None
+
+
+class FinePaymentResult(BaseModel):
+    user_id: int
+    amount_received: float
+    amount_applied: float
+    change: float
+    balance: float
+    settled_fine_ids: List[int] = []
+    partial_fine_id: Optional[int] = None
+
+
+class FineWaiveRequest(BaseModel):
+    reason: Optional[str] = None
+
+
+class FineBalanceResponse(BaseModel):
+    user_id: int
+    balance: float
+    blocked: bool
+
+
+class FineLedgerEntryResponse(BaseModel):
+    entry_id: int
+    user_id: int
+    fine_id: Optional[int] = None
+    entry_type: str
+    amount: float
+    balance_after: Optional[float] = None
+    created_by: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class FineLedgerPage(BaseModel):
+    items: List[FineLedgerEntryResponse]
+    next_cursor: Optional[str] = None
+
+
+class FineAccrualDiff(BaseModel):
+    transaction_id: int
+    user_id: int
+    previous_amount: float
+    accrued_amount: float
+
+
+class FineAccrualResult(BaseModel):
+    dry_run: bool
+    scanned: int
+    changed: int
+    total_delta: float
+    affected_users: int
+    sample: List[FineAccrualDiff] = []
+
+
+class PatronSnapshotResponse(BaseModel):
+    user_id: int
+    active_loans: int
+    active_reservations: int
+    unpaid_fines_total: float
+    blocked: bool
+
+    class Config:
+        from_attributes = True
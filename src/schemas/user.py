@@ -72,4 +72,22 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
-    role: Optional[str] = None
\ No newline at end of file
+    role: Optional[str] = None
+
+
+class PrincipalRole(BaseModel):
+    role_name: str
+    permissions: Optional[str] = "{}"
+
+
+class Principal(BaseModel):
+    user_id: int
+    username: str
+    is_active: bool
+    role_id: int
+    role: PrincipalRole
+    token_version: int = 0
+
+
+class UserRoleUpdate(BaseModel):
+    role_name: str
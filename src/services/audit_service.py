@@ -1,6 +1,6 @@
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc
+from sqlalchemy import and_, or_, func, desc, insert
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 import json
@@ -59,6 +59,25 @@ class AuditService:
 
         return audit_log
 
+    @staticmethod
+    async def log_actions_bulk(db: Session, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+
+        # Шақырушының транзакциясында бір INSERT арқылы жазылады, commit шақырушыда
+        db.execute(insert(AuditLog), [
+            {
+                "user_id": entry.get("user_id"),
+                "action": entry["action"],
+                "entity_type": entry.get("entity_type"),
+                "entity_id": entry.get("entity_id"),
+                "action_type": entry["action_type"],
+                "details": json.dumps(entry.get("details") or {}),
+                "status": entry.get("status", "success"),
+            }
+            for entry in entries
+        ])
+
     @staticmethod
     async def log_user_activity(
             db: Session,
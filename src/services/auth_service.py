@@ -4,7 +4,7 @@ from typing import Optional
 
 from ..models.user import User, Role
 from ..schemas.user import UserCreate
-from ..core.security import get_password_hash
+from ..core.security import PasswordHasher, invalidate_principal
 from ..services.audit_service import AuditService
 
 
@@ -21,7 +21,7 @@ class AuthService:
         user = User(
             username=user_data.username,
             email=user_data.email,
-            password_hash=get_password_hash(user_data.password),
+            password_hash=await PasswordHasher.hash(user_data.password),
             full_name=user_data.full_name,
             phone_number=user_data.phone_number,
             role_id=role.role_id
@@ -46,13 +46,11 @@ class AuthService:
 
     @staticmethod
     async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-        from ..core.security import verify_password
-
         user = db.query(User).filter(User.username == username).first()
         if not user:
             return None
 
-        if not verify_password(password, user.password_hash):
+        if not await PasswordHasher.verify(password, user.password_hash):
             return None
 
         await AuditService.log_action(
@@ -66,17 +64,15 @@ class AuthService:
 
     @staticmethod
     async def change_password(db: Session, user_id: int, old_password: str, new_password: str) -> bool:
-        from ..core.security import verify_password, get_password_hash
-
         user = db.query(User).filter(User.user_id == user_id).first()
         if not user:
             return False
 
-        if not verify_password(old_password, user.password_hash):
+        if not await PasswordHasher.verify(old_password, user.password_hash):
             return False
 
-        user.password_hash = get_password_hash(new_password)
-        db.commit()
+        user.password_hash = await PasswordHasher.hash(new_password)
+        AuthService._revoke_sessions(db, user)
 
         await AuditService.log_action(
             db,
@@ -85,4 +81,78 @@ class AuthService:
             details={}
         )
 
-        return True
\ No newline at end of file
+        return True
+
+    @staticmethod
+    async def get_user(db: Session, user_id: int) -> Optional[User]:
+        return db.query(User).filter(User.user_id == user_id).first()
+
+    @staticmethod
+    def _revoke_sessions(db: Session, user: User) -> None:
+        # Нұсқа өскенде бұрынғы токендер мен кэштегі principal бірге жарамсыз болады;
+        # кэш commit-тен кейін тазаланады, әйтпесе ескі жол қайта кэштелуі мүмкін
+        previous = user.token_version or 0
+        user.token_version = previous + 1
+        db.commit()
+        invalidate_principal(user.username, previous)
+
+    @staticmethod
+    async def revoke_all_sessions(db: Session, user_id: int, changed_by: int) -> User:
+        user = db.query(User).filter(User.user_id == user_id).first()
+        if not user:
+            raise ValueError("Пайдаланушы табылмады")
+
+        AuthService._revoke_sessions(db, user)
+        db.refresh(user)
+
+        await AuditService.log_action(
+            db,
+            user_id=changed_by,
+            action="sessions_revoked",
+            details={"user_id": user.user_id, "username": user.username}
+        )
+
+        return user
+
+    @staticmethod
+    async def set_user_active(db: Session, user_id: int, is_active: bool, changed_by: int) -> User:
+        user = db.query(User).filter(User.user_id == user_id).first()
+        if not user:
+            raise ValueError("Пайдаланушы табылмады")
+
+        user.is_active = is_active
+        db.commit()
+        invalidate_principal(user.username, user.token_version or 0)
+        db.refresh(user)
+
+        await AuditService.log_action(
+            db,
+            user_id=changed_by,
+            action="user_activated" if is_active else "user_deactivated",
+            details={"user_id": user.user_id, "username": user.username}
+        )
+
+        return user
+
+    @staticmethod
+    async def change_role(db: Session, user_id: int, role_name: str, changed_by: int) -> User:
+        user = db.query(User).filter(User.user_id == user_id).first()
+        if not user:
+            raise ValueError("Пайдаланушы табылмады")
+
+        role = db.query(Role).filter(Role.role_name == role_name).first()
+        if not role:
+            raise ValueError("Рөл табылмады")
+
+        user.role_id = role.role_id
+        AuthService._revoke_sessions(db, user)
+        db.refresh(user)
+
+        await AuditService.log_action(
+            db,
+            user_id=changed_by,
+            action="user_role_changed",
+            details={"user_id": user.user_id, "username": user.username, "role": role_name}
+        )
+
+        return user
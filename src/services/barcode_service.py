@@ -0,0 +1,112 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+import threading
+import logging
+import time
+import redis
+
+from ..core.cache import get_redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+_LOOKUP_SQL = text("""
+    SELECT copy_id, book_id, barcode, status FROM book_copies WHERE barcode = :barcode
+""")
+
+_WARM_SQL = text("""
+    SELECT copy_id, book_id, barcode, status FROM book_copies
+""")
+
+
+class BarcodeResolver:
+    HASH_KEY = "barcodes"
+
+    _local: "OrderedDict[str, tuple]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _encode(entry: Dict[str, Any]) -> str:
+        return f"{entry['copy_id']}:{entry['book_id']}:{entry['status']}"
+
+    @staticmethod
+    def _decode(barcode: str, value: bytes) -> Dict[str, Any]:
+        copy_id, book_id, status = value.decode().split(":", 2)
+        return {"copy_id": int(copy_id), "book_id": int(book_id), "barcode": barcode, "status": status}
+
+    @classmethod
+    def _remember(cls, entry: Dict[str, Any]) -> None:
+        with cls._lock:
+            cls._local[entry["barcode"]] = (entry, time.monotonic())
+            cls._local.move_to_end(entry["barcode"])
+            while len(cls._local) > settings.BARCODE_CACHE_SIZE:
+                cls._local.popitem(last=False)
+
+    @classmethod
+    def _recall(cls, barcode: str) -> Optional[Dict[str, Any]]:
+        with cls._lock:
+            cached = cls._local.get(barcode)
+            if cached is None:
+                return None
+            entry, stored_at = cached
+            if time.monotonic() - stored_at > settings.BARCODE_LOCAL_TTL:
+                del cls._local[barcode]
+                return None
+            cls._local.move_to_end(barcode)
+            return entry
+
+    @classmethod
+    def resolve(cls, db: Session, barcode: str) -> Optional[Dict[str, Any]]:
+        entry = cls._recall(barcode)
+        if entry:
+            return entry
+
+        try:
+            value = get_redis().hget(cls.HASH_KEY, barcode)
+        except redis.RedisError as e:
+            logger.warning(f"Баркод кэшін оқу қатесі: {e}")
+            value = None
+
+        if value:
+            entry = cls._decode(barcode, value)
+            cls._remember(entry)
+            return entry
+
+        row = db.execute(_LOOKUP_SQL, {"barcode": barcode}).mappings().first()
+        if not row:
+            return None
+
+        entry = dict(row)
+        cls.store([entry])
+        return entry
+
+    @classmethod
+    def store(cls, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+
+        for entry in entries:
+            cls._remember(entry)
+
+        try:
+            get_redis().hset(cls.HASH_KEY, mapping={
+                entry["barcode"]: cls._encode(entry) for entry in entries
+            })
+        except redis.RedisError as e:
+            logger.warning(f"Баркод кэшін жаңарту қатесі: {e}")
+
+    @classmethod
+    def warm(cls, db: Session, chunk_size: int = 5000) -> int:
+        redis_client = get_redis()
+        result = db.execute(_WARM_SQL.execution_options(stream_results=True, yield_per=chunk_size))
+
+        total = 0
+        for rows in result.mappings().partitions():
+            redis_client.hset(cls.HASH_KEY, mapping={row["barcode"]: cls._encode(row) for row in rows})
+            total += len(rows)
+
+        logger.info(f"Баркод кэші жылытылды: {total} көшірме")
+        return total
@@ -9,11 +9,13 @@ from ..models.user import User
 from ..schemas.book import (
     BookCreate, BookResponse, BookUpdate, BookSearchRequest,
     BookSearchResponse, BookCopyCreate, BookCopyResponse,
-    AuthorCreate, AuthorResponse, CategoryCreate, CategoryResponse
+    AuthorCreate, AuthorResponse, CategoryCreate, CategoryResponse, BarcodeLookupResponse
 )
 from ..core.config import settings
+from ..core.events import EventHub
 from ..services.audit_service import AuditService
 from ..services.search_service import SearchService
+from ..services.barcode_service import BarcodeResolver
 
 
 class BookService:
@@ -244,6 +246,9 @@ class BookService:
 
         redis_client = redis.Redis.from_url(settings.REDIS_URL)
         redis_client.delete(f"book:{book_id}")
+        copies = [{"copy_id": copy.copy_id, "book_id": copy.book_id, "barcode": copy.barcode, "status": copy.status}]
+        BarcodeResolver.store(copies)
+        EventHub.publish_availability(copies)
 
         await AuditService.log_action(
             db,
@@ -262,6 +267,14 @@ class BookService:
             acquired_date=copy.acquired_date
         )
 
+    @staticmethod
+    async def get_copy_by_barcode(db: Session, barcode: str) -> Optional[BarcodeLookupResponse]:
+        entry = BarcodeResolver.resolve(db, barcode)
+        if not entry:
+            return None
+
+        return BarcodeLookupResponse(**entry)
+
     @staticmethod
     async def get_book_copies(db: Session, book_id: int, status_filter: Optional[str] = None) -> List[BookCopyResponse]:
         query = db.query(BookCopy).filter(BookCopy.book_id == book_id)
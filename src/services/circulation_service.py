@@ -0,0 +1,229 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+import redis
+
+from ..core.cache import get_redis
+from ..core.config import settings
+from ..schemas.transaction import PatronSnapshotResponse
+
+logger = logging.getLogger(__name__)
+
+
+_SNAPSHOT_COLUMNS = "user_id, active_loans, active_reservations, unpaid_fines_total, blocked"
+
+_REBUILD_SQL = text(f"""
+    INSERT INTO patron_snapshots ({_SNAPSHOT_COLUMNS}, updated_at)
+    SELECT u.user_id,
+           (SELECT count(*) FROM transactions t
+            WHERE t.user_id = u.user_id AND t.status IN ('active', 'overdue')),
+           (SELECT count(*) FROM reservations r
+            WHERE r.user_id = u.user_id AND r.status IN ('active', 'ready')),
+           unpaid.total,
+           unpaid.total > :fine_limit,
+           now()
+    FROM users u
+    CROSS JOIN LATERAL (
+        SELECT coalesce(sum(f.amount - f.paid_amount), 0) AS total
+        FROM fines f
+        WHERE f.user_id = u.user_id AND NOT f.paid
+    ) unpaid
+    WHERE u.user_id = :user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        active_loans = EXCLUDED.active_loans,
+        active_reservations = EXCLUDED.active_reservations,
+        unpaid_fines_total = EXCLUDED.unpaid_fines_total,
+        blocked = EXCLUDED.blocked,
+        updated_at = EXCLUDED.updated_at
+    RETURNING {_SNAPSHOT_COLUMNS}
+""")
+
+_APPLY_DELTA_SQL = text(f"""
+    UPDATE patron_snapshots
+    SET active_loans = active_loans + :loans,
+        active_reservations = active_reservations + :reservations,
+        unpaid_fines_total = unpaid_fines_total + :fines,
+        blocked = unpaid_fines_total + :fines > :fine_limit,
+        updated_at = now()
+    WHERE user_id = :user_id
+      AND (:max_reservations IS NULL OR active_reservations + :reservations <= :max_reservations)
+    RETURNING {_SNAPSHOT_COLUMNS}
+""")
+
+_APPLY_DELTAS_SQL = text("""
+    UPDATE patron_snapshots s
+    SET active_loans = s.active_loans + d.loans,
+        active_reservations = s.active_reservations + d.reservations,
+        unpaid_fines_total = s.unpaid_fines_total + d.fines,
+        blocked = s.unpaid_fines_total + d.fines > :fine_limit,
+        updated_at = now()
+    FROM unnest(
+        CAST(:user_ids AS integer[]),
+        CAST(:loans AS integer[]),
+        CAST(:reservations AS integer[]),
+        CAST(:fines AS numeric[])
+    ) AS d(user_id, loans, reservations, fines)
+    WHERE s.user_id = d.user_id
+    RETURNING s.user_id, s.active_loans, s.active_reservations, s.unpaid_fines_total, s.blocked
+""")
+
+_LOCK_SQL = text("""
+    SELECT s.user_id, s.active_loans, s.active_reservations, s.unpaid_fines_total, s.blocked, u.is_active
+    FROM patron_snapshots s
+    JOIN users u ON u.user_id = s.user_id
+    WHERE s.user_id = :user_id
+    FOR UPDATE OF s
+""")
+
+_SELECT_SQL = text(f"SELECT {_SNAPSHOT_COLUMNS} FROM patron_snapshots WHERE user_id = :user_id")
+
+
+class CirculationService:
+    @staticmethod
+    def cache_key(user_id: int) -> str:
+        return f"user:{user_id}:circulation"
+
+    @staticmethod
+    def rebuild_snapshot(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+        row = db.execute(_REBUILD_SQL, {
+            "user_id": user_id,
+            "fine_limit": settings.FINE_BLOCK_THRESHOLD,
+        }).mappings().first()
+        return dict(row) if row else None
+
+    @staticmethod
+    def apply_delta(
+            db: Session,
+            user_id: int,
+            loans: int = 0,
+            reservations: int = 0,
+            fines: float = 0.0,
+            max_reservations: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        params = {
+            "user_id": user_id,
+            "loans": loans,
+            "reservations": reservations,
+            "fines": fines,
+            "fine_limit": settings.FINE_BLOCK_THRESHOLD,
+            "max_reservations": max_reservations,
+        }
+        row = db.execute(_APPLY_DELTA_SQL, params).mappings().first()
+        if row:
+            return dict(row)
+
+        exists = db.execute(_SELECT_SQL, {"user_id": user_id}).first()
+        if exists:
+            return None
+
+        # Снимок әлі жоқ: негізгі кестелерден есептейміз, ағымдағы өзгерістер оған кіреді
+        snapshot = CirculationService.rebuild_snapshot(db, user_id)
+        if snapshot and max_reservations is not None and snapshot["active_reservations"] > max_reservations:
+            return None
+        return snapshot
+
+    @staticmethod
+    def apply_deltas(db: Session, deltas: Dict[int, Tuple[int, int, float]]) -> List[Dict[str, Any]]:
+        if not deltas:
+            return []
+
+        user_ids = sorted(deltas)
+        rows = db.execute(_APPLY_DELTAS_SQL, {
+            "user_ids": user_ids,
+            "loans": [deltas[user_id][0] for user_id in user_ids],
+            "reservations": [deltas[user_id][1] for user_id in user_ids],
+            "fines": [deltas[user_id][2] for user_id in user_ids],
+            "fine_limit": settings.FINE_BLOCK_THRESHOLD,
+        }).mappings().all()
+
+        snapshots = [dict(row) for row in rows]
+        updated = {snapshot["user_id"] for snapshot in snapshots}
+        for user_id in user_ids:
+            if user_id not in updated:
+                snapshot = CirculationService.rebuild_snapshot(db, user_id)
+                if snapshot:
+                    snapshots.append(snapshot)
+
+        return snapshots
+
+    @staticmethod
+    def lock_snapshot(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+        row = db.execute(_LOCK_SQL, {"user_id": user_id}).mappings().first()
+        if row is None:
+            if not CirculationService.rebuild_snapshot(db, user_id):
+                return None
+            row = db.execute(_LOCK_SQL, {"user_id": user_id}).mappings().first()
+        return dict(row) if row else None
+
+    @staticmethod
+    def cache_snapshots(snapshots: List[Dict[str, Any]]) -> None:
+        for snapshot in snapshots:
+            CirculationService.cache_snapshot(snapshot)
+
+    @staticmethod
+    def cache_snapshot(snapshot: Optional[Dict[str, Any]]) -> None:
+        if not snapshot:
+            return
+
+        key = CirculationService.cache_key(snapshot["user_id"])
+        try:
+            redis_client = get_redis()
+            pipe = redis_client.pipeline()
+            pipe.hset(key, mapping={
+                "active_loans": int(snapshot["active_loans"]),
+                "active_reservations": int(snapshot["active_reservations"]),
+                "unpaid_fines_total": str(snapshot["unpaid_fines_total"]),
+                "blocked": int(bool(snapshot["blocked"])),
+            })
+            pipe.expire(key, settings.PATRON_SNAPSHOT_TTL)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Оқырман снимогын кэштеу қатесі: {e}")
+
+    @staticmethod
+    def invalidate(*user_ids: int) -> None:
+        if not user_ids:
+            return
+        try:
+            get_redis().delete(*[CirculationService.cache_key(user_id) for user_id in user_ids])
+        except redis.RedisError as e:
+            logger.warning(f"Оқырман снимогын тазалау қатесі: {e}")
+
+    @staticmethod
+    async def get_snapshot(db: Session, user_id: int) -> Optional[PatronSnapshotResponse]:
+        key = CirculationService.cache_key(user_id)
+        try:
+            cached = get_redis().hgetall(key)
+        except redis.RedisError as e:
+            logger.warning(f"Оқырман снимогын оқу қатесі: {e}")
+            cached = None
+
+        if cached:
+            return PatronSnapshotResponse(
+                user_id=user_id,
+                active_loans=int(cached[b"active_loans"]),
+                active_reservations=int(cached[b"active_reservations"]),
+                unpaid_fines_total=float(cached[b"unpaid_fines_total"]),
+                blocked=cached[b"blocked"] == b"1"
+            )
+
+        row = db.execute(_SELECT_SQL, {"user_id": user_id}).mappings().first()
+        if row:
+            snapshot = dict(row)
+        else:
+            snapshot = CirculationService.rebuild_snapshot(db, user_id)
+            db.commit()
+
+        if not snapshot:
+            return None
+
+        CirculationService.cache_snapshot(snapshot)
+
+        return PatronSnapshotResponse(
+            user_id=user_id,
+            active_loans=snapshot["active_loans"],
+            active_reservations=snapshot["active_reservations"],
+            unpaid_fines_total=float(snapshot["unpaid_fines_total"]),
+            blocked=snapshot["blocked"]
+        )
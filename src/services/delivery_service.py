@@ -0,0 +1,267 @@
+from collections import defaultdict, deque
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+import smtplib
+import logging
+import socket
+import queue
+import json
+import time
+import redis
+import httpx
+
+from ..core.cache import get_redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int = 1) -> None:
+        if self.rate <= 0:
+            return
+        # Токендер алдын ала алынады, тапшылық болса ағын сонша уақыт күтеді
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= count
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class DeliveryStats:
+    _counters: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    _lock = threading.Lock()
+
+    @classmethod
+    def record(cls, provider: str, sent: int, failed: int, seconds: float) -> None:
+        key = (provider, threading.current_thread().name)
+        with cls._lock:
+            counters = cls._counters[key]
+            counters["sent"] += sent
+            counters["failed"] += failed
+            counters["seconds"] += seconds
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Dict[str, float]]:
+        with cls._lock:
+            items = [(key, dict(counters)) for key, counters in cls._counters.items()]
+
+        result = {}
+        for (provider, worker), counters in items:
+            result[f"{socket.gethostname()}/{worker}/{provider}"] = {
+                **counters,
+                "messages_per_second": counters["sent"] / counters["seconds"] if counters["seconds"] else 0.0,
+            }
+        return result
+
+
+class SMTPChannel:
+    provider = "smtp"
+
+    _RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+    def __init__(self, host: str, port: int, sender: str, pool_size: int, rate_limit: float):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.limiter = RateLimiter(rate_limit)
+        # Байланыстар жалқау ашылады: бос орын None ретінде сақталады
+        self._pool: "queue.LifoQueue[Optional[smtplib.SMTP]]" = queue.LifoQueue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(None)
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=10)
+        connection.ehlo()
+        return connection
+
+    @staticmethod
+    def _close(connection: Optional[smtplib.SMTP]) -> None:
+        if connection is None:
+            return
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+    def _build(self, recipient: str, subject: str, body: str) -> str:
+        message = MIMEMultipart()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.attach(MIMEText(body, "plain", "utf-8"))
+        return message.as_string()
+
+    def send(self, emails: List[Tuple[str, str, str]], on_sent: Optional[Callable[[int], None]] = None) -> int:
+        if not emails:
+            return 0
+
+        started = time.perf_counter()
+        sent = 0
+        failed = 0
+        connection = self._pool.get()
+        try:
+            for index, (recipient, subject, body) in enumerate(emails):
+                self.limiter.acquire()
+                raw = self._build(recipient, subject, body)
+                for attempt in range(2):
+                    try:
+                        if connection is None:
+                            connection = self._connect()
+                        connection.sendmail(self.sender, [recipient], raw)
+                        sent += 1
+                        if on_sent:
+                            on_sent(index)
+                        break
+                    except self._RECONNECT_ERRORS as e:
+                        self._close(connection)
+                        connection = None
+                        if attempt:
+                            raise
+                        logger.warning(f"SMTP байланысы үзілді, қайта қосылу: {e}")
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                        failed += 1
+                        logger.warning(f"Email жіберілмеді ({recipient}): {e}")
+                        # Сервер бас тартқан хатты қайталаудың мәні жоқ
+                        if on_sent:
+                            on_sent(index)
+                        break
+        except Exception:
+            self._close(connection)
+            connection = None
+            raise
+        finally:
+            self._pool.put(connection)
+            DeliveryStats.record(self.provider, sent, failed, time.perf_counter() - started)
+
+        return sent
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._close(self._pool.get_nowait())
+            except queue.Empty:
+                break
+
+
+class FakeSMSSink:
+    provider = "sms-fake"
+
+    def __init__(self, keep: int = 1000):
+        self.messages: "deque[Dict[str, str]]" = deque(maxlen=keep)
+
+    def send_batch(self, messages: List[Dict[str, str]]) -> None:
+        self.messages.extend(messages)
+        logger.info(f"SMS жинақтаушы: {len(messages)} хабарлама қабылданды")
+
+
+class HttpSMSGateway:
+    provider = "sms-http"
+
+    def __init__(self, url: str, token: Optional[str]):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._client = httpx.Client(base_url=url, headers=headers, timeout=10)
+
+    def send_batch(self, messages: List[Dict[str, str]]) -> None:
+        response = self._client.post("", json={"messages": messages})
+        response.raise_for_status()
+
+
+class SMSChannel:
+    def __init__(self, gateway, batch_size: int, rate_limit: float):
+        self.gateway = gateway
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(rate_limit, burst=max(rate_limit, batch_size))
+
+    def send(self, messages: List[Tuple[str, str]], on_sent: Optional[Callable[[int], None]] = None) -> int:
+        if not messages:
+            return 0
+
+        started = time.perf_counter()
+        sent = 0
+        try:
+            for i in range(0, len(messages), self.batch_size):
+                chunk = [{"to": phone, "text": body} for phone, body in messages[i:i + self.batch_size]]
+                self.limiter.acquire(len(chunk))
+                self.gateway.send_batch(chunk)
+                sent += len(chunk)
+                if on_sent:
+                    for index in range(i, i + len(chunk)):
+                        on_sent(index)
+        finally:
+            DeliveryStats.record(self.gateway.provider, sent, 0, time.perf_counter() - started)
+
+        return sent
+
+
+class DeliveryChannels:
+    METRICS_KEY = "delivery:metrics"
+
+    _email: Optional[SMTPChannel] = None
+    _sms: Optional[SMSChannel] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def email(cls) -> SMTPChannel:
+        with cls._lock:
+            if cls._email is None:
+                cls._email = SMTPChannel(
+                    settings.SMTP_HOST,
+                    settings.SMTP_PORT,
+                    settings.SMTP_FROM,
+                    settings.SMTP_POOL_SIZE,
+                    settings.SMTP_RATE_LIMIT
+                )
+            return cls._email
+
+    @classmethod
+    def sms(cls) -> SMSChannel:
+        with cls._lock:
+            if cls._sms is None:
+                if settings.SMS_PROVIDER == "http":
+                    gateway = HttpSMSGateway(settings.SMS_GATEWAY_URL, settings.SMS_GATEWAY_TOKEN)
+                else:
+                    gateway = FakeSMSSink()
+                cls._sms = SMSChannel(gateway, settings.SMS_BATCH_SIZE, settings.SMS_RATE_LIMIT)
+            return cls._sms
+
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            if cls._email is not None:
+                cls._email.close()
+                cls._email = None
+
+    @classmethod
+    def report(cls) -> Dict[str, Dict[str, float]]:
+        stats = DeliveryStats.snapshot()
+        if stats:
+            try:
+                get_redis().hset(cls.METRICS_KEY, mapping={key: json.dumps(value) for key, value in stats.items()})
+            except redis.RedisError as e:
+                logger.warning(f"Жеткізу метрикасын сақтау қатесі: {e}")
+        return stats
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        try:
+            stored = get_redis().hgetall(cls.METRICS_KEY)
+        except redis.RedisError as e:
+            logger.warning(f"Жеткізу метрикасын оқу қатесі: {e}")
+            stored = {}
+
+        result = {key.decode(): json.loads(value) for key, value in stored.items()}
+        result.update(DeliveryStats.snapshot())
+        return result
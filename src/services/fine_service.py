@@ -0,0 +1,408 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text, insert
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, List, Dict, Any
+import logging
+
+from ..core.config import settings
+from ..core.pagination import encode_cursor, decode_cursor
+from ..models.transaction import Fine, FineLedgerEntry
+from ..schemas.transaction import (
+    FineAccrualResult, FineAccrualDiff, FineResponse, FinePaymentResult,
+    FineBalanceResponse, FineLedgerEntryResponse, FineLedgerPage
+)
+from ..services.audit_service import AuditService
+from ..services.circulation_service import CirculationService
+
+logger = logging.getLogger(__name__)
+
+
+_ACCRUAL_CTE = """
+    WITH loans AS (
+        SELECT t.transaction_id, t.user_id,
+               CAST(LEAST(
+                   floor(extract(epoch FROM (CAST(:as_of AS timestamptz) - t.due_date)) / 86400) * :fine_per_day,
+                   :max_fine
+               ) AS numeric(10, 2)) AS amount
+        FROM transactions t
+        WHERE t.status IN ('active', 'overdue')
+          AND t.due_date < CAST(:as_of AS timestamptz)
+          AND t.transaction_id > :after_id
+        ORDER BY t.transaction_id
+        LIMIT :chunk_size
+    ),
+    changed AS (
+        SELECT l.transaction_id, l.user_id, l.amount, coalesce(f.amount, 0) AS previous
+        FROM loans l
+        LEFT JOIN fines f ON f.transaction_id = l.transaction_id
+        WHERE l.amount > 0
+          AND (f.fine_id IS NULL OR (f.provisional AND NOT f.paid AND f.amount <> l.amount))
+    )
+"""
+
+_ACCRUE_SQL = text(_ACCRUAL_CTE + """,
+    upserted AS (
+        INSERT INTO fines (user_id, transaction_id, amount, paid, provisional)
+        SELECT user_id, transaction_id, amount, false, true
+        FROM changed
+        ON CONFLICT (transaction_id) DO UPDATE SET amount = EXCLUDED.amount
+        WHERE fines.provisional AND NOT fines.paid
+        RETURNING fines.fine_id, fines.transaction_id
+    ),
+    ledger AS (
+        INSERT INTO fine_ledger (user_id, fine_id, entry_type, amount, balance_after, created_at)
+        SELECT c.user_id, u.fine_id, 'charge', c.amount - c.previous,
+               s.unpaid_fines_total + sum(c.amount - c.previous) OVER (
+                   PARTITION BY c.user_id ORDER BY c.transaction_id
+               ),
+               now()
+        FROM changed c
+        JOIN upserted u ON u.transaction_id = c.transaction_id
+        LEFT JOIN patron_snapshots s ON s.user_id = c.user_id
+        ORDER BY c.user_id, c.transaction_id
+        RETURNING entry_id
+    ),
+    balances AS (
+        UPDATE patron_snapshots s
+        SET unpaid_fines_total = s.unpaid_fines_total + d.delta,
+            blocked = s.unpaid_fines_total + d.delta > :fine_limit,
+            updated_at = now()
+        FROM (
+            SELECT user_id, sum(amount - previous) AS delta
+            FROM changed
+            GROUP BY user_id
+        ) d
+        WHERE s.user_id = d.user_id
+        RETURNING s.user_id
+    )
+    SELECT (SELECT max(transaction_id) FROM loans) AS last_id,
+           (SELECT count(*) FROM loans) AS scanned,
+           (SELECT count(*) FROM changed) AS changed,
+           (SELECT coalesce(sum(amount - previous), 0) FROM changed) AS delta,
+           (SELECT array_agg(DISTINCT user_id) FROM changed) AS user_ids
+""")
+
+_DIFF_SQL = text(_ACCRUAL_CTE + """
+    SELECT (SELECT max(transaction_id) FROM loans) AS last_id,
+           (SELECT count(*) FROM loans) AS scanned,
+           changed.transaction_id, changed.user_id, changed.previous, changed.amount
+    FROM (SELECT 1) AS chunk
+    LEFT JOIN changed ON true
+    ORDER BY changed.transaction_id
+""")
+
+# Бір төлем ескі айыппұлдардан бастап бөлінеді; соңғысы ішінара төленуі мүмкін
+_PAY_ALL_SQL = text("""
+    WITH outstanding AS (
+        SELECT f.fine_id, f.amount - f.paid_amount AS due,
+               sum(f.amount - f.paid_amount) OVER (ORDER BY f.issued_at, f.fine_id) AS running
+        FROM (
+            SELECT fine_id, amount, paid_amount, issued_at
+            FROM fines
+            WHERE user_id = :user_id AND NOT paid AND NOT provisional
+            FOR UPDATE
+        ) f
+    ),
+    allocation AS (
+        SELECT fine_id, LEAST(due, CAST(:amount AS numeric) - (running - due)) AS applied
+        FROM outstanding
+        WHERE running - due < CAST(:amount AS numeric)
+    )
+    UPDATE fines f
+    SET paid_amount = f.paid_amount + a.applied,
+        paid = f.paid_amount + a.applied >= f.amount,
+        paid_at = CASE WHEN f.paid_amount + a.applied >= f.amount THEN now() ELSE f.paid_at END
+    FROM allocation a
+    WHERE f.fine_id = a.fine_id
+    RETURNING f.fine_id, a.applied, f.paid
+""")
+
+
+class FineService:
+    @staticmethod
+    def accrue_fines(
+            db: Session,
+            as_of: Optional[datetime] = None,
+            dry_run: bool = False,
+            chunk_size: Optional[int] = None
+    ) -> FineAccrualResult:
+        params = {
+            "as_of": as_of or datetime.utcnow(),
+            "fine_per_day": settings.FINE_PER_DAY,
+            "max_fine": settings.MAX_FINE_AMOUNT,
+            "fine_limit": settings.FINE_BLOCK_THRESHOLD,
+            "chunk_size": chunk_size or settings.FINE_ACCRUAL_CHUNK,
+            "after_id": 0,
+        }
+        result = FineAccrualResult(dry_run=dry_run, scanned=0, changed=0, total_delta=0.0, affected_users=0)
+        affected = set()
+
+        while True:
+            if dry_run:
+                rows = db.execute(_DIFF_SQL, params).mappings().all()
+                last_id, scanned = rows[0]["last_id"], rows[0]["scanned"]
+                diffs = [row for row in rows if row["transaction_id"] is not None]
+
+                result.changed += len(diffs)
+                for row in diffs:
+                    affected.add(row["user_id"])
+                    result.total_delta += float(row["amount"] - row["previous"])
+                    if len(result.sample) < settings.FINE_ACCRUAL_SAMPLE_SIZE:
+                        result.sample.append(FineAccrualDiff(
+                            transaction_id=row["transaction_id"],
+                            user_id=row["user_id"],
+                            previous_amount=float(row["previous"]),
+                            accrued_amount=float(row["amount"])
+                        ))
+                db.rollback()
+            else:
+                row = db.execute(_ACCRUE_SQL, params).mappings().first()
+                db.commit()
+
+                last_id, scanned = row["last_id"], row["scanned"]
+                result.changed += row["changed"]
+                result.total_delta += float(row["delta"])
+
+                user_ids = row["user_ids"] or []
+                affected.update(user_ids)
+                CirculationService.invalidate(*user_ids)
+
+            result.scanned += scanned
+            if last_id is None or scanned < params["chunk_size"]:
+                break
+            params["after_id"] = last_id
+
+        result.affected_users = len(affected)
+        logger.info(
+            f"Айыппұлдар есептелді (dry_run={dry_run}): {result.scanned} қарыз, "
+            f"{result.changed} өзгеріс, {result.total_delta} теңге"
+        )
+        return result
+
+    @staticmethod
+    def ledger_entry(
+            user_id: int,
+            fine_id: Optional[int],
+            entry_type: str,
+            amount: float,
+            created_by: Optional[int] = None
+    ) -> Dict[str, Any]:
+        return {
+            "user_id": user_id,
+            "fine_id": fine_id,
+            "entry_type": entry_type,
+            "amount": round(float(amount), 2),
+            "balance_after": None,
+            "created_by": created_by,
+        }
+
+    @staticmethod
+    def post_ledger(db: Session, entries: List[Dict[str, Any]], snapshots: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+
+        # Снимоктағы соңғы қалдықтан кері жүріп, әр жазбадан кейінгі қалдықты шығарамыз
+        balances = {snapshot["user_id"]: float(snapshot["unpaid_fines_total"]) for snapshot in snapshots if snapshot}
+        for entry in reversed(entries):
+            balance = balances.get(entry["user_id"])
+            if balance is None:
+                continue
+            entry["balance_after"] = round(balance, 2)
+            balances[entry["user_id"]] = balance - entry["amount"]
+
+        db.execute(insert(FineLedgerEntry), entries)
+
+    @staticmethod
+    def _to_response(fine: Fine, details: str = "") -> FineResponse:
+        return FineResponse(
+            fine_id=fine.fine_id,
+            user_id=fine.user_id,
+            transaction_id=fine.transaction_id,
+            amount=float(fine.amount),
+            issued_at=fine.issued_at,
+            paid=fine.paid,
+            paid_at=fine.paid_at,
+            paid_amount=float(fine.paid_amount or 0),
+            provisional=fine.provisional,
+            transaction_details=details
+        )
+
+    @staticmethod
+    def _lock_payable_fine(db: Session, fine_id: int, user_id: Optional[int] = None) -> Fine:
+        query = db.query(Fine).filter(Fine.fine_id == fine_id)
+        if user_id is not None:
+            query = query.filter(Fine.user_id == user_id)
+        fine = query.with_for_update().first()
+
+        if not fine:
+            raise ValueError("Айыппұл табылмады")
+
+        if fine.paid:
+            raise ValueError("Айыппұл төленген")
+
+        if fine.provisional:
+            raise ValueError("Айыппұл кітап қайтарылғанда түпкілікті есептеледі")
+
+        return fine
+
+    @staticmethod
+    async def pay_fine(
+            db: Session,
+            fine_id: int,
+            user_id: int,
+            amount: float,
+            cashier_id: Optional[int] = None
+    ) -> FineResponse:
+        if amount <= 0:
+            raise ValueError("Төлем сомасы оң болуы керек")
+
+        fine = FineService._lock_payable_fine(db, fine_id, user_id)
+
+        outstanding = fine.amount - fine.paid_amount
+        applied = min(Decimal(str(amount)), outstanding)
+
+        fine.paid_amount = fine.paid_amount + applied
+        if fine.paid_amount >= fine.amount:
+            fine.paid = True
+            fine.paid_at = datetime.utcnow()
+
+        db.flush()
+        snapshot = CirculationService.apply_delta(db, user_id, fines=-float(applied))
+        FineService.post_ledger(
+            db,
+            [FineService.ledger_entry(user_id, fine_id, "payment", -applied, cashier_id or user_id)],
+            [snapshot]
+        )
+        await AuditService.log_actions_bulk(db, [{
+            "user_id": cashier_id or user_id,
+            "action": "fine_paid",
+            "action_type": "update",
+            "entity_type": "fine",
+            "entity_id": fine_id,
+            "details": {
+                "fine_id": fine_id,
+                "amount": float(amount),
+                "paid_amount": float(applied)
+            }
+        }])
+
+        db.commit()
+        CirculationService.cache_snapshot(snapshot)
+
+        return FineService._to_response(fine)
+
+    @staticmethod
+    async def pay_all(db: Session, user_id: int, amount: float, cashier_id: Optional[int] = None) -> FinePaymentResult:
+        if amount <= 0:
+            raise ValueError("Төлем сомасы оң болуы керек")
+
+        rows = db.execute(_PAY_ALL_SQL, {"user_id": user_id, "amount": amount}).mappings().all()
+        if not rows:
+            db.rollback()
+            raise ValueError("Төленбеген айыппұл жоқ")
+
+        rows = sorted(rows, key=lambda row: row["fine_id"])
+        applied = sum(float(row["applied"]) for row in rows)
+
+        snapshot = CirculationService.apply_delta(db, user_id, fines=-applied)
+        FineService.post_ledger(
+            db,
+            [
+                FineService.ledger_entry(user_id, row["fine_id"], "payment", -row["applied"], cashier_id or user_id)
+                for row in rows
+            ],
+            [snapshot]
+        )
+        await AuditService.log_actions_bulk(db, [{
+            "user_id": cashier_id or user_id,
+            "action": "fines_paid",
+            "action_type": "update",
+            "entity_type": "user",
+            "entity_id": user_id,
+            "details": {
+                "amount": float(amount),
+                "paid_amount": applied,
+                "fine_ids": [row["fine_id"] for row in rows]
+            }
+        }])
+
+        db.commit()
+        CirculationService.cache_snapshot(snapshot)
+
+        partial = [row["fine_id"] for row in rows if not row["paid"]]
+        logger.info(f"Айыппұлдар төленді: user {user_id}, {len(rows)} айыппұл, {applied} теңге")
+
+        return FinePaymentResult(
+            user_id=user_id,
+            amount_received=amount,
+            amount_applied=round(applied, 2),
+            change=round(amount - applied, 2),
+            balance=float(snapshot["unpaid_fines_total"]) if snapshot else 0.0,
+            settled_fine_ids=[row["fine_id"] for row in rows if row["paid"]],
+            partial_fine_id=partial[0] if partial else None
+        )
+
+    @staticmethod
+    async def waive_fine(db: Session, fine_id: int, librarian_id: int, reason: Optional[str] = None) -> FineResponse:
+        fine = FineService._lock_payable_fine(db, fine_id)
+
+        outstanding = fine.amount - fine.paid_amount
+        fine.paid = True
+        fine.paid_at = datetime.utcnow()
+
+        db.flush()
+        snapshot = CirculationService.apply_delta(db, fine.user_id, fines=-float(outstanding))
+        FineService.post_ledger(
+            db,
+            [FineService.ledger_entry(fine.user_id, fine_id, "waiver", -outstanding, librarian_id)],
+            [snapshot]
+        )
+        await AuditService.log_actions_bulk(db, [{
+            "user_id": librarian_id,
+            "action": "fine_waived",
+            "action_type": "update",
+            "entity_type": "fine",
+            "entity_id": fine_id,
+            "details": {
+                "fine_id": fine_id,
+                "user_id": fine.user_id,
+                "waived_amount": float(outstanding),
+                "reason": reason
+            }
+        }])
+
+        db.commit()
+        CirculationService.cache_snapshot(snapshot)
+
+        return FineService._to_response(fine)
+
+    @staticmethod
+    async def get_balance(db: Session, user_id: int) -> Optional[FineBalanceResponse]:
+        snapshot = await CirculationService.get_snapshot(db, user_id)
+        if not snapshot:
+            return None
+        return FineBalanceResponse(
+            user_id=user_id,
+            balance=snapshot.unpaid_fines_total,
+            blocked=snapshot.blocked
+        )
+
+    @staticmethod
+    async def get_ledger(db: Session, user_id: int, cursor: Optional[str] = None, size: int = 50) -> FineLedgerPage:
+        query = db.query(FineLedgerEntry).filter(FineLedgerEntry.user_id == user_id)
+        if cursor:
+            (entry_id,) = decode_cursor(cursor)
+            query = query.filter(FineLedgerEntry.entry_id < int(entry_id))
+
+        entries = query.order_by(FineLedgerEntry.entry_id.desc()).limit(size + 1).all()
+
+        next_cursor = None
+        if len(entries) > size:
+            entries = entries[:size]
+            next_cursor = encode_cursor(entries[-1].entry_id)
+
+        return FineLedgerPage(
+            items=[FineLedgerEntryResponse.from_orm(entry) for entry in entries],
+            next_cursor=next_cursor
+        )
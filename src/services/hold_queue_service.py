@@ -0,0 +1,185 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+import redis
+
+from ..core.cache import get_redis
+from ..core.config import settings
+from ..schemas.notification import NotificationTask
+from ..services.notification_service import NotificationService
+
+logger = logging.getLogger(__name__)
+
+
+_QUEUE_SQL = text("""
+    SELECT reservation_id, reserved_at
+    FROM reservations
+    WHERE book_id = :book_id AND status = 'active'
+    ORDER BY reserved_at, reservation_id
+""")
+
+_POSITION_SQL = text("""
+    SELECT count(*)
+    FROM reservations q
+    JOIN reservations r ON r.reservation_id = :reservation_id
+    WHERE q.book_id = r.book_id
+      AND q.status = 'active'
+      AND (q.reserved_at, q.reservation_id) <= (r.reserved_at, r.reservation_id)
+""")
+
+# Босаған көшірмелер кезек басындағы оқырмандарға беріледі, қалғандары қолжетімді болады
+_ASSIGN_COPIES_SQL = text("""
+    WITH freed AS (
+        SELECT c.copy_id, c.book_id, c.barcode,
+               row_number() OVER (PARTITION BY c.book_id ORDER BY c.copy_id) AS n
+        FROM book_copies c
+        WHERE c.copy_id = ANY(:copy_ids)
+    ),
+    queue AS (
+        SELECT q.reservation_id, q.user_id, q.book_id,
+               row_number() OVER (PARTITION BY q.book_id ORDER BY q.reserved_at, q.reservation_id) AS n
+        FROM (
+            SELECT reservation_id, user_id, book_id, reserved_at
+            FROM reservations
+            WHERE book_id IN (SELECT book_id FROM freed) AND status = 'active' AND expires_at > now()
+            FOR UPDATE
+        ) q
+    ),
+    assigned AS (
+        UPDATE reservations r
+        SET status = 'ready', copy_id = f.copy_id, expires_at = :hold_until
+        FROM queue q
+        JOIN freed f ON f.book_id = q.book_id AND f.n = q.n
+        WHERE r.reservation_id = q.reservation_id
+        RETURNING r.reservation_id, r.user_id, r.book_id, r.copy_id, f.barcode
+    ),
+    held AS (
+        UPDATE book_copies c
+        SET status = 'reserved'
+        FROM assigned a
+        WHERE c.copy_id = a.copy_id
+    ),
+    released AS (
+        UPDATE book_copies c
+        SET status = 'available'
+        WHERE c.copy_id = ANY(:copy_ids)
+          AND c.copy_id NOT IN (SELECT copy_id FROM assigned)
+    )
+    SELECT a.reservation_id, a.user_id, a.book_id, a.copy_id, a.barcode, b.title
+    FROM assigned a
+    JOIN books b ON b.book_id = a.book_id
+    ORDER BY a.reservation_id
+""")
+
+# Кілт жоқ болса қоспаймыз: жартылай кезек позицияларды бұзады, келесі оқу оны PG-ден толық құрады
+_ENQUEUE_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    redis.call('zadd', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class HoldQueue:
+    @staticmethod
+    def key(book_id: int) -> str:
+        return f"holds:{book_id}"
+
+    @staticmethod
+    def _score(reserved_at: datetime) -> float:
+        return reserved_at.timestamp()
+
+    @staticmethod
+    def rebuild(db: Session, book_id: int) -> int:
+        rows = db.execute(_QUEUE_SQL, {"book_id": book_id}).all()
+        key = HoldQueue.key(book_id)
+
+        pipe = get_redis().pipeline()
+        pipe.delete(key)
+        if rows:
+            pipe.zadd(key, {str(reservation_id): HoldQueue._score(reserved_at) for reservation_id, reserved_at in rows})
+            pipe.expire(key, settings.HOLD_QUEUE_TTL)
+        pipe.execute()
+        return len(rows)
+
+    @staticmethod
+    def enqueue(book_id: int, reservation_id: int, reserved_at: datetime) -> None:
+        try:
+            get_redis().eval(
+                _ENQUEUE_SCRIPT, 1, HoldQueue.key(book_id), HoldQueue._score(reserved_at), str(reservation_id)
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Резерв кезегін жаңарту қатесі: {e}")
+
+    @staticmethod
+    def remove(entries: List[Tuple[int, int]]) -> None:
+        if not entries:
+            return
+        try:
+            pipe = get_redis().pipeline()
+            for book_id, reservation_id in entries:
+                pipe.zrem(HoldQueue.key(book_id), str(reservation_id))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Резерв кезегін жаңарту қатесі: {e}")
+
+    @staticmethod
+    def positions(db: Session, entries: List[Tuple[int, int]]) -> Dict[int, Optional[int]]:
+        if not entries:
+            return {}
+
+        try:
+            redis_client = get_redis()
+            books = sorted({book_id for book_id, _ in entries})
+            pipe = redis_client.pipeline()
+            for book_id in books:
+                pipe.exists(HoldQueue.key(book_id))
+            for book_id, exists in zip(books, pipe.execute()):
+                if not exists:
+                    HoldQueue.rebuild(db, book_id)
+
+            pipe = redis_client.pipeline()
+            for book_id, reservation_id in entries:
+                pipe.zrank(HoldQueue.key(book_id), str(reservation_id))
+            ranks = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Резерв кезегін оқу қатесі: {e}")
+            return {
+                reservation_id: db.execute(_POSITION_SQL, {"reservation_id": reservation_id}).scalar() or None
+                for _, reservation_id in entries
+            }
+
+        return {
+            reservation_id: rank + 1 if rank is not None else None
+            for (_, reservation_id), rank in zip(entries, ranks)
+        }
+
+    @staticmethod
+    def assign_copies(db: Session, copy_ids: List[int], hold_until: datetime) -> List[Dict[str, Any]]:
+        if not copy_ids:
+            return []
+
+        rows = db.execute(_ASSIGN_COPIES_SQL, {"copy_ids": copy_ids, "hold_until": hold_until}).mappings().all()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def entries(holds: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+        return [(hold["book_id"], hold["reservation_id"]) for hold in holds]
+
+    @staticmethod
+    def announce(db: Session, holds: List[Dict[str, Any]]) -> None:
+        # Хабарламалар көшірмелерді берген транзакцияның ішінде кезекке қойылады
+        NotificationService.enqueue_batch([
+            NotificationTask(
+                user_id=hold["user_id"],
+                type="reservation",
+                message=(
+                    f"Сіз резервтеген '{hold['title']}' кітабы дайын. "
+                    f"Оны {settings.HOLD_PICKUP_DAYS} күн ішінде алып кетіңіз (баркод: {hold['barcode']})."
+                )
+            )
+            for hold in holds
+        ], db)
@@ -0,0 +1,203 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Optional, Dict, Any, Callable, Awaitable, Iterator
+from contextlib import contextmanager
+import hashlib
+import logging
+import json
+import redis
+
+from ..core.cache import get_redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Аяқталмай қалған (процесс құлаған) немесе мерзімі өткен кілтті қайта иеленуге болады
+_CLAIM_SQL = text("""
+    INSERT INTO idempotency_keys (user_id, key, endpoint, fingerprint, created_at)
+    VALUES (:user_id, :key, :endpoint, :fingerprint, now())
+    ON CONFLICT (user_id, key) DO UPDATE SET
+        endpoint = EXCLUDED.endpoint,
+        fingerprint = EXCLUDED.fingerprint,
+        status_code = NULL,
+        response_body = NULL,
+        created_at = EXCLUDED.created_at
+    WHERE (idempotency_keys.status_code IS NULL
+           AND idempotency_keys.created_at < now() - make_interval(secs => :lock_timeout))
+       OR idempotency_keys.created_at < now() - make_interval(secs => :ttl)
+    RETURNING id
+""")
+
+_SELECT_SQL = text("""
+    SELECT fingerprint, status_code, response_body
+    FROM idempotency_keys
+    WHERE user_id = :user_id AND key = :key
+""")
+
+_COMPLETE_SQL = text("""
+    UPDATE idempotency_keys
+    SET status_code = :status_code, response_body = :response_body
+    WHERE user_id = :user_id AND key = :key AND fingerprint = :fingerprint
+""")
+
+_RELEASE_SQL = text("""
+    DELETE FROM idempotency_keys
+    WHERE user_id = :user_id AND key = :key AND status_code IS NULL
+""")
+
+_CLEANUP_SQL = text("""
+    DELETE FROM idempotency_keys
+    WHERE id IN (
+        SELECT id FROM idempotency_keys
+        WHERE created_at < now() - make_interval(secs => :ttl)
+        LIMIT :chunk_size
+    )
+""")
+
+
+@contextmanager
+def _deferred_commit(db: Session) -> Iterator[None]:
+    # Қызметтердің ішкі commit-і flush болып қалады: жауап бизнес өзгерісімен бір commit-те сақталады
+    commit = db.commit
+    db.commit = db.flush
+    try:
+        yield
+    finally:
+        db.commit = commit
+
+
+class IdempotencyService:
+    @staticmethod
+    def cache_key(user_id: int, key: str) -> str:
+        return f"idempotency:{user_id}:{key}"
+
+    @staticmethod
+    def fingerprint(endpoint: str, payload: Any) -> str:
+        raw = json.dumps({"endpoint": endpoint, "payload": payload}, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @staticmethod
+    async def run(
+            db: Session,
+            user_id: int,
+            key: Optional[str],
+            endpoint: str,
+            payload: Any,
+            call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        if not key:
+            return await call()
+
+        if len(key) > 255:
+            raise ValueError("Idempotency-Key тым ұзын")
+
+        fingerprint = IdempotencyService.fingerprint(endpoint, payload)
+        stored = IdempotencyService._claim(db, user_id, key, endpoint, fingerprint)
+        if stored is not None:
+            return IdempotencyService._replay(stored, fingerprint)
+
+        try:
+            with _deferred_commit(db):
+                result = await call()
+            body = result.dict() if hasattr(result, "dict") else result
+            IdempotencyService._complete(db, user_id, key, fingerprint, 200, body)
+            db.commit()
+        except ValueError as e:
+            db.rollback()
+            body = {"detail": str(e)}
+            IdempotencyService._complete(db, user_id, key, fingerprint, 400, body)
+            db.commit()
+            IdempotencyService._cache(user_id, key, fingerprint, 400, body)
+            raise
+        except Exception:
+            db.rollback()
+            db.execute(_RELEASE_SQL, {"user_id": user_id, "key": key})
+            db.commit()
+            raise
+
+        IdempotencyService._cache(user_id, key, fingerprint, 200, body)
+        return result
+
+    @staticmethod
+    def _claim(db: Session, user_id: int, key: str, endpoint: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        try:
+            cached = get_redis().get(IdempotencyService.cache_key(user_id, key))
+        except redis.RedisError as e:
+            logger.warning(f"Идемпотенттік кэшті оқу қатесі: {e}")
+            cached = None
+
+        if cached:
+            return json.loads(cached)
+
+        claimed = db.execute(_CLAIM_SQL, {
+            "user_id": user_id,
+            "key": key,
+            "endpoint": endpoint,
+            "fingerprint": fingerprint,
+            "lock_timeout": settings.IDEMPOTENCY_LOCK_TIMEOUT,
+            "ttl": settings.IDEMPOTENCY_TTL,
+        }).first()
+        db.commit()
+
+        if claimed:
+            return None
+
+        row = db.execute(_SELECT_SQL, {"user_id": user_id, "key": key}).mappings().first()
+        db.commit()
+        return {
+            "fingerprint": row["fingerprint"],
+            "status_code": row["status_code"],
+            "body": json.loads(row["response_body"]) if row["response_body"] else None,
+        }
+
+    @staticmethod
+    def _replay(stored: Dict[str, Any], fingerprint: str) -> Any:
+        if stored["fingerprint"] != fingerprint:
+            raise ValueError("Idempotency-Key басқа сұраныс үшін қолданылған")
+
+        if stored["status_code"] is None:
+            raise ValueError("Осы кілтпен сұраныс әлі өңделуде")
+
+        if stored["status_code"] == 400:
+            raise ValueError(stored["body"]["detail"])
+
+        return stored["body"]
+
+    @staticmethod
+    def _complete(
+            db: Session,
+            user_id: int,
+            key: str,
+            fingerprint: str,
+            status_code: int,
+            body: Any
+    ) -> None:
+        db.execute(_COMPLETE_SQL, {
+            "user_id": user_id,
+            "key": key,
+            "fingerprint": fingerprint,
+            "status_code": status_code,
+            "response_body": json.dumps(body, default=str),
+        })
+
+    @staticmethod
+    def _cache(user_id: int, key: str, fingerprint: str, status_code: int, body: Any) -> None:
+        try:
+            get_redis().set(
+                IdempotencyService.cache_key(user_id, key),
+                json.dumps({"fingerprint": fingerprint, "status_code": status_code, "body": body}, default=str),
+                ex=settings.IDEMPOTENCY_TTL
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Идемпотенттік кэшті жазу қатесі: {e}")
+
+    @staticmethod
+    def cleanup(db: Session, chunk_size: int = 5000) -> int:
+        total = 0
+        while True:
+            deleted = db.execute(_CLEANUP_SQL, {"ttl": settings.IDEMPOTENCY_TTL, "chunk_size": chunk_size}).rowcount
+            db.commit()
+            total += deleted
+            if deleted < chunk_size:
+                return total
@@ -1,21 +1,305 @@
 from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import List, Optional
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from sqlalchemy import insert, delete, text, tuple_, literal
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import logging
 import redis
 import json
+import time
 
-from ..models.notification import Notification
+from ..models.notification import Notification, NotificationJob
 from ..models.user import User
-from ..schemas.notification import NotificationResponse, NotificationCreate
+from ..schemas.notification import (
+    NotificationResponse, NotificationCreate, NotificationTask,
+    BroadcastRequest, BroadcastTask, NotificationJobResponse, NotificationPage
+)
+from ..core.cache import get_redis
+from ..core.pagination import encode_cursor, decode_cursor
 from ..core.config import settings
+from ..core.events import EventHub
+from ..core.tasks import Task, TaskQueue
+from .delivery_service import DeliveryChannels
+
+logger = logging.getLogger(__name__)
+
+
+# Бірінші хабарлама терезені ашады: буфер кілті мерзімімен бірге жинақтау жиынына түседі
+_COALESCE_SCRIPT = """
+redis.call('rpush', KEYS[1], ARGV[1])
+redis.call('expire', KEYS[1], ARGV[3])
+redis.call('zadd', KEYS[2], 'NX', ARGV[2], KEYS[1])
+return 1
+"""
+
+# Мерзімі жеткен буферлерді атомарлы алып, тазалайды: бірнеше процесс бір буферді екі рет жібермейді
+_FLUSH_SCRIPT = """
+local keys = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+local result = {}
+for _, key in ipairs(keys) do
+    redis.call('zrem', KEYS[1], key)
+    table.insert(result, key)
+    table.insert(result, redis.call('lrange', key, 0, -1))
+    redis.call('del', key)
+end
+return result
+"""
+
+# Санауыш тек кэште бар болса өзгереді; жоқ болса келесі оқу оны Postgres-тен есептейді
+_ADJUST_UNREAD_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return nil
+end
+local value = redis.call('incrby', KEYS[1], ARGV[1])
+if value < 0 then
+    redis.call('del', KEYS[1])
+end
+return value
+"""
+
+_UNREAD_COUNT_SQL = text("""
+    SELECT count(*)
+    FROM notifications
+    WHERE user_id = :user_id
+      AND NOT read
+      AND notification_id > coalesce(
+          (SELECT read_up_to FROM notification_read_marks WHERE user_id = :user_id), 0
+      )
+""")
+
+_READ_MARK_SQL = text("SELECT read_up_to FROM notification_read_marks WHERE user_id = :user_id")
+
+# O(1): жолдарға тимейді, тек оқырманның су белгісін жылжытады
+_MARK_ALL_READ_SQL = text("""
+    INSERT INTO notification_read_marks (user_id, read_up_to, updated_at)
+    SELECT :user_id, coalesce(max(notification_id), 0), now() FROM notifications
+    ON CONFLICT (user_id) DO UPDATE SET
+        read_up_to = greatest(notification_read_marks.read_up_to, EXCLUDED.read_up_to),
+        updated_at = EXCLUDED.updated_at
+""")
+
+# Су белгісін бөліктермен жолдарға түсіреді: оқылмаған жартылай индекс кішкентай болып қалады
+_APPLY_READ_MARKS_SQL = text("""
+    WITH batch AS (
+        SELECT n.notification_id
+        FROM notification_read_marks m
+        JOIN notifications n ON n.user_id = m.user_id AND NOT n.read AND n.notification_id <= m.read_up_to
+        LIMIT :chunk_size
+        FOR UPDATE OF n SKIP LOCKED
+    )
+    UPDATE notifications n
+    SET read = true
+    FROM batch
+    WHERE n.notification_id = batch.notification_id
+""")
+
+_PURGE_READ_SQL = text("""
+    WITH batch AS (
+        SELECT notification_id
+        FROM notifications
+        WHERE read AND sent_at < :cutoff
+        ORDER BY sent_at, notification_id
+        LIMIT :chunk_size
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM notifications n
+    USING batch
+    WHERE n.notification_id = batch.notification_id
+""")
+
+_ARCHIVE_COLUMNS = "notification_id, user_id, type, message, sent_at, read, channel, notification_data"
+
+# Мұрағат кестесінің құрылымы 0016 миграциясында; бағандар анық аталады
+_ARCHIVE_READ_SQL = text(f"""
+    WITH batch AS (
+        SELECT notification_id
+        FROM notifications
+        WHERE read AND sent_at < :cutoff
+        ORDER BY sent_at, notification_id
+        LIMIT :chunk_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    moved AS (
+        DELETE FROM notifications n
+        USING batch
+        WHERE n.notification_id = batch.notification_id
+        RETURNING n.notification_id, n.user_id, n.type, n.message, n.sent_at, n.read, n.channel, n.notification_data
+    )
+    INSERT INTO notifications_archive ({_ARCHIVE_COLUMNS})
+    SELECT {_ARCHIVE_COLUMNS} FROM moved
+""")
+
+# Мерзімі жақындаған қарыздар бұл жерде емес: оларды TransactionService.send_due_reminders бір рет жібереді
+_DAILY_DIGEST_SQL = text("""
+    SELECT t.user_id,
+           json_agg(json_build_object('title', b.title, 'due_date', to_char(t.due_date, 'YYYY-MM-DD'))
+                    ORDER BY t.due_date) AS overdue
+    FROM transactions t
+    JOIN book_copies c ON c.copy_id = t.copy_id
+    JOIN books b ON b.book_id = c.book_id
+    WHERE t.status IN ('active', 'overdue') AND t.due_date < now()
+    GROUP BY t.user_id
+""")
+
+_BROADCAST_TARGETS = """
+    FROM users u
+    JOIN roles r ON r.role_id = u.role_id
+    WHERE (CAST(:roles AS text[]) IS NULL OR r.role_name = ANY(CAST(:roles AS text[])))
+      AND (CAST(:user_ids AS integer[]) IS NULL OR u.user_id = ANY(CAST(:user_ids AS integer[])))
+      AND (NOT :active_only OR u.is_active)
+      AND (CAST(:registered_after AS timestamptz) IS NULL OR u.created_at >= CAST(:registered_after AS timestamptz))
+      AND (CAST(:registered_before AS timestamptz) IS NULL OR u.created_at < CAST(:registered_before AS timestamptz))
+      AND (NOT :has_overdue_loans OR EXISTS (
+          SELECT 1 FROM transactions t WHERE t.user_id = u.user_id AND t.status = 'overdue'
+      ))
+      AND (NOT :has_unpaid_fines OR EXISTS (
+          SELECT 1 FROM fines f WHERE f.user_id = u.user_id AND NOT f.paid
+      ))
+"""
+
+_BROADCAST_COUNT_SQL = text(f"SELECT count(*) {_BROADCAST_TARGETS}")
+
+# Бір бөлік алушылар бір INSERT ... SELECT-пен жазылады, user_id бойынша keyset жалғасу нүктесі болады
+_BROADCAST_CHUNK_SQL = text(f"""
+    WITH targets AS (
+        SELECT u.user_id, u.email, u.phone_number
+        {_BROADCAST_TARGETS}
+          AND u.user_id > :after
+        ORDER BY u.user_id
+        LIMIT :chunk
+    ),
+    inserted AS (
+        INSERT INTO notifications (user_id, type, message, channel, notification_data, read)
+        SELECT user_id, :type, :message, :channel,
+               json_build_object('email', email, 'phone', phone_number, 'job_id', :job_id)::text, false
+        FROM targets
+        RETURNING notification_id, user_id
+    )
+    SELECT notification_id, user_id FROM inserted ORDER BY user_id
+""")
+
+_BROADCAST_FILTERS = {
+    "roles", "user_ids", "active_only", "registered_after", "registered_before", "has_overdue_loans", "has_unpaid_fines"
+}
 
 
 class NotificationService:
+    DIGEST_DUE_KEY = "notifications:digest_due"
+
+    @staticmethod
+    def enqueue(
+            user_id: int,
+            notification_type: str,
+            message: str,
+            channel: str = "email",
+            db: Optional[Session] = None
+    ) -> None:
+        task = NotificationTask(user_id=user_id, type=notification_type, message=message, channel=channel)
+        if settings.NOTIFICATION_COALESCE_WINDOW > 0 and notification_type in settings.NOTIFICATION_COALESCE_TYPES:
+            try:
+                window = settings.NOTIFICATION_COALESCE_WINDOW
+                get_redis().eval(
+                    _COALESCE_SCRIPT, 2,
+                    NotificationService.coalesce_key(user_id, notification_type, channel),
+                    NotificationService.DIGEST_DUE_KEY,
+                    message, time.time() + window, window * 10
+                )
+                return
+            except redis.RedisError as e:
+                logger.warning(f"Хабарламаны жинақтау қатесі, тікелей жіберіледі: {e}")
+
+        if db is not None:
+            # Шақырушы commit жасағанда тапсырма өзгерістермен бірге сақталады
+            TaskQueue.enqueue("notifications.send", task, db)
+            return
+
+        try:
+            TaskQueue.enqueue("notifications.send", task)
+        except Exception as e:
+            logger.error(f"Хабарламаны кезекке қою қатесі: {e}")
+
+    @staticmethod
+    def coalesce_key(user_id: int, notification_type: str, channel: str) -> str:
+        return f"notifications:pending:{user_id}:{notification_type}:{channel}"
+
+    @staticmethod
+    def _digest_message(messages: List[str]) -> str:
+        if len(messages) == 1:
+            return messages[0]
+        lines = "\n".join(f"- {message}" for message in messages)
+        return f"Сізге {len(messages)} жаңа хабарлама:\n{lines}"
+
     @staticmethod
-    def send_notification(
+    def flush_digests(db: Session, limit: int = 1000) -> int:
+        flushed = 0
+        while True:
+            result = get_redis().eval(_FLUSH_SCRIPT, 1, NotificationService.DIGEST_DUE_KEY, time.time(), limit)
+            if not result:
+                return flushed
+
+            tasks = []
+            for key, messages in zip(result[::2], result[1::2]):
+                if not messages:
+                    continue
+                _, _, user_id, notification_type, channel = key.decode().split(":")
+                tasks.append(NotificationTask(
+                    user_id=int(user_id),
+                    type=notification_type,
+                    channel=channel,
+                    message=NotificationService._digest_message([message.decode() for message in messages])
+                ))
+
+            try:
+                TaskQueue.enqueue_many("notifications.send", tasks, db)
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Буферлер скриптпен өшірілген: жоғалмауы үшін оларды келесі терезеге қайтарамыз
+                NotificationService._restore_digests(result)
+                raise
+            flushed += len(tasks)
+            if len(result) < limit * 2:
+                return flushed
+
+    @staticmethod
+    def _restore_digests(result: list) -> None:
+        window = settings.NOTIFICATION_COALESCE_WINDOW
+        pipe = get_redis().pipeline(transaction=False)
+        for key, messages in zip(result[::2], result[1::2]):
+            for message in messages:
+                pipe.eval(
+                    _COALESCE_SCRIPT, 2, key, NotificationService.DIGEST_DUE_KEY,
+                    message, time.time() + window, window * 10
+                )
+        pipe.execute()
+
+    @staticmethod
+    def send_daily_digests(db: Session, chunk_size: int = 1000) -> int:
+        result = db.execute(_DAILY_DIGEST_SQL.execution_options(stream_results=True, yield_per=chunk_size))
+
+        sent = 0
+        for rows in result.mappings().partitions():
+            tasks = [
+                NotificationTask(
+                    user_id=row["user_id"],
+                    type="overdue",
+                    message="Мерзімі өткен кітаптар:\n" + "\n".join(
+                        f"- '{item['title']}' ({item['due_date']})" for item in row["overdue"]
+                    )
+                )
+                for row in rows
+            ]
+            NotificationService.enqueue_batch(tasks)
+            sent += len(tasks)
+
+        return sent
+
+    @staticmethod
+    def enqueue_batch(tasks: List[NotificationTask], db: Optional[Session] = None) -> None:
+        if tasks:
+            TaskQueue.enqueue_many("notifications.send", tasks, db)
+
+    @staticmethod
+    async def send_notification(
             db: Session,
             user_id: int,
             notification_type: str,
@@ -35,33 +319,267 @@ class NotificationService:
         )
 
         db.add(notification)
+        db.flush()
+        TaskQueue.enqueue("notifications.send", NotificationTask(
+            user_id=user_id,
+            type=notification_type,
+            message=message,
+            channel=channel,
+            notification_id=notification.notification_id
+        ), db)
         db.commit()
         db.refresh(notification)
-
-        if channel == "email" and user.email:
-            NotificationService.send_email_notification.delay(
-                user.email, message, f"Кітапхана жүйесі - {notification_type}"
-            )
-        elif channel == "sms" and user.phone_number:
-            NotificationService.send_sms_notification.delay(user.phone_number, message)
+        NotificationService.adjust_unread({user_id: 1})
 
         return NotificationResponse.from_orm(notification)
 
+    @staticmethod
+    def deliver_batch(db: Session, tasks: List[NotificationTask]) -> None:
+        users = {
+            user.user_id: user
+            for user in db.query(User).filter(User.user_id.in_({task.user_id for task in tasks})).all()
+        }
+
+        # Кезектен келген жаңа хабарламалар бір INSERT-пен сақталады
+        pending = [task for task in tasks if task.notification_id is None and task.user_id in users]
+        if pending:
+            rows = [
+                {
+                    "user_id": task.user_id,
+                    "type": task.type,
+                    "message": task.message,
+                    "channel": task.channel,
+                    "notification_data": json.dumps({
+                        "email": users[task.user_id].email,
+                        "phone": users[task.user_id].phone_number
+                    }),
+                }
+                for task in pending
+            ]
+            notification_ids = db.execute(
+                insert(Notification).returning(Notification.notification_id, sort_by_parameter_order=True),
+                rows
+            ).scalars().all()
+            db.commit()
+            # Қайталау кезінде жазба екінші рет енгізілмеуі үшін
+            unread = {}
+            for task, notification_id in zip(pending, notification_ids):
+                task.notification_id = notification_id
+                unread[task.user_id] = unread.get(task.user_id, 0) + 1
+            NotificationService.adjust_unread(unread)
+
+        # Қайталауда жүктемедегі белгілер бойынша бұрын жіберілгендер қайта жіберілмейді
+        unpublished = [task for task in tasks if task.notification_id is not None and not task.published]
+        EventHub.publish([
+            (EventHub.user_channel(task.user_id), {
+                "type": "notification",
+                "notification_id": task.notification_id,
+                "notification_type": task.type,
+                "message": task.message
+            })
+            for task in unpublished
+        ])
+        for task in unpublished:
+            task.published = True
+
+        email_tasks, emails = [], []
+        sms_tasks, messages = [], []
+        for task in tasks:
+            user = users.get(task.user_id)
+            if not user or task.delivered:
+                continue
+            if task.channel == "email" and user.email:
+                email_tasks.append(task)
+                emails.append((user.email, f"Кітапхана жүйесі - {task.type}", task.message))
+            elif task.channel == "sms" and user.phone_number:
+                sms_tasks.append(task)
+                messages.append((user.phone_number, task.message))
+
+        DeliveryChannels.email().send(emails, lambda index: setattr(email_tasks[index], "delivered", True))
+        DeliveryChannels.sms().send(messages, lambda index: setattr(sms_tasks[index], "delivered", True))
+
+    @staticmethod
+    def _job_response(job: NotificationJob) -> NotificationJobResponse:
+        response = NotificationJobResponse.from_orm(job)
+        response.progress = round(job.inserted / job.total, 4) if job.total else float(job.status == "completed")
+        return response
+
+    @staticmethod
+    async def create_broadcast(db: Session, request: BroadcastRequest, created_by: int) -> NotificationJobResponse:
+        if request.user_ids is not None and not request.user_ids:
+            raise ValueError("Алушылар тізімі бос")
+
+        job = NotificationJob(
+            created_by=created_by,
+            status="pending",
+            type=request.type,
+            message=request.message,
+            channel=request.channel,
+            target=request.json(include=_BROADCAST_FILTERS),
+            total=0,
+            inserted=0,
+            last_user_id=0
+        )
+        db.add(job)
+        db.flush()
+        TaskQueue.enqueue("notifications.broadcast", BroadcastTask(job_id=job.job_id), db)
+        db.commit()
+        db.refresh(job)
+        return NotificationService._job_response(job)
+
+    @staticmethod
+    async def get_broadcast(db: Session, job_id: int) -> Optional[NotificationJobResponse]:
+        job = db.query(NotificationJob).filter(NotificationJob.job_id == job_id).first()
+        return NotificationService._job_response(job) if job else None
+
+    @staticmethod
+    def run_broadcasts(db: Session, tasks: List[BroadcastTask]) -> None:
+        for task in tasks:
+            NotificationService._run_broadcast(db, task.job_id)
+
+    @staticmethod
+    def _run_broadcast(db: Session, job_id: int) -> None:
+        job = db.query(NotificationJob).filter(NotificationJob.job_id == job_id).first()
+        if not job or job.status == "completed":
+            return
+
+        target = json.loads(job.target)
+        if job.status == "pending":
+            job.total = db.execute(_BROADCAST_COUNT_SQL, target).scalar()
+        job.status = "running"
+        db.commit()
+
+        params = {**target, "job_id": job.job_id, "type": job.type, "message": job.message, "channel": job.channel}
+        try:
+            while True:
+                rows = db.execute(_BROADCAST_CHUNK_SQL, {
+                    **params, "after": job.last_user_id, "chunk": settings.BROADCAST_CHUNK_SIZE
+                }).all()
+                if not rows:
+                    break
+
+                job.inserted += len(rows)
+                job.last_user_id = rows[-1].user_id
+                # Бөлік жазбалары, жеткізу тапсырмалары және прогресс бірге commit болады
+                TaskQueue.enqueue_many("notifications.send", [
+                    NotificationTask(
+                        user_id=user_id,
+                        type=job.type,
+                        message=job.message,
+                        channel=job.channel,
+                        notification_id=notification_id
+                    )
+                    for notification_id, user_id in rows
+                ], db)
+                db.commit()
+                NotificationService.adjust_unread({user_id: 1 for _, user_id in rows})
+
+            job.status = "completed"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e)
+            db.commit()
+            raise
+
+        logger.info(f"Хабарландыру #{job.job_id} аяқталды: {job.inserted} алушы")
+
+    @staticmethod
+    def _read_up_to(db: Session, user_id: int) -> int:
+        return db.execute(_READ_MARK_SQL, {"user_id": user_id}).scalar() or 0
+
+    @staticmethod
+    def _to_response(notification: Notification, read_up_to: int) -> NotificationResponse:
+        response = NotificationResponse.from_orm(notification)
+        response.read = notification.read or notification.notification_id <= read_up_to
+        return response
+
+    @staticmethod
+    def unread_key(user_id: int) -> str:
+        return f"user:{user_id}:unread"
+
+    @staticmethod
+    def adjust_unread(deltas: Dict[int, int]) -> None:
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        try:
+            pipe = get_redis().pipeline()
+            for user_id, delta in deltas.items():
+                pipe.eval(_ADJUST_UNREAD_SCRIPT, 1, NotificationService.unread_key(user_id), delta)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Оқылмаған санауышын жаңарту қатесі: {e}")
+
+    @staticmethod
+    def reconcile_unread(db: Session, user_id: int) -> int:
+        count = db.execute(_UNREAD_COUNT_SQL, {"user_id": user_id}).scalar()
+        try:
+            get_redis().set(NotificationService.unread_key(user_id), count, ex=settings.UNREAD_COUNT_TTL)
+        except redis.RedisError as e:
+            logger.warning(f"Оқылмаған санауышын сақтау қатесі: {e}")
+        return count
+
+    @staticmethod
+    async def get_unread_count(db: Session, user_id: int) -> int:
+        try:
+            cached = get_redis().get(NotificationService.unread_key(user_id))
+        except redis.RedisError as e:
+            logger.warning(f"Оқылмаған санауышын оқу қатесі: {e}")
+            cached = None
+
+        if cached is not None:
+            return int(cached)
+        return NotificationService.reconcile_unread(db, user_id)
+
     @staticmethod
     async def get_user_notifications(
             db: Session,
             user_id: int,
-            unread_only: bool = False
-    ) -> List[NotificationResponse]:
+            unread_only: bool = False,
+            cursor: Optional[str] = None,
+            size: int = 50
+    ) -> NotificationPage:
 
+        read_up_to = NotificationService._read_up_to(db, user_id)
         query = db.query(Notification).filter(Notification.user_id == user_id)
 
         if unread_only:
-            query = query.filter(Notification.read == False)
+            query = query.filter(Notification.read == False, Notification.notification_id > read_up_to)
+
+        if cursor:
+            sent_at, notification_id = decode_cursor(cursor)
+            key = tuple_(Notification.sent_at, Notification.notification_id)
+            bound = tuple_(literal(datetime.fromisoformat(sent_at)), literal(int(notification_id)))
+            query = query.filter(key < bound)
 
-        notifications = query.order_by(Notification.sent_at.desc()).all()
+        notifications = query.order_by(
+            Notification.sent_at.desc(), Notification.notification_id.desc()
+        ).limit(size + 1).all()
+        has_more = len(notifications) > size
+        notifications = notifications[:size]
 
-        return [NotificationResponse.from_orm(notification) for notification in notifications]
+        next_cursor = None
+        if has_more:
+            last = notifications[-1]
+            next_cursor = encode_cursor(last.sent_at.isoformat(), last.notification_id)
+
+        return NotificationPage(
+            items=[NotificationService._to_response(notification, read_up_to) for notification in notifications],
+            next_cursor=next_cursor
+        )
+
+    @staticmethod
+    async def get_notification_by_id(db: Session, notification_id: int, user_id: int) -> Optional[NotificationResponse]:
+        notification = db.query(Notification).filter(
+            Notification.notification_id == notification_id,
+            Notification.user_id == user_id
+        ).first()
+        if not notification:
+            return None
+        return NotificationService._to_response(notification, NotificationService._read_up_to(db, user_id))
 
     @staticmethod
     async def mark_as_read(db: Session, notification_id: int, user_id: int) -> bool:
@@ -73,28 +591,86 @@ class NotificationService:
         if not notification:
             return False
 
-        notification.read = True
+        # Шартты UPDATE: параллель сұраныстар санауышты екі рет азайтпайды
+        updated = db.query(Notification).filter(
+            Notification.notification_id == notification_id,
+            Notification.read == False
+        ).update({"read": True}, synchronize_session=False)
         db.commit()
+
+        if updated and notification_id > NotificationService._read_up_to(db, user_id):
+            NotificationService.adjust_unread({user_id: -1})
         return True
 
     @staticmethod
     async def mark_all_as_read(db: Session, user_id: int):
-        db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.read == False
-        ).update({"read": True})
+        db.execute(_MARK_ALL_READ_SQL, {"user_id": user_id})
         db.commit()
 
+        try:
+            get_redis().set(NotificationService.unread_key(user_id), 0, ex=settings.UNREAD_COUNT_TTL)
+        except redis.RedisError as e:
+            logger.warning(f"Оқылмаған санауышын жаңарту қатесі: {e}")
+
     @staticmethod
     async def delete_notification(db: Session, notification_id: int, user_id: int) -> bool:
-        notification = db.query(Notification).filter(
-            Notification.notification_id == notification_id,
-            Notification.user_id == user_id
+        deleted = db.execute(
+            delete(Notification)
+            .where(Notification.notification_id == notification_id, Notification.user_id == user_id)
+            .returning(Notification.read)
         ).first()
 
-        if not notification:
+        if not deleted:
             return False
 
-        db.delete(notification)
         db.commit()
-        return True
\ No newline at end of file
+        if not deleted.read and notification_id > NotificationService._read_up_to(db, user_id):
+            NotificationService.adjust_unread({user_id: -1})
+        return True
+
+    @staticmethod
+    def apply_read_marks(db: Session, chunk_size: int) -> int:
+        total = 0
+        while True:
+            updated = db.execute(_APPLY_READ_MARKS_SQL, {"chunk_size": chunk_size}).rowcount
+            db.commit()
+            total += updated
+            if updated < chunk_size:
+                return total
+
+    @staticmethod
+    def purge_read(db: Session, chunk_size: int) -> int:
+        cutoff = datetime.utcnow() - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+        statement = _ARCHIVE_READ_SQL if settings.NOTIFICATION_ARCHIVE else _PURGE_READ_SQL
+
+        total = 0
+        while True:
+            removed = db.execute(statement, {"cutoff": cutoff, "chunk_size": chunk_size}).rowcount
+            db.commit()
+            total += removed
+            if removed < chunk_size:
+                return total
+
+    @staticmethod
+    def enforce_retention(db: Session, chunk_size: Optional[int] = None) -> dict:
+        chunk_size = chunk_size or settings.NOTIFICATION_RETENTION_CHUNK
+        return {
+            "marked_read": NotificationService.apply_read_marks(db, chunk_size),
+            "removed": NotificationService.purge_read(db, chunk_size),
+        }
+
+
+TaskQueue.register(Task(
+    "notifications.send",
+    NotificationTask,
+    NotificationService.deliver_batch,
+    batch_size=settings.NOTIFICATION_BATCH_SIZE
+))
+
+TaskQueue.register(Task(
+    "notifications.broadcast",
+    BroadcastTask,
+    NotificationService.run_broadcasts,
+    batch_size=1,
+    max_retries=3
+))
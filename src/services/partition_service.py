@@ -0,0 +1,130 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+import logging
+import re
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+_PARTITION_NAME = re.compile(r"^transactions_y(\d{4})m(\d{2})$")
+
+_PARTITIONS_SQL = text("""
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = :parent
+    ORDER BY c.relname
+""")
+
+
+def _month_start(year: int, month: int) -> date:
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"transactions_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_bounds(month: date) -> Tuple[date, date]:
+    return month, _month_start(month.year, month.month + 1)
+
+
+class PartitionService:
+    @staticmethod
+    def list_partitions(db: Session, parent: str = "transactions") -> List[str]:
+        return [row[0] for row in db.execute(_PARTITIONS_SQL, {"parent": parent}).all()]
+
+    @staticmethod
+    def ensure_partitions(db: Session, months_ahead: Optional[int] = None) -> int:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        existing = set(PartitionService.list_partitions(db))
+        today = datetime.utcnow().date()
+
+        created = 0
+        for offset in range(months_ahead + 1):
+            month = _month_start(today.year, today.month + offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+
+            start, end = partition_bounds(month)
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF transactions "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            created += 1
+
+        # Ауқымнан тыс жолдар үшін; қалыпты жағдайда бос тұрады
+        if "transactions_default" not in existing:
+            db.execute(text("CREATE TABLE IF NOT EXISTS transactions_default PARTITION OF transactions DEFAULT"))
+
+        db.commit()
+
+        if created:
+            logger.info(f"Транзакциялар бөлімдері құрылды: {created}")
+        return created
+
+    @staticmethod
+    def archive_partitions(db: Session, keep_months: Optional[int] = None) -> int:
+        keep_months = settings.PARTITION_HOT_MONTHS if keep_months is None else keep_months
+        today = datetime.utcnow().date()
+        cutoff = _month_start(today.year, today.month - keep_months)
+
+        archived = 0
+        for name in PartitionService.list_partitions(db):
+            match = _PARTITION_NAME.match(name)
+            if not match:
+                continue
+
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            start, end = partition_bounds(month)
+            if end > cutoff:
+                continue
+
+            # Ашық қарыз немесе төленбеген айыппұл қалса, бөлім ыстық кестеде қалады
+            busy = db.execute(text(f"""
+                SELECT EXISTS (SELECT 1 FROM {name} WHERE status IN ('active', 'overdue'))
+                    OR EXISTS (
+                        SELECT 1 FROM fines f JOIN {name} t ON t.transaction_id = f.transaction_id
+                        WHERE NOT f.paid
+                    )
+            """)).scalar()
+            if busy:
+                logger.info(f"{name} бөлімінде ашық жазбалар бар, мұрағатталмайды")
+                continue
+
+            db.execute(text(f"ALTER TABLE transactions DETACH PARTITION {name}"))
+            db.execute(text(
+                f"ALTER TABLE transactions_archive ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            db.execute(text(f"""
+                WITH moved AS (
+                    DELETE FROM fines f
+                    USING {name} t
+                    WHERE f.transaction_id = t.transaction_id
+                    RETURNING f.*
+                )
+                INSERT INTO fines_archive SELECT * FROM moved
+            """))
+            if settings.ARCHIVE_TABLESPACE:
+                db.execute(text(f"ALTER TABLE {name} SET TABLESPACE {settings.ARCHIVE_TABLESPACE}"))
+            db.commit()
+
+            archived += 1
+            logger.info(f"{name} бөлімі мұрағатқа көшірілді")
+
+        return archived
+
+    @staticmethod
+    def maintain(db: Session) -> dict:
+        return {
+            "created": PartitionService.ensure_partitions(db),
+            "archived": PartitionService.archive_partitions(db),
+        }
@@ -1,14 +1,59 @@
 
 from sqlalchemy.orm import Session
+from sqlalchemy import text
 from datetime import datetime, timedelta
 from typing import List, Optional
+import logging
 
 from ..models.transaction import Reservation
 from ..models.book import Book, BookCopy
 from ..models.user import User
 from ..schemas.transaction import ReservationRequest, ReservationResponse
+from ..schemas.notification import NotificationTask
 from ..core.config import settings
+from ..core.events import EventHub
 from ..services.audit_service import AuditService
+from ..services.circulation_service import CirculationService
+from ..services.hold_queue_service import HoldQueue
+from ..services.barcode_service import BarcodeResolver
+from ..services.notification_service import NotificationService
+
+logger = logging.getLogger(__name__)
+
+
+_CANCEL_SQL = text("""
+    WITH target AS (
+        SELECT reservation_id, status, book_id, copy_id
+        FROM reservations
+        WHERE reservation_id = :reservation_id AND user_id = :user_id AND status IN ('active', 'ready')
+        FOR UPDATE
+    )
+    UPDATE reservations r
+    SET status = 'cancelled', copy_id = NULL
+    FROM target
+    WHERE r.reservation_id = target.reservation_id
+    RETURNING target.status AS previous_status, target.book_id, target.copy_id
+""")
+
+_EXPIRE_SQL = text("""
+    WITH due AS (
+        SELECT reservation_id
+        FROM reservations
+        WHERE status IN ('active', 'ready') AND expires_at < :now
+        ORDER BY expires_at
+        LIMIT :chunk_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE reservations r
+    SET status = 'expired'
+    FROM due
+    WHERE r.reservation_id = due.reservation_id
+    RETURNING r.reservation_id, r.user_id, r.book_id, r.copy_id, r.status
+""")
+
+_COPY_STATES_SQL = text("""
+    SELECT copy_id, book_id, barcode, status FROM book_copies WHERE copy_id = ANY(:copy_ids)
+""")
 
 
 class ReservationService:
@@ -23,14 +68,6 @@ class ReservationService:
         if not book:
             raise ValueError("Кітап табылмады")
 
-        active_reservations = db.query(Reservation).filter(
-            Reservation.user_id == user_id,
-            Reservation.status == "active"
-        ).count()
-
-        if active_reservations >= 3:
-            raise ValueError("Сізде қазірдің өзінде максималды санында резерв бар")
-
         available_copies = db.query(BookCopy).filter(
             BookCopy.book_id == book_id,
             BookCopy.status == "available"
@@ -51,8 +88,21 @@ class ReservationService:
         )
 
         db.add(reservation)
+        db.flush()
+
+        snapshot = CirculationService.apply_delta(
+            db, user_id, reservations=1, max_reservations=settings.MAX_ACTIVE_RESERVATIONS
+        )
+        if snapshot is None:
+            db.rollback()
+            raise ValueError("Сізде қазірдің өзінде максималды санында резерв бар")
+
         db.commit()
         db.refresh(reservation)
+        CirculationService.cache_snapshot(snapshot)
+        HoldQueue.enqueue(book_id, reservation.reservation_id, reservation.reserved_at)
+
+        positions = HoldQueue.positions(db, [(book_id, reservation.reservation_id)])
 
         return ReservationResponse(
             reservation_id=reservation.reservation_id,
@@ -61,5 +111,127 @@ class ReservationService:
             reserved_at=reserved_at,
             expires_at=expires_at,
             status="active",
-            book_title=book.title
-        )
\ No newline at end of file
+            book_title=book.title,
+            queue_position=positions.get(reservation.reservation_id)
+        )
+
+    @staticmethod
+    async def get_user_reservations(db: Session, user_id: int, include_closed: bool = False) -> List[ReservationResponse]:
+        query = db.query(Reservation, Book.title) \
+            .join(Book, Book.book_id == Reservation.book_id) \
+            .filter(Reservation.user_id == user_id)
+
+        if not include_closed:
+            query = query.filter(Reservation.status.in_(["active", "ready"]))
+
+        rows = query.order_by(Reservation.reserved_at.desc()).all()
+
+        positions = HoldQueue.positions(db, [
+            (reservation.book_id, reservation.reservation_id)
+            for reservation, _ in rows if reservation.status == "active"
+        ])
+
+        return [
+            ReservationResponse(
+                reservation_id=reservation.reservation_id,
+                user_id=reservation.user_id,
+                book_id=reservation.book_id,
+                reserved_at=reservation.reserved_at,
+                expires_at=reservation.expires_at,
+                status=reservation.status,
+                book_title=book_title,
+                copy_id=reservation.copy_id,
+                queue_position=positions.get(reservation.reservation_id)
+            )
+            for reservation, book_title in rows
+        ]
+
+    @staticmethod
+    async def cancel_reservation(db: Session, reservation_id: int, user_id: int) -> bool:
+        row = db.execute(_CANCEL_SQL, {"reservation_id": reservation_id, "user_id": user_id}).mappings().first()
+        if not row:
+            db.rollback()
+            return False
+
+        # Сөредегі көшірме кезектегі келесі оқырманға өтеді
+        holds = []
+        if row["previous_status"] == "ready" and row["copy_id"]:
+            holds = HoldQueue.assign_copies(
+                db, [row["copy_id"]], datetime.utcnow() + timedelta(days=settings.HOLD_PICKUP_DAYS)
+            )
+            HoldQueue.announce(db, holds)
+
+        snapshot = CirculationService.apply_delta(db, user_id, reservations=-1)
+        await AuditService.log_actions_bulk(db, [{
+            "user_id": user_id,
+            "action": "reservation_cancelled",
+            "action_type": "update",
+            "entity_type": "reservation",
+            "entity_id": reservation_id,
+            "details": {"reservation_id": reservation_id, "book_id": row["book_id"]}
+        }])
+
+        db.commit()
+        CirculationService.cache_snapshot(snapshot)
+        HoldQueue.remove([(row["book_id"], reservation_id)] + HoldQueue.entries(holds))
+
+        if row["copy_id"]:
+            copy = db.query(BookCopy).filter(BookCopy.copy_id == row["copy_id"]).first()
+            if copy:
+                copies = [{"copy_id": copy.copy_id, "book_id": copy.book_id, "barcode": copy.barcode, "status": copy.status}]
+                BarcodeResolver.store(copies)
+                EventHub.publish_availability(copies)
+
+        return True
+
+    @staticmethod
+    def expire_reservations(db: Session, chunk_size: Optional[int] = None) -> int:
+        chunk_size = chunk_size or settings.RESERVATION_EXPIRY_CHUNK
+        now = datetime.utcnow()
+        hold_until = now + timedelta(days=settings.HOLD_PICKUP_DAYS)
+        total = 0
+
+        while True:
+            expired = db.execute(_EXPIRE_SQL, {"now": now, "chunk_size": chunk_size}).mappings().all()
+            if not expired:
+                db.commit()
+                break
+
+            # Сөреде ұсталған көшірмелер кезектегі келесі оқырманға өтеді немесе босатылады
+            freed = [row["copy_id"] for row in expired if row["copy_id"]]
+            holds = HoldQueue.assign_copies(db, freed, hold_until)
+            HoldQueue.announce(db, holds)
+
+            deltas = {}
+            for row in expired:
+                _, reservations, _ = deltas.get(row["user_id"], (0, 0, 0.0))
+                deltas[row["user_id"]] = (0, reservations - 1, 0.0)
+            snapshots = CirculationService.apply_deltas(db, deltas)
+
+            copies = [dict(copy) for copy in db.execute(_COPY_STATES_SQL, {"copy_ids": freed}).mappings()] if freed else []
+
+            expired_by_user = {}
+            for row in expired:
+                expired_by_user[row["user_id"]] = expired_by_user.get(row["user_id"], 0) + 1
+            NotificationService.enqueue_batch([
+                NotificationTask(
+                    user_id=user_id,
+                    type="reservation",
+                    message="Сіздің резервіңіздің мерзімі өтті." if count == 1 else f"Сіздің {count} резервіңіздің мерзімі өтті."
+                )
+                for user_id, count in expired_by_user.items()
+            ], db)
+            db.commit()
+
+            CirculationService.cache_snapshots(snapshots)
+            HoldQueue.remove([(row["book_id"], row["reservation_id"]) for row in expired] + HoldQueue.entries(holds))
+            BarcodeResolver.store(copies)
+            EventHub.publish_availability(copies)
+
+            total += len(expired)
+            if len(expired) < chunk_size:
+                break
+
+        if total:
+            logger.info(f"Резервтер мерзімі өтті: {total}")
+        return total
@@ -1,312 +1,1190 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from datetime import datetime, timedelta
-from typing import List, Optional
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import or_, text, insert, tuple_, literal, select, union_all
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Iterator
+import logging
+import json
 import redis
+import csv
+import io
 
-from ..models.transaction import Transaction, Fine
+from ..models.transaction import Transaction, Fine, transactions_archive
 from ..models.book import Book, BookCopy
 from ..models.user import User
-from ..schemas.transaction import BorrowResponse, ReturnResponse, TransactionResponse, FineResponse
+from ..schemas.transaction import (
+    BorrowResponse, ReturnResponse, TransactionResponse, FineResponse,
+    BatchItemResult, BatchCirculationResponse, OverdueTransactionResponse, OverduePage,
+    TransactionPage, RenewResponse, RenewAllResponse
+)
+from ..schemas.notification import NotificationTask
 from ..core.config import settings
+from ..core.cache import get_redis
+from ..core.events import EventHub
+from ..core.pagination import encode_cursor, decode_cursor
 from ..services.audit_service import AuditService
 from ..services.notification_service import NotificationService
+from ..services.circulation_service import CirculationService
+from ..services.barcode_service import BarcodeResolver
+from ..services.fine_service import FineService
+from ..services.hold_queue_service import HoldQueue
+
+logger = logging.getLogger(__name__)
+
+
+_CHECKOUT_SQL = text("""
+    WITH patron AS (
+        UPDATE patron_snapshots s
+        SET active_loans = s.active_loans + 1,
+            active_reservations = s.active_reservations - (
+                SELECT count(*) FROM reservations r
+                WHERE r.copy_id = :copy_id AND r.user_id = :user_id AND r.status = 'ready'
+            ),
+            updated_at = now()
+        FROM users u
+        WHERE s.user_id = :user_id
+          AND u.user_id = s.user_id
+          AND u.is_active
+          AND s.active_loans < :max_loans
+          AND NOT s.blocked
+        RETURNING s.user_id, s.active_loans, s.active_reservations, s.unpaid_fines_total, s.blocked
+    ),
+    claimed AS (
+        UPDATE book_copies c
+        SET status = 'borrowed'
+        FROM patron
+        WHERE c.copy_id = :copy_id
+          AND (c.status = 'available' OR (c.status = 'reserved' AND EXISTS (
+              SELECT 1 FROM reservations r
+              WHERE r.copy_id = c.copy_id AND r.user_id = :user_id AND r.status = 'ready'
+          )))
+        RETURNING c.copy_id, c.book_id, c.barcode
+    ),
+    fulfilled AS (
+        UPDATE reservations r
+        SET status = 'fulfilled'
+        FROM claimed
+        WHERE r.copy_id = claimed.copy_id AND r.user_id = :user_id AND r.status = 'ready'
+    ),
+    created AS (
+        INSERT INTO transactions (user_id, copy_id, type, borrow_date, due_date, fine_amount, status)
+        SELECT :user_id, claimed.copy_id, 'borrow', :borrow_date, :due_date, 0, 'active'
+        FROM claimed
+        RETURNING transaction_id
+    ),
+    audited AS (
+        INSERT INTO audit_logs (user_id, action, entity_type, entity_id, action_type, details, status)
+        SELECT :user_id, 'book_borrowed', 'transaction', created.transaction_id, 'create',
+               json_build_object(
+                   'transaction_id', created.transaction_id,
+                   'copy_id', :copy_id,
+                   'expected_days', :expected_days
+               )::text,
+               'success'
+        FROM created
+    )
+    SELECT created.transaction_id, b.title, claimed.book_id, claimed.barcode,
+           patron.user_id, patron.active_loans, patron.active_reservations,
+           patron.unpaid_fines_total, patron.blocked
+    FROM created, patron, claimed
+    JOIN books b ON b.book_id = claimed.book_id
+""")
+
+_CHECKOUT_DIAGNOSTIC_SQL = text("""
+    SELECT
+        u.is_active,
+        s.user_id IS NOT NULL AS has_snapshot,
+        s.active_loans,
+        s.unpaid_fines_total,
+        s.blocked,
+        (SELECT c.status FROM book_copies c WHERE c.copy_id = :copy_id) AS copy_status
+    FROM users u
+    LEFT JOIN patron_snapshots s ON s.user_id = u.user_id
+    WHERE u.user_id = :user_id
+""")
+
+# Жалғыз қарызға алудағыдай: көшірме бос болуы немесе осы оқырманға дайын тұруы керек
+_RESOLVE_COPIES_SQL = text("""
+    SELECT c.copy_id, c.barcode, c.book_id, c.status, b.title,
+           (SELECT r.reservation_id FROM reservations r
+            WHERE r.copy_id = c.copy_id AND r.user_id = :user_id AND r.status = 'ready'
+            LIMIT 1) AS ready_reservation_id
+    FROM book_copies c
+    JOIN books b ON b.book_id = c.book_id
+    WHERE c.copy_id = ANY(:copy_ids) OR c.barcode = ANY(:barcodes)
+    ORDER BY c.copy_id
+    FOR UPDATE OF c
+""")
+
+_CLAIM_COPIES_SQL = text("""
+    UPDATE book_copies SET status = 'borrowed' WHERE copy_id = ANY(:copy_ids)
+""")
+
+_FULFIL_RESERVATIONS_SQL = text("""
+    UPDATE reservations SET status = 'fulfilled' WHERE reservation_id = ANY(:reservation_ids)
+""")
+
+_RESOLVE_LOANS_SQL = text("""
+    SELECT t.transaction_id, t.user_id, t.copy_id, t.due_date, t.status, c.barcode, c.book_id, b.title
+    FROM transactions t
+    JOIN book_copies c ON c.copy_id = t.copy_id
+    JOIN books b ON b.book_id = c.book_id
+    WHERE t.transaction_id = ANY(:transaction_ids)
+       OR (t.status IN ('active', 'overdue') AND (t.copy_id = ANY(:copy_ids) OR c.barcode = ANY(:barcodes)))
+    ORDER BY t.transaction_id
+    FOR UPDATE OF t
+""")
+
+_CLOSE_LOANS_SQL = text("""
+    UPDATE transactions t
+    SET return_date = :return_date,
+        fine_amount = d.fine_amount,
+        status = 'returned'
+    FROM unnest(
+        CAST(:transaction_ids AS integer[]),
+        CAST(:fine_amounts AS numeric[])
+    ) AS d(transaction_id, fine_amount)
+    WHERE t.transaction_id = d.transaction_id
+""")
+
+_MARK_OVERDUE_SQL = text("""
+    WITH due AS (
+        SELECT transaction_id
+        FROM transactions
+        WHERE status = 'active' AND due_date < :now
+        ORDER BY due_date
+        LIMIT :chunk_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE transactions t
+    SET status = 'overdue'
+    FROM due
+    WHERE t.transaction_id = due.transaction_id
+    RETURNING t.user_id
+""")
+
+# Еске салу белгісі сол UPDATE-те қойылады: қайталанған іске қосу сол қарызды қайта алмайды
+_DUE_REMINDERS_SQL = text("""
+    WITH due AS (
+        SELECT transaction_id, borrow_date
+        FROM transactions
+        WHERE status = 'active' AND due_date >= :now AND due_date < :until AND reminded_at IS NULL
+        ORDER BY due_date
+        LIMIT :chunk_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    reminded AS (
+        UPDATE transactions t
+        SET reminded_at = :now
+        FROM due
+        WHERE t.transaction_id = due.transaction_id AND t.borrow_date = due.borrow_date
+        RETURNING t.user_id, t.copy_id, t.due_date
+    )
+    SELECT r.user_id, r.due_date, b.title
+    FROM reminded r
+    JOIN book_copies c ON c.copy_id = r.copy_id
+    JOIN books b ON b.book_id = c.book_id
+    ORDER BY r.user_id, r.due_date
+""")
+
+# Барлық шарттар бір UPDATE ішінде тексеріледі: жол құлыпталған соң қайта бағаланады
+_RENEW_SQL = text("""
+    WITH renewed AS (
+        UPDATE transactions t
+        SET due_date = t.due_date + make_interval(days => :days),
+            renewal_count = t.renewal_count + 1,
+            reminded_at = NULL
+        FROM users u
+        JOIN roles r ON r.role_id = u.role_id
+        WHERE u.user_id = t.user_id
+          AND t.user_id = :user_id
+          AND (CAST(:transaction_id AS integer) IS NULL OR t.transaction_id = :transaction_id)
+          AND t.status = 'active'
+          AND t.due_date >= :now
+          AND t.renewal_count < :max_renewals
+          AND t.due_date + make_interval(days => :days) <= t.borrow_date + make_interval(
+              days => coalesce(CAST(CAST(:role_limits AS jsonb) ->> lower(r.role_name) AS integer), :max_days)
+          )
+          AND NOT EXISTS (
+              SELECT 1
+              FROM book_copies c
+              JOIN reservations res ON res.book_id = c.book_id AND res.status = 'active'
+              WHERE c.copy_id = t.copy_id
+          )
+          AND NOT EXISTS (
+              SELECT 1 FROM patron_snapshots s WHERE s.user_id = t.user_id AND s.blocked
+          )
+        RETURNING t.transaction_id, t.due_date, t.renewal_count
+    ),
+    audited AS (
+        INSERT INTO audit_logs (user_id, action, entity_type, entity_id, action_type, details, status)
+        SELECT :user_id, 'book_renewed', 'transaction', renewed.transaction_id, 'update',
+               json_build_object(
+                   'transaction_id', renewed.transaction_id,
+                   'days', :days,
+                   'renewal_count', renewed.renewal_count
+               )::text,
+               'success'
+        FROM renewed
+    )
+    SELECT loans.total AS open_loans, renewed.transaction_id, renewed.due_date, renewed.renewal_count
+    FROM (
+        SELECT count(*) AS total
+        FROM transactions
+        WHERE user_id = :user_id AND status IN ('active', 'overdue')
+    ) loans
+    LEFT JOIN renewed ON true
+    ORDER BY renewed.due_date
+""")
+
+_RENEW_DIAGNOSTIC_SQL = text("""
+    SELECT t.user_id, t.status, t.renewal_count, t.borrow_date, t.due_date,
+           coalesce(CAST(CAST(:role_limits AS jsonb) ->> lower(r.role_name) AS integer), :max_days) AS max_days,
+           EXISTS (
+               SELECT 1
+               FROM book_copies c
+               JOIN reservations res ON res.book_id = c.book_id AND res.status = 'active'
+               WHERE c.copy_id = t.copy_id
+           ) AS reserved,
+           coalesce(s.blocked, false) AS blocked
+    FROM transactions t
+    JOIN users u ON u.user_id = t.user_id
+    JOIN roles r ON r.role_id = u.role_id
+    LEFT JOIN patron_snapshots s ON s.user_id = t.user_id
+    WHERE t.transaction_id = :transaction_id
+""")
+
+_PROVISIONAL_FINES_SQL = text("""
+    SELECT transaction_id, fine_id, amount
+    FROM fines
+    WHERE transaction_id = ANY(:transaction_ids) AND provisional AND NOT paid
+    FOR UPDATE
+""")
+
+_FINALIZE_FINES_SQL = text("""
+    INSERT INTO fines (user_id, transaction_id, amount, paid, provisional, issued_at)
+    SELECT d.user_id, d.transaction_id, d.amount, false, false, now()
+    FROM unnest(
+        CAST(:user_ids AS integer[]),
+        CAST(:transaction_ids AS integer[]),
+        CAST(:amounts AS numeric[])
+    ) AS d(user_id, transaction_id, amount)
+    ON CONFLICT (transaction_id) DO UPDATE SET
+        amount = EXCLUDED.amount,
+        provisional = false,
+        issued_at = EXCLUDED.issued_at
+    WHERE fines.provisional AND NOT fines.paid
+    RETURNING fine_id, transaction_id
+""")
+
+_DROP_PROVISIONAL_FINES_SQL = text("""
+    DELETE FROM fines WHERE transaction_id = ANY(:transaction_ids) AND provisional AND NOT paid
+""")
+
+OPEN_LOAN_STATUSES = ("active", "overdue")
+
+EXPORT_COLUMNS = (
+    "transaction_id", "user_id", "user_name", "copy_id", "book_title", "type",
+    "borrow_date", "due_date", "return_date", "fine_amount", "status"
+)
+
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 
 class TransactionService:
     @staticmethod
     async def borrow_book(db: Session, user_id: int, copy_id: int, expected_days: int = 14) -> BorrowResponse:
 
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if not user or not user.is_active:
+        if expected_days < 1 or expected_days > settings.MAX_BORROW_DAYS:
+            raise ValueError(f"Қарыз мерзімі 1-ден {settings.MAX_BORROW_DAYS} күнге дейін болуы керек")
+
+        borrow_date = datetime.utcnow()
+        due_date = borrow_date + timedelta(days=expected_days)
+
+        params = {
+            "user_id": user_id,
+            "copy_id": copy_id,
+            "borrow_date": borrow_date,
+            "due_date": due_date,
+            "expected_days": expected_days,
+            "max_loans": settings.MAX_ACTIVE_LOANS,
+        }
+
+        row = db.execute(_CHECKOUT_SQL, params).mappings().first()
+        if row is None:
+            db.rollback()
+            # Снимок жоқ болған жағдайда ғана оралады: снимок құрылған соң бір рет қайталаймыз
+            TransactionService._raise_checkout_error(db, user_id, copy_id)
+            row = db.execute(_CHECKOUT_SQL, params).mappings().first()
+            if row is None:
+                db.rollback()
+                TransactionService._raise_checkout_error(db, user_id, copy_id)
+
+        transaction_id, book_title = row["transaction_id"], row["title"]
+        message = f"Сіз '{book_title}' кітабын {due_date.strftime('%Y-%m-%d')} мерзіміне дейін қарызға алдыңыз."
+        TransactionService._notify(db, user_id, "borrow", message)
+        db.commit()
+
+        CirculationService.cache_snapshot(row)
+        copies = [{"copy_id": copy_id, "book_id": row["book_id"], "barcode": row["barcode"], "status": "borrowed"}]
+        BarcodeResolver.store(copies)
+        EventHub.publish_availability(copies)
+        get_redis().delete(f"user:{user_id}:transactions")
+
+        return BorrowResponse(
+            transaction_id=transaction_id,
+            user_id=user_id,
+            copy_id=copy_id,
+            borrow_date=borrow_date,
+            due_date=due_date,
+            fine_amount=0.0
+        )
+
+    @staticmethod
+    def _raise_checkout_error(db: Session, user_id: int, copy_id: int) -> None:
+        state = db.execute(_CHECKOUT_DIAGNOSTIC_SQL, {"user_id": user_id, "copy_id": copy_id}).first()
+
+        if state is None or not state.is_active:
+            db.rollback()
             raise ValueError("Пайдаланушы белсенді емес немесе табылмады")
 
-        book_copy = db.query(BookCopy).filter(BookCopy.copy_id == copy_id).first()
-        if not book_copy:
+        if not state.has_snapshot:
+            # Снимок жоқ болса, оны құрып, шақырушыға қайта әрекет етуге мүмкіндік береміз
+            CirculationService.rebuild_snapshot(db, user_id)
+            db.commit()
+            return
+
+        db.rollback()
+
+        if state.copy_status is None:
             raise ValueError("Кітап көшірмесі табылмады")
 
-        if book_copy.status != "available":
-            raise ValueError("Кітап қолжетімді емес")
+        if state.copy_status == "reserved":
+            raise ValueError("Кітап басқа оқырманға резервте тұр")
 
-        active_borrowings = db.query(Transaction).filter(
-            and_(
-                Transaction.user_id == user_id,
-                Transaction.status == "active"
-            )
-        ).count()
+        if state.copy_status != "available":
+            raise ValueError("Кітап қолжетімді емес")
 
-        if active_borrowings >= 5:
+        if state.active_loans >= settings.MAX_ACTIVE_LOANS:
             raise ValueError("Сізде қазірдің өзінде максималды санында кітап бар")
 
-        unpaid_fines = db.query(Fine).filter(
-            and_(
-                Fine.user_id == user_id,
-                Fine.paid == False
-            )
-        ).all()
+        if state.blocked:
+            raise ValueError(f"Сізде төленбеген айыппұл бар: {state.unpaid_fines_total} теңге")
 
-        if unpaid_fines:
-            total_unpaid = sum([fine.amount for fine in unpaid_fines])
-            if total_unpaid > 1000:  # Егер 1000 теңгеден асса
-                raise ValueError(f"Сізде төленбеген айыппұл бар: {total_unpaid} теңге")
+        raise ValueError("Кітап қолжетімді емес")
+
+    @staticmethod
+    async def borrow_batch(
+            db: Session,
+            user_id: int,
+            copy_ids: List[int],
+            barcodes: List[str],
+            expected_days: int = 14
+    ) -> BatchCirculationResponse:
+        TransactionService._validate_batch_size(len(copy_ids) + len(barcodes))
 
         if expected_days < 1 or expected_days > settings.MAX_BORROW_DAYS:
             raise ValueError(f"Қарыз мерзімі 1-ден {settings.MAX_BORROW_DAYS} күнге дейін болуы керек")
 
+        patron = CirculationService.lock_snapshot(db, user_id)
+        if not patron or not patron["is_active"]:
+            db.rollback()
+            raise ValueError("Пайдаланушы белсенді емес немесе табылмады")
+
+        copies = db.execute(_RESOLVE_COPIES_SQL, {
+            "user_id": user_id,
+            "copy_ids": copy_ids,
+            "barcodes": barcodes,
+        }).mappings().all()
+        by_id = {copy["copy_id"]: copy for copy in copies}
+        by_barcode = {copy["barcode"]: copy for copy in copies}
+
+        requested = [(BatchItemResult(copy_id=copy_id, success=False), by_id.get(copy_id)) for copy_id in copy_ids]
+        requested += [(BatchItemResult(barcode=barcode, success=False), by_barcode.get(barcode)) for barcode in barcodes]
+
         borrow_date = datetime.utcnow()
         due_date = borrow_date + timedelta(days=expected_days)
+        slots = settings.MAX_ACTIVE_LOANS - patron["active_loans"]
+        chosen = {}
 
-        transaction = Transaction(
-            user_id=user_id,
-            copy_id=copy_id,
-            type="borrow",
-            borrow_date=borrow_date,
-            due_date=due_date,
-            status="active"
-        )
+        for item, copy in requested:
+            if copy is None:
+                item.error = "Кітап көшірмесі табылмады"
+                continue
+
+            item.copy_id = copy["copy_id"]
+            item.barcode = copy["barcode"]
+
+            if copy["copy_id"] in chosen:
+                item.error = "Көшірме сұраныста қайталанды"
+            elif patron["blocked"]:
+                item.error = f"Сізде төленбеген айыппұл бар: {patron['unpaid_fines_total']} теңге"
+            elif copy["status"] == "reserved" and not copy["ready_reservation_id"]:
+                item.error = "Кітап басқа оқырманға резервте тұр"
+            elif copy["status"] not in ("available", "reserved"):
+                item.error = "Кітап қолжетімді емес"
+            elif len(chosen) >= slots:
+                item.error = "Сізде қазірдің өзінде максималды санында кітап бар"
+            else:
+                chosen[copy["copy_id"]] = (item, copy)
+
+        snapshots = []
+        if chosen:
+            db.execute(_CLAIM_COPIES_SQL, {"copy_ids": list(chosen)})
+            fulfilled = [
+                copy["ready_reservation_id"] for _, copy in chosen.values()
+                if copy["status"] == "reserved"
+            ]
+            if fulfilled:
+                db.execute(_FULFIL_RESERVATIONS_SQL, {"reservation_ids": fulfilled})
 
-        book_copy.status = "borrowed"
+            created = db.execute(
+                insert(Transaction).returning(Transaction.transaction_id, Transaction.copy_id),
+                [
+                    {
+                        "user_id": user_id,
+                        "copy_id": copy_id,
+                        "type": "borrow",
+                        "borrow_date": borrow_date,
+                        "due_date": due_date,
+                        "fine_amount": 0,
+                        "status": "active",
+                    }
+                    for copy_id in chosen
+                ]
+            ).all()
+
+            audit_entries = []
+            for transaction_id, copy_id in created:
+                item, _ = chosen[copy_id]
+                item.transaction_id = transaction_id
+                item.due_date = due_date
+                item.success = True
+                audit_entries.append({
+                    "user_id": user_id,
+                    "action": "book_borrowed",
+                    "action_type": "create",
+                    "entity_type": "transaction",
+                    "entity_id": transaction_id,
+                    "details": {
+                        "transaction_id": transaction_id,
+                        "copy_id": copy_id,
+                        "expected_days": expected_days
+                    }
+                })
+
+            snapshots = CirculationService.apply_deltas(db, {user_id: (len(created), -len(fulfilled), 0.0)})
+            await AuditService.log_actions_bulk(db, audit_entries)
+
+            titles = ", ".join(f"'{copy['title']}'" for _, copy in chosen.values())
+            message = f"Сіз {titles} кітаптарын {due_date.strftime('%Y-%m-%d')} мерзіміне дейін қарызға алдыңыз."
+            TransactionService._notify(db, user_id, "borrow", message)
 
-        db.add(transaction)
         db.commit()
-        db.refresh(transaction)
 
-        redis_client = redis.Redis.from_url(settings.REDIS_URL)
-        redis_client.delete(f"user:{user_id}:transactions")
+        if chosen:
+            CirculationService.cache_snapshots(snapshots)
+            borrowed = [
+                {"copy_id": copy_id, "book_id": copy["book_id"], "barcode": copy["barcode"], "status": "borrowed"}
+                for copy_id, (_, copy) in chosen.items()
+            ]
+            BarcodeResolver.store(borrowed)
+            EventHub.publish_availability(borrowed)
+            get_redis().delete(f"user:{user_id}:transactions")
 
-        await AuditService.log_action(
-            db,
-            user_id=user_id,
-            action="book_borrowed",
-            action_type="create",
-            entity_type="transaction",
-            entity_id=transaction.transaction_id,
-            details={
-                "transaction_id": transaction.transaction_id,
-                "copy_id": copy_id,
-                "expected_days": expected_days
-            }
+        items = [item for item, _ in requested]
+        succeeded = sum(1 for item in items if item.success)
+        return BatchCirculationResponse(succeeded=succeeded, failed=len(items) - succeeded, items=items)
+
+    @staticmethod
+    async def borrow_by_barcode(db: Session, user_id: int, barcode: str, expected_days: int = 14) -> BorrowResponse:
+        entry = BarcodeResolver.resolve(db, barcode)
+        if not entry:
+            raise ValueError("Кітап көшірмесі табылмады")
+
+        return await TransactionService.borrow_book(db, user_id, entry["copy_id"], expected_days)
+
+    @staticmethod
+    def _renew_params(user_id: int, days: int, transaction_id: Optional[int] = None) -> dict:
+        if days < 1 or days > settings.MAX_BORROW_DAYS:
+            raise ValueError(f"Ұзарту мерзімі 1-ден {settings.MAX_BORROW_DAYS} күнге дейін болуы керек")
+
+        return {
+            "user_id": user_id,
+            "transaction_id": transaction_id,
+            "days": days,
+            "max_renewals": settings.MAX_RENEWALS,
+            "role_limits": json.dumps(settings.ROLE_MAX_LOAN_DAYS),
+            "max_days": settings.MAX_BORROW_DAYS,
+            "now": datetime.utcnow(),
+        }
+
+    @staticmethod
+    async def renew_book(db: Session, transaction_id: int, user_id: int, days: int = 7) -> RenewResponse:
+        params = TransactionService._renew_params(user_id, days, transaction_id)
+
+        rows = db.execute(_RENEW_SQL, params).mappings().all()
+        renewed = [row for row in rows if row["transaction_id"] is not None]
+        if not renewed:
+            db.rollback()
+            TransactionService._raise_renewal_error(db, transaction_id, user_id, days)
+
+        row = renewed[0]
+        TransactionService._notify(
+            db, user_id, "renew", f"Қарыз мерзімі {row['due_date'].strftime('%Y-%m-%d')} дейін ұзартылды."
+        )
+        db.commit()
+        get_redis().delete(f"user:{user_id}:transactions")
+
+        return RenewResponse(
+            transaction_id=row["transaction_id"],
+            due_date=row["due_date"],
+            renewal_count=row["renewal_count"]
         )
 
-        book = db.query(Book).filter(Book.book_id == book_copy.book_id).first()
-        if book:
-            message = f"Сіз '{book.title}' кітабын {due_date.strftime('%Y-%m-%d')} мерзіміне дейін қарызға алдыңыз."
-            NotificationService.send_notification_async.delay(
-                user_id, "borrow", message, "email"
+    @staticmethod
+    def _raise_renewal_error(db: Session, transaction_id: int, user_id: int, days: int) -> None:
+        loan = db.execute(_RENEW_DIAGNOSTIC_SQL, {
+            "transaction_id": transaction_id,
+            "role_limits": json.dumps(settings.ROLE_MAX_LOAN_DAYS),
+            "max_days": settings.MAX_BORROW_DAYS,
+        }).mappings().first()
+
+        if not loan or loan["user_id"] != user_id:
+            raise ValueError("Транзакция табылмады")
+        # mark_overdue әлі өтпесе де, мерзімі өткен қарыз ұзартылмайды
+        if loan["status"] == "overdue" or (loan["status"] == "active" and _utc_naive(loan["due_date"]) < datetime.utcnow()):
+            raise ValueError("Мерзімі өткен кітапты ұзартуға болмайды")
+        if loan["status"] != "active":
+            raise ValueError("Кітап қайтарылған")
+        if loan["blocked"]:
+            raise ValueError("Төленбеген айыппұлдар шектен асты")
+        if loan["renewal_count"] >= settings.MAX_RENEWALS:
+            raise ValueError(f"Ұзарту саны шектен асты ({settings.MAX_RENEWALS})")
+        if loan["reserved"]:
+            raise ValueError("Кітапқа басқа оқырман резерв қойған")
+        if _utc_naive(loan["due_date"]) + timedelta(days=days) > _utc_naive(loan["borrow_date"]) + timedelta(days=loan["max_days"]):
+            raise ValueError(f"Жалпы қарыз мерзімі {loan['max_days']} күннен аспауы керек")
+        raise ValueError("Қарызды ұзарту мүмкін емес")
+
+    @staticmethod
+    async def renew_all(db: Session, user_id: int, days: int = 7) -> RenewAllResponse:
+        params = TransactionService._renew_params(user_id, days)
+
+        rows = db.execute(_RENEW_SQL, params).mappings().all()
+
+        renewed = [
+            RenewResponse(
+                transaction_id=row["transaction_id"],
+                due_date=row["due_date"],
+                renewal_count=row["renewal_count"]
             )
+            for row in rows if row["transaction_id"] is not None
+        ]
+        if renewed:
+            TransactionService._notify(db, user_id, "renew", f"{len(renewed)} кітаптың қарыз мерзімі ұзартылды.")
+        db.commit()
 
-        return BorrowResponse(
-            transaction_id=transaction.transaction_id,
-            user_id=user_id,
-            copy_id=copy_id,
-            borrow_date=borrow_date,
-            due_date=due_date,
-            fine_amount=0.0
-        )
+        if renewed:
+            get_redis().delete(f"user:{user_id}:transactions")
+
+        return RenewAllResponse(renewed=renewed, skipped=rows[0]["open_loans"] - len(renewed))
 
     @staticmethod
     async def return_book(db: Session, transaction_id: int, returned_at: Optional[datetime] = None) -> ReturnResponse:
-        transaction = db.query(Transaction).filter(Transaction.transaction_id == transaction_id).first()
-        if not transaction:
+        loan = db.execute(_RESOLVE_LOANS_SQL, {
+            "transaction_ids": [transaction_id],
+            "copy_ids": [],
+            "barcodes": [],
+        }).mappings().first()
+
+        if not loan:
+            db.rollback()
             raise ValueError("Транзакция табылмады")
 
-        if transaction.status != "active":
+        if loan["status"] not in OPEN_LOAN_STATUSES:
+            db.rollback()
             raise ValueError("Бұл транзакция белсенді емес")
 
-        return_date = returned_at or datetime.utcnow()
+        return await TransactionService._return_loan(db, loan, returned_at)
+
+    @staticmethod
+    async def return_by_barcode(db: Session, barcode: str, returned_at: Optional[datetime] = None) -> ReturnResponse:
+        entry = BarcodeResolver.resolve(db, barcode)
+        if not entry:
+            raise ValueError("Кітап көшірмесі табылмады")
+
+        loan = db.execute(_RESOLVE_LOANS_SQL, {
+            "transaction_ids": [],
+            "copy_ids": [entry["copy_id"]],
+            "barcodes": [],
+        }).mappings().first()
+
+        if not loan:
+            db.rollback()
+            raise ValueError("Белсенді транзакция табылмады")
+
+        return await TransactionService._return_loan(db, loan, returned_at)
+
+    @staticmethod
+    async def _return_loan(db: Session, loan, returned_at: Optional[datetime]) -> ReturnResponse:
+        return_date = _utc_naive(returned_at) if returned_at else datetime.utcnow()
+
+        settlement = await TransactionService._settle_returns(db, [loan], return_date)
+        db.commit()
+        TransactionService._after_returns(settlement)
+
+        settled = settlement["items"][0]
+        return ReturnResponse(
+            transaction_id=loan["transaction_id"],
+            return_date=return_date,
+            fine_amount=settled["fine_amount"],
+            days_overdue=settled["days_overdue"]
+        )
+
+    @staticmethod
+    async def return_batch(
+            db: Session,
+            transaction_ids: List[int],
+            copy_ids: List[int],
+            barcodes: List[str],
+            returned_at: Optional[datetime] = None
+    ) -> BatchCirculationResponse:
+        TransactionService._validate_batch_size(len(transaction_ids) + len(copy_ids) + len(barcodes))
 
-        days_overdue = 0
-        fine_amount = 0.0
+        loans = db.execute(_RESOLVE_LOANS_SQL, {
+            "transaction_ids": transaction_ids,
+            "copy_ids": copy_ids,
+            "barcodes": barcodes,
+        }).mappings().all()
+        by_id = {loan["transaction_id"]: loan for loan in loans}
+        active = [loan for loan in loans if loan["status"] in OPEN_LOAN_STATUSES]
+        by_copy = {loan["copy_id"]: loan for loan in active}
+        by_barcode = {loan["barcode"]: loan for loan in active}
 
-        if return_date > transaction.due_date:
-            days_overdue = (return_date - transaction.due_date).days
+        requested = [(BatchItemResult(transaction_id=tid, success=False), by_id.get(tid)) for tid in transaction_ids]
+        requested += [(BatchItemResult(copy_id=copy_id, success=False), by_copy.get(copy_id)) for copy_id in copy_ids]
+        requested += [(BatchItemResult(barcode=barcode, success=False), by_barcode.get(barcode)) for barcode in barcodes]
+
+        chosen = {}
+        for item, loan in requested:
+            if loan is None:
+                item.error = "Белсенді транзакция табылмады"
+                continue
+
+            item.transaction_id = loan["transaction_id"]
+            item.copy_id = loan["copy_id"]
+            item.barcode = loan["barcode"]
+
+            if loan["status"] not in OPEN_LOAN_STATUSES:
+                item.error = "Бұл транзакция белсенді емес"
+            elif loan["transaction_id"] in chosen:
+                item.error = "Транзакция сұраныста қайталанды"
+            else:
+                chosen[loan["transaction_id"]] = (item, loan)
+
+        return_date = _utc_naive(returned_at) if returned_at else datetime.utcnow()
+
+        settlement = await TransactionService._settle_returns(
+            db, [loan for _, loan in chosen.values()], return_date
+        )
+        db.commit()
+        TransactionService._after_returns(settlement)
+
+        for settled in settlement["items"]:
+            item, _ = chosen[settled["transaction_id"]]
+            item.success = True
+            item.fine_amount = settled["fine_amount"]
+            item.days_overdue = settled["days_overdue"]
+
+        items = [item for item, _ in requested]
+        succeeded = sum(1 for item in items if item.success)
+        return BatchCirculationResponse(succeeded=succeeded, failed=len(items) - succeeded, items=items)
+
+    @staticmethod
+    async def _settle_returns(db: Session, loans: List, return_date: datetime) -> dict:
+        settlement = {"items": [], "snapshots": [], "holds": [], "return_date": return_date}
+        if not loans:
+            return settlement
+
+        deltas = {}
+        fines = []
+        dropped = []
+        audit_entries = []
+
+        # Түнгі есептеу жасаған алдын ала айыппұлдар қайтару кезінде түпкілікті сомаға ауыстырылады
+        provisional = {
+            transaction_id: (fine_id, float(amount))
+            for transaction_id, fine_id, amount in db.execute(_PROVISIONAL_FINES_SQL, {
+                "transaction_ids": [loan["transaction_id"] for loan in loans]
+            }).all()
+        }
+
+        for loan in loans:
+            due_date = _utc_naive(loan["due_date"])
+            days_overdue = (return_date - due_date).days if return_date > due_date else 0
             fine_amount = min(days_overdue * settings.FINE_PER_DAY, settings.MAX_FINE_AMOUNT)
+            accrued = provisional.get(loan["transaction_id"], (None, 0.0))[1]
 
             if fine_amount > 0:
-                fine = Fine(
-                    user_id=transaction.user_id,
-                    transaction_id=transaction_id,
-                    amount=fine_amount,
-                    paid=False
-                )
-                db.add(fine)
+                fines.append((loan["user_id"], loan["transaction_id"], fine_amount))
+            elif loan["transaction_id"] in provisional:
+                dropped.append(loan["transaction_id"])
 
-        transaction.return_date = return_date
-        transaction.fine_amount = fine_amount
-        transaction.status = "returned"
+            loans_delta, reservations_delta, fines_delta = deltas.get(loan["user_id"], (0, 0, 0.0))
+            deltas[loan["user_id"]] = (loans_delta - 1, reservations_delta, fines_delta + fine_amount - accrued)
 
-        book_copy = db.query(BookCopy).filter(BookCopy.copy_id == transaction.copy_id).first()
-        if book_copy:
-            book_copy.status = "available"
+            audit_entries.append({
+                "user_id": loan["user_id"],
+                "action": "book_returned",
+                "action_type": "update",
+                "entity_type": "transaction",
+                "entity_id": loan["transaction_id"],
+                "details": {
+                    "transaction_id": loan["transaction_id"],
+                    "days_overdue": days_overdue,
+                    "fine_amount": fine_amount
+                }
+            })
 
-        db.commit()
-        redis_client = redis.Redis.from_url(settings.REDIS_URL)
-        redis_client.delete(f"user:{transaction.user_id}:transactions")
+            settlement["items"].append({
+                "transaction_id": loan["transaction_id"],
+                "user_id": loan["user_id"],
+                "copy_id": loan["copy_id"],
+                "book_id": loan["book_id"],
+                "barcode": loan["barcode"],
+                "title": loan["title"],
+                "days_overdue": days_overdue,
+                "fine_amount": fine_amount,
+            })
 
-        await AuditService.log_action(
+        db.execute(_CLOSE_LOANS_SQL, {
+            "return_date": return_date,
+            "transaction_ids": [item["transaction_id"] for item in settlement["items"]],
+            "fine_amounts": [item["fine_amount"] for item in settlement["items"]],
+        })
+        settlement["holds"] = HoldQueue.assign_copies(
             db,
-            user_id=transaction.user_id,
-            action="book_returned",
-            action_type="update",
-            entity_type="transaction",
-            entity_id=transaction_id,
-            details={
-                "transaction_id": transaction_id,
-                "days_overdue": days_overdue,
-                "fine_amount": fine_amount
-            }
+            [item["copy_id"] for item in settlement["items"]],
+            return_date + timedelta(days=settings.HOLD_PICKUP_DAYS)
         )
+        HoldQueue.announce(db, settlement["holds"])
 
-        if days_overdue > 0:
-            message = f"Сіз кітапты {days_overdue} күн мерзімі өтіп қайтардыңыз. Айыппұл: {fine_amount} теңге."
-            NotificationService.send_notification_async.delay(
-                transaction.user_id, "fine", message, "email"
-            )
+        ledger = []
+        if fines:
+            fine_ids = {
+                transaction_id: fine_id
+                for fine_id, transaction_id in db.execute(_FINALIZE_FINES_SQL, {
+                    "user_ids": [user_id for user_id, _, _ in fines],
+                    "transaction_ids": [transaction_id for _, transaction_id, _ in fines],
+                    "amounts": [amount for _, _, amount in fines],
+                }).all()
+            }
+            for user_id, transaction_id, amount in fines:
+                accrued = provisional.get(transaction_id, (None, 0.0))[1]
+                if transaction_id in fine_ids and amount != accrued:
+                    entry_type = "adjustment" if transaction_id in provisional else "charge"
+                    ledger.append(FineService.ledger_entry(user_id, fine_ids[transaction_id], entry_type, amount - accrued))
 
-        return ReturnResponse(
-            transaction_id=transaction_id,
-            return_date=return_date,
-            fine_amount=fine_amount,
-            days_overdue=days_overdue
+        if dropped:
+            db.execute(_DROP_PROVISIONAL_FINES_SQL, {"transaction_ids": dropped})
+            user_by_loan = {loan["transaction_id"]: loan["user_id"] for loan in loans}
+            for transaction_id in dropped:
+                fine_id, accrued = provisional[transaction_id]
+                ledger.append(FineService.ledger_entry(user_by_loan[transaction_id], fine_id, "adjustment", -accrued))
+
+        settlement["snapshots"] = CirculationService.apply_deltas(db, deltas)
+        FineService.post_ledger(db, ledger, settlement["snapshots"])
+        await AuditService.log_actions_bulk(db, audit_entries)
+
+        overdue_by_user = {}
+        for item in settlement["items"]:
+            if item["days_overdue"] > 0:
+                overdue_by_user.setdefault(item["user_id"], []).append(item)
+
+        for user_id, items in overdue_by_user.items():
+            if len(items) == 1:
+                item = items[0]
+                message = (
+                    f"Сіз кітапты {item['days_overdue']} күн мерзімі өтіп қайтардыңыз. "
+                    f"Айыппұл: {item['fine_amount']} теңге."
+                )
+            else:
+                total = sum(item["fine_amount"] for item in items)
+                message = f"Сіз {len(items)} кітапты мерзімі өтіп қайтардыңыз. Жалпы айыппұл: {total} теңге."
+            TransactionService._notify(db, user_id, "fine", message)
+
+        return settlement
+
+    @staticmethod
+    def _after_returns(settlement: dict) -> None:
+        if not settlement["items"]:
+            return
+
+        CirculationService.cache_snapshots(settlement["snapshots"])
+        held = {hold["copy_id"] for hold in settlement["holds"]}
+        copies = [
+            {
+                "copy_id": item["copy_id"],
+                "book_id": item["book_id"],
+                "barcode": item["barcode"],
+                "status": "reserved" if item["copy_id"] in held else "available"
+            }
+            for item in settlement["items"]
+        ]
+        BarcodeResolver.store(copies)
+        EventHub.publish_availability(copies)
+        HoldQueue.remove(HoldQueue.entries(settlement["holds"]))
+
+        user_ids = {item["user_id"] for item in settlement["items"]}
+        get_redis().delete(*[f"user:{user_id}:transactions" for user_id in user_ids])
+
+    @staticmethod
+    def _validate_batch_size(size: int) -> None:
+        if size == 0:
+            raise ValueError("Пакет бос")
+        if size > settings.MAX_BATCH_SIZE:
+            raise ValueError(f"Пакетте {settings.MAX_BATCH_SIZE} элементтен көп болмауы керек")
+
+    @staticmethod
+    def _notify(db: Session, user_id: int, notification_type: str, message: str) -> None:
+        NotificationService.enqueue(user_id, notification_type, message, db=db)
+
+    @staticmethod
+    async def get_user_transactions(
+            db: Session,
+            user_id: int,
+            status_filter: Optional[str] = None,
+            page: int = 1,
+            size: int = 50,
+            include_history: bool = False
+    ) -> List[TransactionResponse]:
+        cache_key = f"user:{user_id}:transactions"
+        cache_field = f"{status_filter or 'all'}:{page}:{size}:{int(include_history)}"
+
+        try:
+            cached = get_redis().hget(cache_key, cache_field)
+        except redis.RedisError as e:
+            logger.warning(f"Транзакциялар кэшін оқу қатесі: {e}")
+            cached = None
+
+        if cached:
+            return [TransactionResponse(**item) for item in json.loads(cached)]
+
+        loans = Transaction
+        if include_history:
+            # Мұрағатқа көшкен бөлімдер ыстық кестемен бірге оқылады
+            history = union_all(
+                select(*Transaction.__table__.columns).where(Transaction.user_id == user_id),
+                select(*transactions_archive.columns).where(transactions_archive.c.user_id == user_id)
+            ).subquery("history")
+            loans = aliased(Transaction, history)
+
+        query = db.query(loans, Book.title, User.full_name) \
+            .join(BookCopy, BookCopy.copy_id == loans.copy_id) \
+            .join(Book, Book.book_id == BookCopy.book_id) \
+            .join(User, User.user_id == loans.user_id) \
+            .filter(loans.user_id == user_id)
+
+        if status_filter == "active":
+            # Мерзімі өткен қарыздар да оқырманның қолында, сондықтан белсенді болып саналады
+            query = query.filter(loans.status.in_(OPEN_LOAN_STATUSES))
+        elif status_filter:
+            query = query.filter(loans.status == status_filter)
+
+        rows = query.order_by(loans.borrow_date.desc(), loans.transaction_id.desc()) \
+            .offset((page - 1) * size) \
+            .limit(size) \
+            .all()
+
+        result = [
+            TransactionService._to_response(transaction, book_title, user_name)
+            for transaction, book_title, user_name in rows
+        ]
+
+        try:
+            pipe = get_redis().pipeline()
+            pipe.hset(cache_key, cache_field, json.dumps([item.dict() for item in result], default=str))
+            pipe.expire(cache_key, settings.USER_TRANSACTIONS_CACHE_TTL)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Транзакциялар кэшін жазу қатесі: {e}")
+
+        return result
+
+    @staticmethod
+    def _to_response(transaction: Transaction, book_title: Optional[str], user_name: Optional[str]) -> TransactionResponse:
+        return TransactionResponse(
+            transaction_id=transaction.transaction_id,
+            user_id=transaction.user_id,
+            copy_id=transaction.copy_id,
+            type=transaction.type,
+            borrow_date=transaction.borrow_date,
+            due_date=transaction.due_date,
+            return_date=transaction.return_date,
+            fine_amount=float(transaction.fine_amount or 0),
+            status=transaction.status,
+            book_title=book_title or "",
+            user_name=user_name or ""
         )
 
     @staticmethod
-    async def get_user_transactions(db: Session, user_id: int, status_filter: Optional[str] = None) -> List[
-        TransactionResponse]:
-        query = db.query(Transaction).filter(Transaction.user_id == user_id)
+    def _transactions_query(
+            db: Session,
+            user_id: Optional[int] = None,
+            status_filter: Optional[str] = None,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None,
+            book_id: Optional[int] = None,
+            copy_id: Optional[int] = None
+    ):
+        query = db.query(Transaction, Book.title, User.full_name) \
+            .join(BookCopy, BookCopy.copy_id == Transaction.copy_id) \
+            .join(Book, Book.book_id == BookCopy.book_id) \
+            .join(User, User.user_id == Transaction.user_id)
 
-        if status_filter:
+        if user_id:
+            query = query.filter(Transaction.user_id == user_id)
+        if status_filter == "active":
+            query = query.filter(Transaction.status.in_(OPEN_LOAN_STATUSES))
+        elif status_filter:
             query = query.filter(Transaction.status == status_filter)
+        if date_from:
+            query = query.filter(Transaction.borrow_date >= date_from)
+        if date_to:
+            query = query.filter(Transaction.borrow_date < date_to)
+        if book_id:
+            query = query.filter(BookCopy.book_id == book_id)
+        if copy_id:
+            query = query.filter(Transaction.copy_id == copy_id)
 
-        transactions = query.order_by(Transaction.borrow_date.desc()).all()
-
-        result = []
-        for transaction in transactions:
-            book_copy = db.query(BookCopy).filter(BookCopy.copy_id == transaction.copy_id).first()
-            book_title = ""
-            if book_copy and book_copy.book:
-                book_title = book_copy.book.title
-
-            user = db.query(User).filter(User.user_id == user_id).first()
-            user_name = user.full_name if user else ""
-
-            result.append(TransactionResponse(
-                transaction_id=transaction.transaction_id,
-                user_id=user_id,
-                copy_id=transaction.copy_id,
-                type=transaction.type,
-                borrow_date=transaction.borrow_date,
-                due_date=transaction.due_date,
-                return_date=transaction.return_date,
-                fine_amount=float(transaction.fine_amount),
-                status=transaction.status,
-                book_title=book_title,
-                user_name=user_name
-            ))
+        return query.order_by(Transaction.borrow_date.desc(), Transaction.transaction_id.desc())
 
-        return result
+    @staticmethod
+    async def get_all_transactions(
+            db: Session,
+            user_id: Optional[int] = None,
+            status_filter: Optional[str] = None,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None,
+            book_id: Optional[int] = None,
+            copy_id: Optional[int] = None,
+            cursor: Optional[str] = None,
+            size: int = 50
+    ) -> TransactionPage:
+        if date_from and date_to and date_from >= date_to:
+            raise ValueError("Күн аралығы жарамсыз")
+
+        query = TransactionService._transactions_query(
+            db, user_id, status_filter, date_from, date_to, book_id, copy_id
+        )
+
+        if cursor:
+            borrow_date, transaction_id = decode_cursor(cursor)
+            key = tuple_(Transaction.borrow_date, Transaction.transaction_id)
+            bound = tuple_(literal(datetime.fromisoformat(borrow_date)), literal(int(transaction_id)))
+            query = query.filter(key < bound)
+
+        rows = query.limit(size + 1).all()
+        has_more = len(rows) > size
+        rows = rows[:size]
+
+        items = [
+            TransactionService._to_response(transaction, book_title, user_name)
+            for transaction, book_title, user_name in rows
+        ]
+
+        next_cursor = None
+        if has_more:
+            last = rows[-1][0]
+            next_cursor = encode_cursor(last.borrow_date.isoformat(), last.transaction_id)
+
+        return TransactionPage(items=items, next_cursor=next_cursor)
 
     @staticmethod
-    async def get_overdue_transactions(db: Session) -> List[TransactionResponse]:
+    def stream_transactions(
+            db: Session,
+            export_format: str = "ndjson",
+            user_id: Optional[int] = None,
+            status_filter: Optional[str] = None,
+            date_from: Optional[datetime] = None,
+            date_to: Optional[datetime] = None,
+            book_id: Optional[int] = None,
+            copy_id: Optional[int] = None
+    ) -> Iterator[str]:
+        query = TransactionService._transactions_query(
+            db, user_id, status_filter, date_from, date_to, book_id, copy_id
+        ).execution_options(stream_results=True).yield_per(1000)
+
+        if export_format == "ndjson":
+            for transaction, book_title, user_name in query:
+                yield TransactionService._to_response(transaction, book_title, user_name).json() + "\n"
+            return
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+
+        for transaction, book_title, user_name in query:
+            writer.writerow(TransactionService._to_response(transaction, book_title, user_name).dict())
+            # Буфер 64 КБ-тан асқанда жіберіледі, жад көлемі экспорт көлеміне тәуелді емес
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+    @staticmethod
+    def mark_overdue(db: Session, chunk_size: Optional[int] = None) -> int:
+        chunk_size = chunk_size or settings.OVERDUE_SWEEP_CHUNK
         now = datetime.utcnow()
+        total = 0
+
+        while True:
+            user_ids = db.execute(_MARK_OVERDUE_SQL, {"now": now, "chunk_size": chunk_size}).scalars().all()
+            db.commit()
+
+            if user_ids:
+                total += len(user_ids)
+                try:
+                    get_redis().delete(*{f"user:{user_id}:transactions" for user_id in user_ids})
+                except redis.RedisError as e:
+                    logger.warning(f"Транзакциялар кэшін тазалау қатесі: {e}")
+
+            if len(user_ids) < chunk_size:
+                break
 
-        transactions = db.query(Transaction).filter(
-            and_(
-                Transaction.status == "active",
+        return total
+
+    @staticmethod
+    def send_due_reminders(db: Session, chunk_size: Optional[int] = None) -> int:
+        chunk_size = chunk_size or settings.DUE_REMINDER_CHUNK
+        now = datetime.utcnow()
+        until = now + timedelta(days=settings.DUE_REMINDER_DAYS)
+        total = 0
+
+        while True:
+            rows = db.execute(_DUE_REMINDERS_SQL, {
+                "now": now, "until": until, "chunk_size": chunk_size
+            }).mappings().all()
+
+            loans_by_user = {}
+            for row in rows:
+                loans_by_user.setdefault(row["user_id"], []).append(row)
+
+            NotificationService.enqueue_batch([
+                NotificationTask(
+                    user_id=user_id,
+                    type="due_soon",
+                    message="Қайтару мерзімі жақындап қалды:\n" + "\n".join(
+                        f"- '{loan['title']}' ({loan['due_date'].strftime('%Y-%m-%d')})" for loan in loans
+                    )
+                )
+                for user_id, loans in loans_by_user.items()
+            ], db)
+            # reminded_at белгісі мен еске салу тапсырмалары бір транзакцияда сақталады
+            db.commit()
+            total += len(rows)
+
+            if len(rows) < chunk_size:
+                break
+
+        return total
+
+    @staticmethod
+    def _overdue_query(db: Session, now: datetime, oldest_first: bool = True):
+        query = db.query(Transaction, Book.title, User.full_name) \
+            .join(BookCopy, BookCopy.copy_id == Transaction.copy_id) \
+            .join(Book, Book.book_id == BookCopy.book_id) \
+            .join(User, User.user_id == Transaction.user_id) \
+            .filter(
+                Transaction.status.in_(OPEN_LOAN_STATUSES),
                 Transaction.due_date < now
             )
-        ).all()
-
-        result = []
-        for transaction in transactions:
-            book_copy = db.query(BookCopy).filter(BookCopy.copy_id == transaction.copy_id).first()
-            book_title = ""
-            if book_copy and book_copy.book:
-                book_title = book_copy.book.title
-
-            user = db.query(User).filter(User.user_id == transaction.user_id).first()
-            user_name = user.full_name if user else ""
-
-            result.append(TransactionResponse(
-                transaction_id=transaction.transaction_id,
-                user_id=transaction.user_id,
-                copy_id=transaction.copy_id,
-                type=transaction.type,
-                borrow_date=transaction.borrow_date,
-                due_date=transaction.due_date,
-                return_date=transaction.return_date,
-                fine_amount=float(transaction.fine_amount),
-                status=transaction.status,
-                book_title=book_title,
-                user_name=user_name
-            ))
 
-        return result
+        if oldest_first:
+            return query.order_by(Transaction.due_date.asc(), Transaction.transaction_id.asc())
+        return query.order_by(Transaction.due_date.desc(), Transaction.transaction_id.desc())
 
     @staticmethod
-    async def get_user_fines(db: Session, user_id: int) -> List[FineResponse]:
-        fines = db.query(Fine).filter(Fine.user_id == user_id).all()
-
-        result = []
-        for fine in fines:
-            transaction_details = ""
-            transaction = db.query(Transaction).filter(Transaction.transaction_id == fine.transaction_id).first()
-            if transaction:
-                book_copy = db.query(BookCopy).filter(BookCopy.copy_id == transaction.copy_id).first()
-                if book_copy and book_copy.book:
-                    transaction_details = f"Кітап: {book_copy.book.title}"
-
-            result.append(FineResponse(
-                fine_id=fine.fine_id,
-                user_id=fine.user_id,
-                transaction_id=fine.transaction_id,
-                amount=float(fine.amount),
-                issued_at=fine.issued_at,
-                paid=fine.paid,
-                paid_at=fine.paid_at,
-                transaction_details=transaction_details
-            ))
-
-        return result
+    def _to_overdue_response(transaction: Transaction, book_title: str, user_name: str, now: datetime) -> OverdueTransactionResponse:
+        base = TransactionService._to_response(transaction, book_title, user_name)
+        return OverdueTransactionResponse(
+            **base.dict(),
+            days_overdue=max((now - _utc_naive(transaction.due_date)).days, 0)
+        )
 
     @staticmethod
-    async def pay_fine(db: Session, fine_id: int, user_id: int, amount: float) -> FineResponse:
-        fine = db.query(Fine).filter(Fine.fine_id == fine_id, Fine.user_id == user_id).first()
-        if not fine:
-            raise ValueError("Айыппұл табылмады")
+    async def get_overdue_transactions(
+            db: Session,
+            cursor: Optional[str] = None,
+            size: int = 50,
+            sort: str = "days_desc"
+    ) -> OverduePage:
+        now = datetime.utcnow()
+        oldest_first = sort == "days_desc"
+        query = TransactionService._overdue_query(db, now, oldest_first)
 
-        if fine.paid:
-            raise ValueError("Айыппұл төленген")
+        if cursor:
+            due_date, transaction_id = decode_cursor(cursor)
+            key = tuple_(Transaction.due_date, Transaction.transaction_id)
+            bound = tuple_(literal(datetime.fromisoformat(due_date)), literal(int(transaction_id)))
+            query = query.filter(key > bound if oldest_first else key < bound)
 
-        if amount < fine.amount:
-            raise ValueError(f"Төлем сомасы жеткіліксіз. Толық сома: {fine.amount}")
+        rows = query.limit(size + 1).all()
+        has_more = len(rows) > size
+        rows = rows[:size]
 
-        fine.paid = True
-        fine.paid_at = datetime.utcnow()
+        items = [
+            TransactionService._to_overdue_response(transaction, book_title, user_name, now)
+            for transaction, book_title, user_name in rows
+        ]
 
-        db.commit()
+        next_cursor = None
+        if has_more:
+            last = rows[-1][0]
+            next_cursor = encode_cursor(last.due_date.isoformat(), last.transaction_id)
 
-        await AuditService.log_action(
-            db,
-            user_id=user_id,
-            action="fine_paid",
-            action_type="update",
-            entity_type="fine",
-            entity_id=fine_id,
-            details={
-                "fine_id": fine_id,
-                "amount": float(amount),
-                "paid_amount": float(fine.amount)
-            }
-        )
+        return OverduePage(items=items, next_cursor=next_cursor)
 
-        return FineResponse(
-            fine_id=fine.fine_id,
-            user_id=fine.user_id,
-            transaction_id=fine.transaction_id,
-            amount=float(fine.amount),
-            issued_at=fine.issued_at,
-            paid=fine.paid,
-            paid_at=fine.paid_at,
-            transaction_details=""
-        )
\ No newline at end of file
+    @staticmethod
+    def stream_overdue_transactions(db: Session, sort: str = "days_desc") -> Iterator[str]:
+        now = datetime.utcnow()
+        query = TransactionService._overdue_query(db, now, sort == "days_desc") \
+            .execution_options(stream_results=True) \
+            .yield_per(1000)
+
+        for transaction, book_title, user_name in query:
+            yield TransactionService._to_overdue_response(transaction, book_title, user_name, now).json() + "\n"
+
+    @staticmethod
+    async def get_user_fines(db: Session, user_id: int, page: int = 1, size: int = 50) -> List[FineResponse]:
+        rows = db.query(Fine, Book.title) \
+            .outerjoin(Transaction, Transaction.transaction_id == Fine.transaction_id) \
+            .outerjoin(BookCopy, BookCopy.copy_id == Transaction.copy_id) \
+            .outerjoin(Book, Book.book_id == BookCopy.book_id) \
+            .filter(Fine.user_id == user_id) \
+            .order_by(Fine.issued_at.desc(), Fine.fine_id.desc()) \
+            .offset((page - 1) * size) \
+            .limit(size) \
+            .all()
+
+        return [
+            FineResponse(
+                fine_id=fine.fine_id,
+                user_id=fine.user_id,
+                transaction_id=fine.transaction_id,
+                amount=float(fine.amount),
+                issued_at=fine.issued_at,
+                paid=fine.paid,
+                paid_at=fine.paid_at,
+                paid_amount=float(fine.paid_amount or 0),
+                provisional=fine.provisional,
+                transaction_details=f"Кітап: {book_title}" if book_title else ""
+            )
+            for fine, book_title in rows
+        ]
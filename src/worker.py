@@ -0,0 +1,42 @@
+import argparse
+import logging
+import signal
+import threading
+
+from .core.config import settings
+from .core.tasks import TaskQueue
+from .services.delivery_service import DeliveryChannels
+from .services import notification_service  # noqa: F401 - тапсырмаларды тіркейді
+
+logging.basicConfig(
+    level=logging.INFO if settings.ENVIRONMENT == "production" else logging.DEBUG,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ULMS фондық тапсырмалар өңдеушісі")
+    parser.add_argument("--queues", nargs="*", default=None)
+    parser.add_argument("--concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+
+    TaskQueue.start_workers(args.concurrency, args.queues)
+    logger.info(f"Өңдеушілер іске қосылды: {args.concurrency}")
+
+    while not stopped.wait(settings.DELIVERY_METRICS_INTERVAL):
+        for key, stats in DeliveryChannels.report().items():
+            logger.info(f"{key}: {stats['sent']:.0f} жіберілді, {stats['messages_per_second']:.1f} хабар/сек")
+
+    logger.info("Өңдеушілер тоқтатылуда...")
+    TaskQueue.stop_workers()
+    DeliveryChannels.report()
+    DeliveryChannels.close()
+
+
+if __name__ == "__main__":
+    main()
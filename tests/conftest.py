@@ -0,0 +1,89 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.core.database import SessionLocal
+from src.core.security import get_password_hash
+from src.main import app
+from src.models.user import Role, User
+
+PASSWORD = "TestPass123!"
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db(client):
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def login(client):
+    def login(username="testuser", password=PASSWORD):
+        response = client.post("/api/auth/login", data={"username": username, "password": password})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return login
+
+
+@pytest.fixture
+def make_role(db):
+    def make_role(role_name):
+        role = db.query(Role).filter(Role.role_name == role_name).first()
+        if not role:
+            role = Role(role_name=role_name, permissions="{}")
+            db.add(role)
+            db.commit()
+        return role
+    return make_role
+
+
+@pytest.fixture
+def make_user(db, make_role):
+    def make_user(role_name="student", username=None):
+        username = username or f"{role_name}_{uuid.uuid4().hex[:8]}"
+        user = User(
+            username=username,
+            email=f"{username}@university.edu",
+            password_hash=get_password_hash(PASSWORD),
+            full_name=f"Тест {role_name}",
+            role_id=make_role(role_name).role_id
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+    return make_user
+
+
+@pytest.fixture
+def test_user(db, make_user):
+    user = db.query(User).filter(User.username == "testuser").first() or make_user("student", "testuser")
+    return {"user_id": user.user_id, "username": user.username, "email": user.email}
+
+
+@pytest.fixture
+def headers(test_user, login):
+    return login()
+
+
+@pytest.fixture
+def patron(make_user, login):
+    user = make_user("student")
+    return user, login(user.username)
+
+
+@pytest.fixture
+def librarian_headers(make_user, login):
+    return login(make_user("librarian").username)
+
+
+@pytest.fixture
+def admin_headers(make_user, login):
+    return login(make_user("admin").username)
@@ -1,5 +1,12 @@
+import asyncio
+
 import pytest
-from fastapi import status
+import redis
+from fastapi import HTTPException, status
+
+from src.core import revocation
+from src.core.revocation import RevocationList
+from src.core.security import PasswordHasher
 
 
 def test_register_user(client):
@@ -79,4 +86,88 @@ def test_get_current_user(client, test_user):
     assert response.status_code == status.HTTP_200_OK
     data = response.json()
     assert data["username"] == test_user["username"]
-    assert data["email"] == test_user["email"]
\ No newline at end of file
+    assert data["email"] == test_user["email"]
+
+def test_deactivate_user_requires_admin(client, test_user):
+    login_data = {
+        "username": "testuser",
+        "password": "TestPass123!"
+    }
+
+    login_response = client.post("/api/auth/login", data=login_data)
+    token = login_response.json()["access_token"]
+
+    response = client.post(
+        "/api/auth/users/1/deactivate",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_logout_revokes_token(client, test_user):
+    login_data = {
+        "username": "testuser",
+        "password": "TestPass123!"
+    }
+
+    login_response = client.post("/api/auth/login", data=login_data)
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.post("/api/auth/logout", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_role_change_revokes_old_token(client, test_user, admin_headers, login, make_role):
+    make_role("teacher")
+    headers = login()
+    user_id = client.get("/api/auth/me", headers=headers).json()["user_id"]
+
+    response = client.put(f"/api/auth/users/{user_id}/role", json={"role_name": "teacher"}, headers=admin_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.get("/api/auth/me", headers=login())
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_password_hasher_round_trip():
+    completed = PasswordHasher.metrics()["completed"]
+
+    hashed = asyncio.run(PasswordHasher.hash("TestPass123!"))
+
+    assert asyncio.run(PasswordHasher.verify("TestPass123!", hashed))
+    assert not asyncio.run(PasswordHasher.verify("WrongPass123!", hashed))
+    assert PasswordHasher.metrics()["completed"] == completed + 3
+
+
+def test_logout_all_revokes_every_session(client, test_user, login):
+    first = login()
+    second = login()
+
+    response = client.post("/api/auth/logout-all", headers=first)
+    assert response.status_code == status.HTTP_200_OK
+
+    assert client.get("/api/auth/me", headers=first).status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.get("/api/auth/me", headers=second).status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.get("/api/auth/me", headers=login()).status_code == status.HTTP_200_OK
+
+
+def test_revocation_check_fails_closed_without_redis(monkeypatch):
+    class BrokenRedis:
+        def zscore(self, *args):
+            raise redis.ConnectionError("Redis қолжетімсіз")
+
+    monkeypatch.setattr(RevocationList, "_bloom", None)
+    monkeypatch.setattr(revocation, "get_redis", lambda: BrokenRedis())
+
+    with pytest.raises(HTTPException) as error:
+        RevocationList.is_revoked("any-jti")
+
+    assert error.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
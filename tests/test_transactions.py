@@ -0,0 +1,619 @@
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+from sqlalchemy import text
+
+from src.core.cache import get_redis
+from src.core.config import settings
+from src.core.events import EventHub, Subscription
+from src.core.scheduler import Scheduler
+from src.core.tasks import TaskQueue
+from src.models.book import Book, BookCopy
+from src.models.task import TaskOutbox
+from src.models.transaction import Reservation
+from src.schemas.notification import NotificationTask
+from src.services.delivery_service import DeliveryChannels
+from src.services.fine_service import FineService
+from src.services.notification_service import NotificationService
+from src.services.reservation_service import ReservationService
+from src.services.transaction_service import TransactionService
+
+
+def add_copies(db, count=1):
+    book = Book(title=f"Тест кітабы {uuid.uuid4().hex[:8]}")
+    db.add(book)
+    db.flush()
+
+    copies = [BookCopy(book_id=book.book_id, barcode=f"T-{uuid.uuid4().hex[:12]}", status="available") for _ in range(count)]
+    db.add_all(copies)
+    db.commit()
+    return book, copies
+
+
+def move_due_date(db, transaction_id, due_date):
+    db.execute(
+        text("UPDATE transactions SET due_date = :due_date WHERE transaction_id = :transaction_id"),
+        {"due_date": due_date, "transaction_id": transaction_id}
+    )
+    db.commit()
+
+
+def borrow(client, headers, copy, expected_days=14):
+    response = client.post("/api/transactions/borrow", json={"copy_id": copy.copy_id, "expected_days": expected_days}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, items, on_sent=None):
+        for index, item in enumerate(items):
+            self.sent.append(item)
+            if on_sent:
+                on_sent(index)
+        return len(items)
+
+
+@pytest.fixture
+def fake_email(monkeypatch):
+    channel = FakeChannel()
+    monkeypatch.setattr(DeliveryChannels, "email", classmethod(lambda cls: channel))
+    monkeypatch.setattr(DeliveryChannels, "sms", classmethod(lambda cls: FakeChannel()))
+    return channel
+
+
+def test_borrow_missing_copy(client, headers):
+    response = client.post(
+        "/api/transactions/borrow",
+        json={"copy_id": 999999, "expected_days": 14},
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Кітап көшірмесі табылмады" in response.json()["detail"]
+
+
+def test_borrow_invalid_period(client, headers):
+    response = client.post(
+        "/api/transactions/borrow",
+        json={"copy_id": 1, "expected_days": 365},
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_borrow_copy_only_once(client, db, patron, login, make_user):
+    _, copies = add_copies(db)
+    _, patron_headers = patron
+
+    borrow(client, patron_headers, copies[0])
+    response = client.post(
+        "/api/transactions/borrow",
+        json={"copy_id": copies[0].copy_id, "expected_days": 14},
+        headers=login(make_user().username)
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Кітап қолжетімді емес" in response.json()["detail"]
+
+
+def test_account_snapshot_counts_loans(client, db, patron):
+    _, copies = add_copies(db)
+    _, patron_headers = patron
+
+    before = client.get("/api/transactions/my-account", headers=patron_headers).json()
+    borrow(client, patron_headers, copies[0])
+    after = client.get("/api/transactions/my-account", headers=patron_headers).json()
+
+    assert after["active_loans"] == before["active_loans"] + 1
+
+
+def test_borrow_batch_reports_per_item_results(client, headers):
+    response = client.post(
+        "/api/transactions/borrow/batch",
+        json={"copy_ids": [999998, 999999], "barcodes": ["missing-barcode"]},
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["succeeded"] == 0
+    assert data["failed"] == 3
+    assert all(item["error"] == "Кітап көшірмесі табылмады" for item in data["items"])
+
+
+def test_batch_borrow_and_return(client, db, patron, librarian_headers):
+    _, copies = add_copies(db, 2)
+    _, patron_headers = patron
+
+    borrowed = client.post(
+        "/api/transactions/borrow/batch",
+        json={"copy_ids": [copies[0].copy_id], "barcodes": [copies[1].barcode]},
+        headers=patron_headers
+    ).json()
+    returned = client.post(
+        "/api/transactions/return/batch",
+        json={"transaction_ids": [item["transaction_id"] for item in borrowed["items"]]},
+        headers=librarian_headers
+    ).json()
+
+    assert borrowed["succeeded"] == 2
+    assert returned["succeeded"] == 2
+    db.expire_all()
+    assert {copy.status for copy in db.query(BookCopy).filter(BookCopy.book_id == copies[0].book_id)} == {"available"}
+
+
+def test_return_batch_requires_librarian(client, headers):
+    response = client.post(
+        "/api/transactions/return/batch",
+        json={"barcodes": ["missing-barcode"]},
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_borrow_by_barcode(client, db, patron):
+    _, copies = add_copies(db)
+    user, patron_headers = patron
+
+    response = client.post(
+        "/api/transactions/borrow/barcode",
+        json={"barcode": copies[0].barcode, "expected_days": 7},
+        headers=patron_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["copy_id"] == copies[0].copy_id
+    assert response.json()["user_id"] == user.user_id
+
+
+def test_my_borrowings_include_book_title(client, db, patron):
+    book, copies = add_copies(db)
+    _, patron_headers = patron
+
+    loan = borrow(client, patron_headers, copies[0])
+    borrowings = client.get("/api/transactions/my-borrowings", headers=patron_headers).json()
+
+    assert [(item["transaction_id"], item["book_title"]) for item in borrowings] == [(loan["transaction_id"], book.title)]
+
+
+def test_overdue_report_pages_by_cursor(client, db, patron, librarian_headers):
+    _, copies = add_copies(db, 2)
+    _, patron_headers = patron
+
+    for copy, days in zip(copies, (2, 5)):
+        loan = borrow(client, patron_headers, copy)
+        move_due_date(db, loan["transaction_id"], datetime.utcnow() - timedelta(days=days))
+    TransactionService.mark_overdue(db)
+
+    first = client.get("/api/transactions/overdue?size=1", headers=librarian_headers).json()
+    second = client.get(
+        "/api/transactions/overdue", params={"size": 1, "cursor": first["next_cursor"]}, headers=librarian_headers
+    ).json()
+
+    assert first["next_cursor"] is not None
+    assert first["items"][0]["status"] == "overdue"
+    assert first["items"][0]["days_overdue"] >= second["items"][0]["days_overdue"]
+    assert first["items"][0]["transaction_id"] != second["items"][0]["transaction_id"]
+
+
+def test_accrual_creates_provisional_fine(client, db, patron):
+    _, copies = add_copies(db)
+    _, patron_headers = patron
+
+    loan = borrow(client, patron_headers, copies[0])
+    move_due_date(db, loan["transaction_id"], datetime.utcnow() - timedelta(days=3, minutes=5))
+    FineService.accrue_fines(db)
+
+    fines = client.get("/api/transactions/fines/my", headers=patron_headers).json()
+
+    assert [(fine["transaction_id"], fine["provisional"]) for fine in fines] == [(loan["transaction_id"], True)]
+    assert fines[0]["amount"] == pytest.approx(3 * settings.FINE_PER_DAY)
+
+
+def test_pay_all_without_fines(client, headers):
+    response = client.post(
+        "/api/transactions/fines/pay-all",
+        json={"amount": 500},
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Төленбеген айыппұл жоқ" in response.json()["detail"]
+
+
+def test_partial_fine_payment(client, db, patron, librarian_headers):
+    _, copies = add_copies(db)
+    _, patron_headers = patron
+
+    loan = borrow(client, patron_headers, copies[0])
+    move_due_date(db, loan["transaction_id"], datetime.utcnow() - timedelta(days=3, minutes=5))
+    returned = client.post(
+        "/api/transactions/return", json={"transaction_id": loan["transaction_id"]}, headers=librarian_headers
+    ).json()
+
+    payment = client.post("/api/transactions/fines/pay-all", json={"amount": 100}, headers=patron_headers).json()
+    balance = client.get("/api/transactions/fines/balance", headers=patron_headers).json()
+
+    assert returned["fine_amount"] > 100
+    assert payment["amount_applied"] == 100
+    assert payment["settled_fine_ids"] == []
+    assert payment["partial_fine_id"] is not None
+    assert payment["balance"] == pytest.approx(returned["fine_amount"] - 100)
+    assert balance["balance"] == pytest.approx(returned["fine_amount"] - 100)
+
+
+def test_all_transactions_requires_librarian(client, headers):
+    response = client.get(
+        "/api/transactions/all?format=csv",
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_all_transactions_keyset_pages(client, db, patron, librarian_headers):
+    _, copies = add_copies(db, 3)
+    user, patron_headers = patron
+    loans = {borrow(client, patron_headers, copy)["transaction_id"] for copy in copies}
+
+    seen, cursor = [], None
+    while True:
+        page = client.get(
+            "/api/transactions/all",
+            params={"user_id": user.user_id, "size": 2, "cursor": cursor},
+            headers=librarian_headers
+        ).json()
+        seen += [item["transaction_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == loans
+
+
+def test_renew_missing_transaction(client, headers):
+    response = client.post(
+        "/api/transactions/999999/renew",
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Транзакция табылмады" in response.json()["detail"]
+
+
+def test_renew_extends_due_date(client, db, patron):
+    _, copies = add_copies(db)
+    _, patron_headers = patron
+
+    loan = borrow(client, patron_headers, copies[0])
+    before = client.get("/api/transactions/my-borrowings", headers=patron_headers).json()[0]
+    response = client.post(f"/api/transactions/{loan['transaction_id']}/renew?days=7", headers=patron_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["renewal_count"] == 1
+    extended = datetime.fromisoformat(response.json()["due_date"]) - datetime.fromisoformat(before["due_date"])
+    assert extended == timedelta(days=7)
+
+
+def test_renew_rejects_overdue_loan(client, db, patron):
+    _, copies = add_copies(db)
+    _, patron_headers = patron
+
+    loan = borrow(client, patron_headers, copies[0])
+    move_due_date(db, loan["transaction_id"], datetime.utcnow() - timedelta(days=1))
+    response = client.post(f"/api/transactions/{loan['transaction_id']}/renew?days=7", headers=patron_headers)
+    renewed = client.post("/api/transactions/renew/all?days=7", headers=patron_headers).json()
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Мерзімі өткен" in response.json()["detail"]
+    assert renewed["renewed"] == []
+    assert renewed["skipped"] == 1
+
+
+def test_borrow_retry_with_idempotency_key(client, headers):
+    headers = {**headers, "Idempotency-Key": "test-borrow-retry"}
+
+    first = client.post("/api/transactions/borrow", json={"copy_id": 999999, "expected_days": 14}, headers=headers)
+    retry = client.post("/api/transactions/borrow", json={"copy_id": 999999, "expected_days": 14}, headers=headers)
+    other = client.post("/api/transactions/borrow", json={"copy_id": 999998, "expected_days": 14}, headers=headers)
+
+    assert first.status_code == status.HTTP_400_BAD_REQUEST
+    assert retry.json() == first.json()
+    assert other.status_code == status.HTTP_400_BAD_REQUEST
+    assert "басқа сұраныс" in other.json()["detail"]
+
+
+def test_borrow_replay_does_not_borrow_twice(client, db, patron):
+    _, copies = add_copies(db)
+    _, patron_headers = patron
+    patron_headers = {**patron_headers, "Idempotency-Key": f"borrow-{uuid.uuid4().hex}"}
+
+    first = borrow(client, patron_headers, copies[0])
+    retry = borrow(client, patron_headers, copies[0])
+    account = client.get("/api/transactions/my-account", headers=patron_headers).json()
+
+    assert retry["transaction_id"] == first["transaction_id"]
+    assert account["active_loans"] == 1
+
+
+def test_history_includes_archive(client, headers):
+    response = client.get(
+        "/api/transactions/my-history?include_history=true",
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+
+
+def test_history_lists_returned_loan(client, db, patron, librarian_headers):
+    _, copies = add_copies(db)
+    _, patron_headers = patron
+
+    loan = borrow(client, patron_headers, copies[0])
+    client.post("/api/transactions/return", json={"transaction_id": loan["transaction_id"]}, headers=librarian_headers)
+    history = client.get("/api/transactions/my-history?include_history=true", headers=patron_headers).json()
+
+    assert [(item["transaction_id"], item["status"]) for item in history] == [(loan["transaction_id"], "returned")]
+
+
+def test_cancel_missing_reservation(client, headers):
+    response = client.delete(
+        "/api/transactions/reservations/999999",
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_returned_copy_is_held_for_next_reader(client, db, patron, librarian_headers, login, make_user):
+    book, copies = add_copies(db)
+    _, patron_headers = patron
+    holder_headers = login(make_user().username)
+    other_headers = login(make_user().username)
+
+    loan = borrow(client, patron_headers, copies[0])
+    reservation = client.post("/api/transactions/reservations", json={"book_id": book.book_id}, headers=holder_headers).json()
+    client.post("/api/transactions/return", json={"transaction_id": loan["transaction_id"]}, headers=librarian_headers)
+
+    held = client.get("/api/transactions/reservations/my", headers=holder_headers).json()
+    rejected = client.post("/api/transactions/borrow/batch", json={"copy_ids": [copies[0].copy_id]}, headers=other_headers).json()
+    claimed = client.post("/api/transactions/borrow/batch", json={"copy_ids": [copies[0].copy_id]}, headers=holder_headers).json()
+    account = client.get("/api/transactions/my-account", headers=holder_headers).json()
+
+    assert [(item["reservation_id"], item["status"], item["copy_id"]) for item in held] == [
+        (reservation["reservation_id"], "ready", copies[0].copy_id)
+    ]
+    assert rejected["items"][0]["error"] == "Кітап басқа оқырманға резервте тұр"
+    assert claimed["succeeded"] == 1
+    assert account["active_reservations"] == 0
+    db.expire_all()
+    assert db.get(Reservation, reservation["reservation_id"]).status == "fulfilled"
+
+
+def test_expired_hold_releases_copy(client, db, patron, librarian_headers, login, make_user):
+    book, copies = add_copies(db)
+    _, patron_headers = patron
+    holder_headers = login(make_user().username)
+
+    loan = borrow(client, patron_headers, copies[0])
+    reservation = client.post("/api/transactions/reservations", json={"book_id": book.book_id}, headers=holder_headers).json()
+    client.post("/api/transactions/return", json={"transaction_id": loan["transaction_id"]}, headers=librarian_headers)
+
+    db.execute(
+        text("UPDATE reservations SET expires_at = :expires_at WHERE reservation_id = :reservation_id"),
+        {"expires_at": datetime.utcnow() - timedelta(minutes=1), "reservation_id": reservation["reservation_id"]}
+    )
+    db.commit()
+    ReservationService.expire_reservations(db)
+
+    db.expire_all()
+    assert db.get(Reservation, reservation["reservation_id"]).status == "expired"
+    assert db.get(BookCopy, copies[0].copy_id).status == "available"
+
+
+def test_outbox_rolls_back_with_caller(db, patron):
+    user, _ = patron
+    before = db.query(TaskOutbox).count()
+
+    TaskQueue.enqueue_many("notifications.send", [
+        NotificationTask(user_id=user.user_id, type="system", message="Тест")
+    ], db)
+    pending = db.query(TaskOutbox).count()
+    db.rollback()
+
+    assert pending == before + 1
+    assert db.query(TaskOutbox).count() == before
+
+
+def test_queue_metrics_requires_admin(client, headers):
+    response = client.get(
+        "/api/notifications/queue-metrics",
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_deliver_batch_skips_finished_steps(db, patron, fake_email, monkeypatch):
+    user, _ = patron
+    published = []
+    monkeypatch.setattr(EventHub, "publish", staticmethod(lambda events: published.extend(events)))
+
+    tasks = [
+        NotificationTask(user_id=user.user_id, type="system", message="Жаңа"),
+        NotificationTask(user_id=user.user_id, type="system", message="Жарияланған", published=True),
+        NotificationTask(user_id=user.user_id, type="system", message="Жеткізілген", published=True, delivered=True),
+    ]
+    NotificationService.deliver_batch(db, tasks)
+
+    assert [event["message"] for _, event in published] == ["Жаңа"]
+    assert [body for _, _, body in fake_email.sent] == ["Жаңа", "Жарияланған"]
+    assert all(task.notification_id and task.published and task.delivered for task in tasks)
+
+    NotificationService.deliver_batch(db, tasks)
+
+    assert len(published) == 1
+    assert len(fake_email.sent) == 2
+
+
+def test_coalesced_notifications_form_one_digest(patron):
+    user, _ = patron
+    key = NotificationService.coalesce_key(user.user_id, "borrow", "email")
+
+    NotificationService.enqueue(user.user_id, "borrow", "Бірінші")
+    NotificationService.enqueue(user.user_id, "borrow", "Екінші")
+    messages = [message.decode() for message in get_redis().lrange(key, 0, -1)]
+
+    assert messages == ["Бірінші", "Екінші"]
+    assert get_redis().zscore(NotificationService.DIGEST_DUE_KEY, key) > time.time()
+    assert NotificationService._digest_message(messages) == "Сізге 2 жаңа хабарлама:\n- Бірінші\n- Екінші"
+
+
+def test_broadcast_requires_librarian(client, headers):
+    response = client.post(
+        "/api/notifications/broadcast",
+        json={"message": "Кітапхана жөндеуге жабылады", "roles": ["student"]},
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_broadcast_job_reports_progress(client, db, patron, admin_headers):
+    user, _ = patron
+
+    job = client.post(
+        "/api/notifications/broadcast",
+        json={"message": "Кітапхана жөндеуге жабылады", "user_ids": [user.user_id]},
+        headers=admin_headers
+    ).json()
+    NotificationService._run_broadcast(db, job["job_id"])
+    finished = client.get(f"/api/notifications/broadcasts/{job['job_id']}", headers=admin_headers).json()
+
+    assert job["status"] == "pending"
+    assert finished["status"] == "completed"
+    assert (finished["total"], finished["inserted"], finished["progress"]) == (1, 1, 1.0)
+
+
+def test_unread_count_and_inbox_page(client, headers):
+    count_response = client.get("/api/notifications/unread-count", headers=headers)
+    inbox_response = client.get("/api/notifications/?size=10", headers=headers)
+
+    assert count_response.status_code == status.HTTP_200_OK
+    assert count_response.json()["unread"] == 0
+    assert inbox_response.status_code == status.HTTP_200_OK
+    assert inbox_response.json() == {"items": [], "next_cursor": None}
+
+
+def test_inbox_pages_and_unread_count(client, db, patron, fake_email):
+    user, patron_headers = patron
+    NotificationService.deliver_batch(db, [
+        NotificationTask(user_id=user.user_id, type="system", message=f"Хабарлама {index}") for index in range(3)
+    ])
+
+    first = client.get("/api/notifications/?size=2", headers=patron_headers).json()
+    second = client.get("/api/notifications/", params={"size": 2, "cursor": first["next_cursor"]}, headers=patron_headers).json()
+    get_redis().delete(NotificationService.unread_key(user.user_id))
+    count = client.get("/api/notifications/unread-count", headers=patron_headers).json()
+
+    ids = [item["notification_id"] for item in first["items"] + second["items"]]
+    assert len(first["items"]) == 2
+    assert first["next_cursor"] is not None
+    assert len(ids) == len(set(ids)) == 3
+    assert second["next_cursor"] is None
+    assert count["unread"] == 3
+
+
+def test_event_stream_rejects_invalid_books(client, headers):
+    response = client.get(
+        "/api/events/stream?books=1,abc",
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "жарамсыз" in response.json()["detail"]
+
+
+def test_slow_subscriber_gets_resync():
+    subscription = Subscription(["events:user:1"], buffer_size=2)
+
+    for index in range(3):
+        subscription.push(json.dumps({"index": index}))
+
+    assert subscription.dropped == 2
+    assert json.loads(subscription.queue.get_nowait()) == {"type": "resync"}
+    assert json.loads(subscription.queue.get_nowait()) == {"index": 2}
+
+
+def test_due_reminder_sent_once(client, db, patron):
+    _, copies = add_copies(db)
+    _, patron_headers = patron
+
+    loan = borrow(client, patron_headers, copies[0], expected_days=1)
+    first = TransactionService.send_due_reminders(db)
+    second = TransactionService.send_due_reminders(db)
+    reminded_at = db.execute(
+        text("SELECT reminded_at FROM transactions WHERE transaction_id = :transaction_id"),
+        {"transaction_id": loan["transaction_id"]}
+    ).scalar()
+
+    assert first >= 1
+    assert second == 0
+    assert reminded_at is not None
+
+
+def test_scheduler_claims_run_once_per_interval():
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    try:
+        assert Scheduler._acquire_leadership()
+        assert Scheduler._claim_run(name, 60) == 0
+        assert 0 < Scheduler._claim_run(name, 60) <= 60
+    finally:
+        get_redis().delete(Scheduler.LEADER_KEY, Scheduler.last_run_key(name))
+
+
+def test_scheduler_follower_does_not_claim_run():
+    name = f"test-{uuid.uuid4().hex[:8]}"
+    get_redis().set(Scheduler.LEADER_KEY, "other-instance")
+    try:
+        assert Scheduler._claim_run(name, 60) == 60
+        assert get_redis().get(Scheduler.last_run_key(name)) is None
+    finally:
+        get_redis().delete(Scheduler.LEADER_KEY, Scheduler.last_run_key(name))
+
+
+def test_mark_all_read_clears_unread_count(client, headers):
+    response = client.post("/api/notifications/read-all", headers=headers)
+    count_response = client.get("/api/notifications/unread-count", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert count_response.json()["unread"] == 0
+
+
+def test_retention_removes_old_read_notifications(client, db, patron, fake_email):
+    user, patron_headers = patron
+    task = NotificationTask(user_id=user.user_id, type="system", message="Ескі")
+    NotificationService.deliver_batch(db, [task])
+
+    client.post("/api/notifications/read-all", headers=patron_headers)
+    db.execute(
+        text("UPDATE notifications SET sent_at = now() - interval '365 days' WHERE notification_id = :notification_id"),
+        {"notification_id": task.notification_id}
+    )
+    db.commit()
+    result = NotificationService.enforce_retention(db)
+
+    assert result["marked_read"] >= 1
+    assert result["removed"] >= 1
+    assert client.get(f"/api/notifications/{task.notification_id}", headers=patron_headers).status_code == status.HTTP_404_NOT_FOUND